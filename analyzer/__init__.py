@@ -0,0 +1,4 @@
+"""
+Shared building blocks for the Streamlit app (app.py) and the serverless
+API (api/analyze.py).
+"""
@@ -0,0 +1,200 @@
+"""
+ASGI variant of the analysis API (no framework dependency).
+
+Usage:
+    uvicorn analyzer.asgi:app --host 0.0.0.0 --port 8000
+
+Routes match api/analyze.py (POST/GET/OPTIONS on /api/analyze, plus
+GET /api/metrics; POST accepts ?engine=, ?ruleset= and ?reuse_duplicates=,
+and answers 400 to ?stream=, which only the threaded servers support). Requests
+are accepted on the event loop, spooled to a temporary file, and handed to
+a shared process pool for extraction and scoring. When more than
+ANALYZER_WORKERS + ANALYZER_QUEUE analyses are pending the app answers
+503 with Retry-After. The pool is created on lifespan startup and drained
+on shutdown, after the server has stopped accepting requests.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from urllib.parse import parse_qs
+
+from analyzer import metrics
+from analyzer.cache import get_default_cache
+from analyzer.engines import ENGINE_CHOICES
+from analyzer.multipart import SPOOL_THRESHOLD, UploadError, parse_multipart
+from analyzer.pipeline import analyze_pdf, warm_pool
+from analyzer.rules import UnknownRulesetError, get_ruleset
+
+RETRY_AFTER_SECONDS = 1
+
+
+class AnalyzerApp:
+    """
+    ASGI application serving /api/analyze from a process pool
+    """
+
+    def __init__(self, workers=None, queue_size=None, max_upload_bytes=None):
+        cpus = os.cpu_count() or 1
+        self.workers = workers or int(os.environ.get('ANALYZER_WORKERS', cpus))
+        self.queue_size = queue_size if queue_size is not None else int(os.environ.get('ANALYZER_QUEUE', cpus * 2))
+        self.max_upload_bytes = max_upload_bytes or int(os.environ.get('ANALYZER_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+        self.executor = None
+        self.pending = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, self.counting(scope, send))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.executor = warm_pool(self.workers)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.executor is not None:
+                    await asyncio.to_thread(self.executor.shutdown, True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def counting(self, scope, send):
+        # Wraps send to count each response by route and status
+        route = metrics.route_label(scope['path'])
+
+        async def send_counted(message):
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                metrics.REQUESTS.inc(1, route, str(status))
+                if status >= 500:
+                    metrics.ERRORS.inc(1, 'server')
+                elif status >= 400:
+                    metrics.ERRORS.inc(1, 'client')
+            await send(message)
+        return send_counted
+
+    async def http(self, scope, receive, send):
+        method = scope['method']
+        if method == 'OPTIONS':
+            await self.respond(send, 200, b'', [
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                (b'access-control-allow-headers', b'Content-Type'),
+            ])
+        elif method == 'GET' and scope['path'].rstrip('/') == '/api/metrics':
+            await self.respond_metrics(send)
+        elif method == 'GET':
+            await self.respond_json(send, {'cache': get_default_cache().stats()})
+        elif method == 'POST':
+            with metrics.collect(), metrics.span('request'):
+                await self.analyze(scope, receive, send)
+        else:
+            await self.respond_json(send, {'error': 'Method not allowed'}, 405)
+
+    async def analyze(self, scope, receive, send):
+        if self.pending >= self.workers + self.queue_size:
+            await self.respond_json(send, {'error': 'Server busy, retry shortly'}, 503,
+                                    [(b'retry-after', str(RETRY_AFTER_SECONDS).encode())])
+            return
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        if 'stream' in query:
+            await self.respond_json(send, {'error': 'Streaming is not supported by the ASGI app'}, 400)
+            return
+
+        engine = query.get('engine', [None])[0]
+        if engine is not None and engine not in ENGINE_CHOICES:
+            await self.respond_json(send, {'error': f'Unknown extraction engine: {engine}'}, 400)
+            return
+
+        reuse_duplicates = query.get('reuse_duplicates', [None])[0] in ('1', 'true', 'yes')
+        ruleset = query.get('ruleset', [None])[0]
+        if ruleset is not None:
+            try:
+                get_ruleset(ruleset)
+            except UnknownRulesetError as e:
+                await self.respond_json(send, {'error': str(e)}, 400)
+                return
+
+        self.pending += 1
+        try:
+            headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+            content_length = headers.get('content-length')
+            if content_length is not None and content_length.isdigit() and int(content_length) > self.max_upload_bytes:
+                raise UploadError(f'Upload exceeds the {self.max_upload_bytes} byte limit', 413)
+
+            body = tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD)
+            try:
+                size = 0
+                more_body = True
+                while more_body:
+                    message = await receive()
+                    chunk = message.get('body', b'')
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise UploadError(f'Upload exceeds the {self.max_upload_bytes} byte limit', 413)
+                    body.write(chunk)
+                    more_body = message.get('more_body', False)
+                body.seek(0)
+                metrics.BYTES_IN.inc(size)
+                result = await asyncio.to_thread(self.analyze_body, body, headers.get('content-type'), size,
+                                                 engine, ruleset, reuse_duplicates)
+            finally:
+                body.close()
+        except UploadError as e:
+            await self.respond_json(send, {'error': str(e)}, e.status)
+            return
+        except Exception as e:
+            await self.respond_json(send, {'error': f'Server error: {str(e)}'}, 500)
+            return
+        finally:
+            self.pending -= 1
+
+        if result is None:
+            await self.respond_json(send, {'error': 'No PDF file found'}, 400)
+        else:
+            await self.respond_json(send, result)
+
+    def analyze_body(self, body, content_type, size, engine=None, ruleset=None, reuse_duplicates=False):
+        # Runs on a helper thread: parsing and waiting on the pool both block
+        with metrics.span('read_body'):
+            form = parse_multipart(body, content_type, size, max_size=self.max_upload_bytes,
+                                   allowed_extensions=('.pdf',))
+        try:
+            if not form.files:
+                return None
+            part = form.files[0]
+            return analyze_pdf(part.file, cache=get_default_cache(), digest=part.sha256,
+                               executor=self.executor, engine=engine,
+                               job_description=form.fields.get('job_description'), name=part.filename,
+                               ruleset=ruleset, reuse_duplicates=reuse_duplicates)
+        finally:
+            form.close()
+
+    async def respond_metrics(self, send):
+        if not metrics.ENABLED:
+            await self.respond_json(send, {'error': 'Metrics are disabled (ANALYZER_METRICS=0)'}, 404)
+            return
+        await self.respond(send, 200, metrics.REGISTRY.render().encode(),
+                           [(b'content-type', metrics.CONTENT_TYPE.encode())])
+
+    async def respond_json(self, send, data, status=200, headers=()):
+        with metrics.span('serialize'):
+            body = json.dumps(data).encode()
+        timing = [(name.lower().encode(), value.encode()) for name, value in metrics.server_timing_headers().items()]
+        await self.respond(send, status, body, [(b'content-type', b'application/json')] + timing + list(headers))
+
+    async def respond(self, send, status, body, headers):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-length', str(len(body)).encode()),
+                (b'access-control-allow-origin', b'*'),
+            ] + headers,
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = AnalyzerApp()
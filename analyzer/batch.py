@@ -0,0 +1,300 @@
+"""
+Bulk resume scoring across a process pool.
+
+Usage:
+    python -m analyzer.batch resumes/ more.zip one.pdf [--workers 8] [--timeout 60] [--ruleset NAME]
+    python -m analyzer.batch resumes/ --columnar scores.rres
+
+Inputs may be PDF files, directories (searched recursively) or zip archives.
+A zip member larger than ANALYZER_ZIP_MAX_MEMBER_BYTES (default 10 MiB) once
+decompressed, or read after an archive's members have added up to
+ANALYZER_ZIP_MAX_TOTAL_BYTES (default 1 GiB), is reported as an error
+instead of being read. One JSON line is written per file as soon as it finishes, in completion order.
+With --columnar the results go to a columnar store instead (see
+analyzer.columnar); pass --output as well to get both.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from analyzer.cache import get_default_cache
+from analyzer.columnar import ResultWriter
+from analyzer.pipeline import analyze_pdf
+from analyzer.rules import RulesetError, get_ruleset
+
+DEFAULT_TIMEOUT = 60
+# Upload limits only cap the compressed size; these bound what a zip inflates to
+MAX_ZIP_MEMBER_BYTES = int(os.environ.get("ANALYZER_ZIP_MAX_MEMBER_BYTES", 10 * 1024 * 1024))
+MAX_ZIP_TOTAL_BYTES = int(os.environ.get("ANALYZER_ZIP_MAX_TOTAL_BYTES", 1024 * 1024 * 1024))
+ZIP_READ_CHUNK = 1024 * 1024
+
+
+class ZipLimitError(Exception):
+    """
+    A zip member that would decompress beyond the configured limits
+    """
+
+
+def _read_member(zf, info, limit):
+    # file_size comes from the archive and may lie, so the read is bounded too
+    if info.file_size > limit:
+        raise ZipLimitError(f"Decompresses to {info.file_size} bytes, more than the {limit} allowed")
+    chunks = []
+    size = 0
+    with zf.open(info) as member:
+        while True:
+            chunk = member.read(ZIP_READ_CHUNK)
+            if not chunk:
+                return b"".join(chunks)
+            size += len(chunk)
+            if size > limit:
+                raise ZipLimitError(f"Decompresses to more than the {limit} bytes allowed")
+            chunks.append(chunk)
+
+
+def iter_zip_pdfs(archive, prefix="", on_error=None, max_member_bytes=None, max_total_bytes=None):
+    """
+    Yield (name, bytes) for every PDF inside a zip archive (path or file object)
+
+    Members over max_member_bytes decompressed, or past max_total_bytes for
+    the whole archive, are not yielded: on_error(name, message) is called for
+    each instead (they are skipped when on_error is None).
+    """
+    max_member_bytes = MAX_ZIP_MEMBER_BYTES if max_member_bytes is None else max_member_bytes
+    max_total_bytes = MAX_ZIP_TOTAL_BYTES if max_total_bytes is None else max_total_bytes
+    total = 0
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                continue
+            remaining = max_total_bytes - total
+            try:
+                data = _read_member(zf, info, min(max_member_bytes, remaining))
+            except ZipLimitError as e:
+                message = str(e)
+                if remaining < max_member_bytes:
+                    message = f"Archive decompresses to more than the {max_total_bytes} bytes allowed"
+                if on_error is not None:
+                    on_error(prefix + info.filename, message)
+                continue
+            total += len(data)
+            yield prefix + info.filename, data
+
+
+def iter_pdf_sources(paths, on_error=None):
+    """
+    Yield (name, bytes) for every PDF reachable from the given paths
+    (on_error is passed on to iter_zip_pdfs)
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    full_path = os.path.join(root, filename)
+                    if filename.lower().endswith(".pdf"):
+                        with open(full_path, "rb") as f:
+                            yield full_path, f.read()
+                    elif filename.lower().endswith(".zip"):
+                        yield from iter_zip_pdfs(full_path, full_path + "/", on_error)
+        elif path.lower().endswith(".zip"):
+            yield from iter_zip_pdfs(path, path + "/", on_error)
+        else:
+            with open(path, "rb") as f:
+                yield path, f.read()
+
+
+def analyze_one(name, data, ruleset=None, reuse_duplicates=False):
+    """
+    Worker entry point: score one PDF and tag the result with its name
+    """
+    try:
+        result = analyze_pdf(data, cache=get_default_cache(), name=name, ruleset=ruleset,
+                             reuse_duplicates=reuse_duplicates)
+    except Exception as e:
+        result = {'error': f'Analysis failed: {e}'}
+    return {'file': name, **result}
+
+
+def _serial(sources, ruleset=None, reuse_duplicates=False):
+    for name, data in sources:
+        yield analyze_one(name, data, ruleset, reuse_duplicates)
+
+
+def analyze_many(sources, workers=None, timeout=DEFAULT_TIMEOUT, ruleset=None, reuse_duplicates=False,
+                 executor=None):
+    """
+    Score (name, bytes) pairs in parallel, yielding results as they complete
+
+    At most `workers` files are in flight, so a file's timeout is measured
+    from roughly when it starts running. A failing, crashing or timed-out
+    file produces an error entry without affecting the rest of the batch.
+    workers=0 scores everything in-process (for hosts without process pools).
+    ruleset names the scoring ruleset used for every file; reuse_duplicates
+    is passed on to analyze_pdf (near duplicates are only found across
+    worker processes when ANALYZER_DEDUP_DB is a SQLite file).
+
+    With an executor (say, analyzer.server's pool) files run there instead
+    of in a pool of the batch's own. That pool is shared, so it is never
+    restarted: a timed-out file is reported but keeps its worker until it
+    finishes, and a broken pool fails the rest of the batch.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 0:
+        yield from _serial(sources, ruleset, reuse_duplicates)
+        return
+
+    owned = executor is None
+    if owned:
+        try:
+            executor = _WorkerPool(workers)
+        except (OSError, NotImplementedError):
+            yield from _serial(sources, ruleset, reuse_duplicates)
+            return
+
+    sources = iter(sources)
+    in_flight = {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(in_flight) < workers:
+                try:
+                    name, data = next(sources)
+                except StopIteration:
+                    exhausted = True
+                    break
+                future = executor.submit(analyze_one, name, data, ruleset, reuse_duplicates)
+                in_flight[future] = (name, data, time.monotonic() + timeout)
+            if not in_flight:
+                break
+
+            next_deadline = min(deadline for _, _, deadline in in_flight.values())
+            done, _ = wait(in_flight, timeout=max(0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+
+            broken = False
+            for future in done:
+                name, _, _ = in_flight.pop(future)
+                try:
+                    yield future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    yield {'file': name, 'error': 'Worker process crashed'}
+                except Exception as e:
+                    yield {'file': name, 'error': f'Analysis failed: {e}'}
+
+            now = time.monotonic()
+            timed_out = [future for future, (_, _, deadline) in in_flight.items() if deadline <= now]
+            for future in timed_out:
+                name, _, _ = in_flight.pop(future)
+                yield {'file': name, 'error': f'Timed out after {timeout}s'}
+
+            if broken:
+                # A dead worker poisons the whole pool and we cannot tell which
+                # file killed it, so everything still running is reported failed
+                for name, _, _ in in_flight.values():
+                    yield {'file': name, 'error': 'Worker process crashed'}
+                in_flight.clear()
+                if not owned:
+                    for name, _ in sources:
+                        yield {'file': name, 'error': 'Worker process crashed'}
+                    break
+                executor = _restart_pool(executor, workers)
+            elif timed_out and owned:
+                # The stuck worker can only be stopped by killing the pool;
+                # innocent in-flight files are resubmitted with a fresh deadline
+                executor = _restart_pool(executor, workers)
+                retry = list(in_flight.values())
+                in_flight.clear()
+                for name, data, _ in retry:
+                    future = executor.submit(analyze_one, name, data, ruleset, reuse_duplicates)
+                    in_flight[future] = (name, data, time.monotonic() + timeout)
+    finally:
+        if owned:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            for future in in_flight:
+                future.cancel()
+
+
+def _report_pid(pids):
+    pids.put(os.getpid())
+
+
+class _WorkerPool(ProcessPoolExecutor):
+    """
+    Process pool whose workers report their pids, so stuck ones can be killed
+    """
+
+    def __init__(self, workers):
+        self._pids = multiprocessing.SimpleQueue()
+        super().__init__(max_workers=workers, initializer=_report_pid, initargs=(self._pids,))
+
+    def kill(self):
+        pids = set()
+        while not self._pids.empty():
+            pids.add(self._pids.get())
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self.shutdown(wait=False, cancel_futures=True)
+
+
+def _restart_pool(executor, workers):
+    executor.kill()
+    return _WorkerPool(workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score many resume PDFs and stream JSON Lines results")
+    parser.add_argument("paths", nargs="+", help="PDF files, directories or zip archives")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="seconds allowed per file")
+    parser.add_argument("--output", default=None,
+                        help="JSON Lines output file, - for stdout (default: stdout unless --columnar is given)")
+    parser.add_argument("--columnar", metavar="PATH", default=None, help="write results to a columnar store")
+    parser.add_argument("--ruleset", default=None, help="scoring ruleset (default: ANALYZER_RULESET)")
+    parser.add_argument("--reuse-duplicates", action="store_true",
+                        help="return a near duplicate's earlier result instead of rescoring (needs ANALYZER_DEDUP_DB)")
+    args = parser.parse_args(argv)
+    try:
+        rules = get_ruleset(args.ruleset)
+    except RulesetError as e:
+        parser.error(str(e))
+
+    output = args.output or (None if args.columnar else "-")
+    out = None
+    if output is not None:
+        out = sys.stdout if output == "-" else open(output, "w")
+    store = ResultWriter(args.columnar, rules.sections, rules.key) if args.columnar else None
+
+    def emit(result):
+        if out is not None:
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+        if store is not None:
+            store.write(result)
+
+    try:
+        sources = iter_pdf_sources(args.paths, lambda name, message: emit({'file': name, 'error': message}))
+        for result in analyze_many(sources, args.workers, args.timeout, args.ruleset, args.reuse_duplicates):
+            emit(result)
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+        if store is not None:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Content-addressed cache for analysis results.
+
+Results are keyed by the SHA-256 of the raw PDF bytes plus SCORING_VERSION,
+so re-uploading the same file skips text extraction and scoring entirely.
+Bump SCORING_VERSION whenever a scorer changes its output.
+
+Two tiers are available:
+- an in-process LRU (bounded by entry count and TTL)
+- an optional SQLite file shared by every worker on the host
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+SCORING_VERSION = "3"
+
+
+def content_digest(data):
+    """
+    Return the hex SHA-256 digest of the raw upload bytes
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(digest, *parts):
+    """
+    Build a cache key from a content digest and any extra variant parts
+    """
+    return ":".join((digest, SCORING_VERSION) + tuple(str(part) for part in parts))
+
+
+class SQLiteTier:
+    """
+    Disk tier backed by a single SQLite file (safe to share across processes)
+    """
+
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and time.time() - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                (key, payload, time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+
+class ResultCache:
+    """
+    In-process LRU with TTL eviction and an optional shared disk tier.
+
+    Cached values are returned as-is; callers must treat them as read-only.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, disk=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = disk
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def _store(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    Return the process-wide cache, configured from the environment:
+
+    ANALYZER_CACHE_SIZE  max in-memory entries (default 256)
+    ANALYZER_CACHE_TTL   seconds an entry stays valid (default 3600)
+    ANALYZER_CACHE_DB    path of the shared SQLite tier (disabled when unset)
+    """
+    global _default_cache
+    if _default_cache is not None:
+        return _default_cache
+    with _default_lock:
+        # Concurrent first requests must not each build (and open) a cache
+        if _default_cache is None:
+            max_entries = int(os.environ.get("ANALYZER_CACHE_SIZE", 256))
+            ttl = float(os.environ.get("ANALYZER_CACHE_TTL", 3600))
+            db_path = os.environ.get("ANALYZER_CACHE_DB")
+            disk = SQLiteTier(db_path, ttl=ttl) if db_path else None
+            _default_cache = ResultCache(max_entries=max_entries, ttl=ttl, disk=disk)
+        return _default_cache
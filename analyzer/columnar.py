@@ -0,0 +1,341 @@
+"""
+Columnar store for bulk scoring results.
+
+Usage:
+    python -m analyzer.columnar summary scores.rres
+    python -m analyzer.columnar export scores.rres scores.parquet   # requires pyarrow
+
+A store is one record file plus a ".labels" file beside it. The record
+file is a JSON header followed by fixed-width little-endian rows (scores
+as float32, counts as unsigned integers, section_details and suggestion
+ids as bitmasks), so a row takes 45 bytes and a million results load as
+a memory-mapped NumPy structured array without parsing anything. The bit
+order of the masks is recorded in the header. File names and error
+messages, the only variable-length fields, go to the labels file as one
+JSON line per row. Text previews and suggestion messages are not stored.
+
+Rows are appended in blocks by ResultWriter; the row count is derived
+from the file size, so a store can be read while it is still being
+written (a partially written row at the end is ignored).
+"""
+import argparse
+import itertools
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from analyzer.engines import ENGINES
+from analyzer.scoring import SUGGESTION_IDS
+
+MAGIC = b"RRES"
+FORMAT_VERSION = 1
+LABELS_SUFFIX = ".labels"
+FLUSH_ROWS = 4096
+# Masks are 32 bits wide
+MAX_FLAGS = 32
+
+# Row status codes
+OK = 0
+FAILED = 1
+
+# Engine codes: 0 is unknown, then the engines in registry order
+ENGINE_NAMES = (None,) + tuple(ENGINES)
+
+RECORD_DTYPE = np.dtype([
+    ("status", "u1"),
+    ("engine", "u1"),
+    ("truncated", "u1"),
+    ("page_count", "<u2"),
+    ("word_count", "<u4"),
+    ("character_count", "<u4"),
+    ("total_score", "<f4"),
+    ("keyword_score", "<f4"),
+    ("readability_score", "<f4"),
+    ("section_score", "<f4"),
+    ("length_score", "<f4"),
+    # NaN when no job description was given
+    ("job_match_score", "<f4"),
+    ("sections", "<u4"),
+    ("suggestions", "<u4"),
+])
+SCORE_COLUMNS = ("total_score", "keyword_score", "readability_score", "section_score", "length_score",
+                 "job_match_score")
+
+
+class ColumnarFormatError(Exception):
+    pass
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _mask(names, bits):
+    mask = 0
+    for name in names:
+        bit = bits.get(name)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+class ResultWriter:
+    """
+    Appends result dicts (as produced by analyze_pdf or analyze_many) to a store
+
+    sections lists the section names in bit order, normally the keys of
+    the ruleset's sections; sections outside the list are not recorded.
+    """
+
+    def __init__(self, path, sections, ruleset=None, flush_rows=FLUSH_ROWS):
+        sections = list(sections)
+        if len(sections) > MAX_FLAGS:
+            raise ValueError(f"At most {MAX_FLAGS} sections can be stored, got {len(sections)}")
+        self.path = path
+        self.flush_rows = flush_rows
+        self.rows = 0
+        self._section_bits = {name: bit for bit, name in enumerate(sections)}
+        self._suggestion_bits = {name: bit for bit, name in enumerate(SUGGESTION_IDS)}
+        self._engine_codes = {name: code for code, name in enumerate(ENGINE_NAMES)}
+        self._records = []
+        self._labels = []
+
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "dtype": RECORD_DTYPE.descr,
+            "sections": sections,
+            "suggestions": list(SUGGESTION_IDS),
+            "engines": list(ENGINE_NAMES),
+            "ruleset": ruleset,
+            "created": round(time.time(), 3),
+        }).encode()
+        self._file = open(path, "wb")
+        self._labels_file = open(path + LABELS_SUFFIX, "w", encoding="utf-8")
+        prefix = MAGIC + struct.pack("<I", len(header)) + header
+        self._file.write(prefix + b"\0" * (_align(len(prefix)) - len(prefix)))
+
+    def record(self, result):
+        """
+        Row tuple for one result dict
+        """
+        if 'error' in result:
+            return (FAILED, 0, 0, 0, 0, 0, math.nan, math.nan, math.nan, math.nan, math.nan, math.nan, 0, 0)
+        job_match = result.get('job_match')
+        return (
+            OK,
+            self._engine_codes.get(result.get('extraction_engine'), 0),
+            bool(result.get('truncated')),
+            min(result.get('page_count') or 0, 0xFFFF),
+            result['word_count'],
+            result['character_count'],
+            result['total_score'],
+            result['keyword_score'],
+            result['readability_score'],
+            result['section_score'],
+            result['length_score'],
+            job_match['match_score'] if job_match else math.nan,
+            _mask((name for name, found in result['section_details'].items() if found), self._section_bits),
+            _mask((suggestion['id'] for suggestion in result['suggestions']), self._suggestion_bits),
+        )
+
+    def write(self, result, name=None):
+        """
+        Buffer one result; name defaults to its 'file' entry
+        """
+        self._records.append(self.record(result))
+        label = {'file': name if name is not None else result.get('file')}
+        if 'error' in result:
+            label['error'] = result['error']
+        self._labels.append(json.dumps(label))
+        if len(self._records) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._records:
+            return
+        # Labels first, so every complete row already has its label
+        self._labels_file.write("\n".join(self._labels) + "\n")
+        self._labels_file.flush()
+        self._file.write(np.array(self._records, dtype=RECORD_DTYPE).tobytes())
+        self._file.flush()
+        self.rows += len(self._records)
+        self._records = []
+        self._labels = []
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        self._labels_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ResultReader:
+    """
+    Memory-mapped, read-only view of a store
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(8)
+            if len(prefix) < 8 or prefix[:4] != MAGIC:
+                raise ColumnarFormatError(f"Not a result store: {path}")
+            header_length = struct.unpack("<I", prefix[4:])[0]
+            self.header = json.loads(f.read(header_length))
+            size = os.fstat(f.fileno()).st_size
+            if self.header["version"] != FORMAT_VERSION:
+                raise ColumnarFormatError(f"Unsupported store version {self.header['version']}: {path}")
+            self.dtype = np.dtype([tuple(field) for field in self.header["dtype"]])
+            start = _align(8 + header_length)
+            count = max(0, size - start) // self.dtype.itemsize
+            if count:
+                self._mmap = mmap.mmap(f.fileno(), start + count * self.dtype.itemsize, access=mmap.ACCESS_READ)
+                self.records = np.frombuffer(self._mmap, dtype=self.dtype, count=count, offset=start)
+            else:
+                self.records = np.zeros(0, dtype=self.dtype)
+        self.sections = self.header["sections"]
+        self.suggestions = self.header["suggestions"]
+        self.engines = self.header["engines"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, column):
+        return self.records[column]
+
+    @property
+    def ok(self):
+        """
+        Boolean mask of the rows that were scored
+        """
+        return self.records["status"] == OK
+
+    def has_section(self, name):
+        """
+        Boolean mask of the rows where a section was found
+        """
+        if name not in self.sections:
+            raise KeyError(f"Unknown section: {name}")
+        return (self.records["sections"] & np.uint32(1 << self.sections.index(name))) != 0
+
+    def has_suggestion(self, suggestion_id):
+        """
+        Boolean mask of the rows that received a suggestion
+        """
+        if suggestion_id not in self.suggestions:
+            raise KeyError(f"Unknown suggestion id: {suggestion_id}")
+        return (self.records["suggestions"] & np.uint32(1 << self.suggestions.index(suggestion_id))) != 0
+
+    def labels(self):
+        """
+        Label dict ({'file': ...} plus 'error' for failures) of every row
+        """
+        with open(self.path + LABELS_SUFFIX, encoding="utf-8") as f:
+            return [json.loads(line) for line in itertools.islice(f, len(self))]
+
+    def summary(self, percentiles=(10, 25, 50, 75, 90)):
+        """
+        Counts, score distributions and section/suggestion rates of the scored rows
+        """
+        ok = self.ok
+        scored = self.records[ok]
+        summary = {
+            "rows": len(self),
+            "scored": int(ok.sum()),
+            "failed": int(len(self) - ok.sum()),
+            "scores": {},
+            "sections": {},
+            "suggestions": {},
+        }
+        if not len(scored):
+            return summary
+        for column in SCORE_COLUMNS + ("word_count",):
+            values = scored[column].astype(np.float64)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            summary["scores"][column] = {
+                "mean": round(float(values.mean()), 3),
+                "min": round(float(values.min()), 3),
+                "max": round(float(values.max()), 3),
+                **{f"p{p}": round(float(value), 3) for p, value in zip(percentiles, np.percentile(values, percentiles))},
+            }
+        for bit, name in enumerate(self.sections):
+            summary["sections"][name] = round(float(((scored["sections"] >> bit) & 1).mean()), 4)
+        for bit, name in enumerate(self.suggestions):
+            summary["suggestions"][name] = round(float(((scored["suggestions"] >> bit) & 1).mean()), 4)
+        return summary
+
+    def to_arrow(self):
+        """
+        pyarrow Table with one column per field (plus file and error), the
+        masks expanded to a boolean column per section and suggestion
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RuntimeError("pyarrow is required for Arrow/Parquet export (pip install pyarrow)")
+        labels = self.labels()
+        columns = {
+            "file": pa.array([label.get("file") for label in labels], pa.string()),
+            "error": pa.array([label.get("error") for label in labels], pa.string()),
+            "status": pa.array(np.where(self.ok, "ok", "failed")),
+            # Code 0 (unknown engine) becomes null
+            "engine": pa.DictionaryArray.from_arrays(
+                pa.array(self.records["engine"].astype(np.int8) - 1, mask=self.records["engine"] == 0),
+                pa.array(self.engines[1:], pa.string())),
+        }
+        for name in self.dtype.names:
+            if name not in ("status", "engine", "sections", "suggestions"):
+                columns[name] = pa.array(self.records[name])
+        columns["truncated"] = pa.array(self.records["truncated"].astype(bool))
+        for name in self.sections:
+            columns[f"section_{name}"] = pa.array(self.has_section(name))
+        for name in self.suggestions:
+            columns[f"suggestion_{name}"] = pa.array(self.has_suggestion(name))
+        metadata = {"ruleset": json.dumps(self.header.get("ruleset"))}
+        return pa.table(columns, metadata=metadata)
+
+    def export_parquet(self, path):
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or export a columnar result store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="print score distributions as JSON")
+    summary.add_argument("store")
+    export = commands.add_parser("export", help="write the store as Parquet (requires pyarrow)")
+    export.add_argument("store")
+    export.add_argument("output")
+    args = parser.parse_args(argv)
+
+    reader = ResultReader(args.store)
+    if args.command == "summary":
+        print(json.dumps(reader.summary(), indent=2))
+    else:
+        try:
+            reader.export_parquet(args.output)
+        except (ImportError, RuntimeError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Wrote {len(reader)} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
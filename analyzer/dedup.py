@@ -0,0 +1,264 @@
+"""
+Near-duplicate resume detection with MinHash signatures and LSH banding.
+
+Re-exported PDFs, lightly edited resumes and the same candidate applying
+to several openings all have different bytes, so the content-hash cache
+misses them. Each analyzed document gets a MinHash signature over its
+word 3-shingles (taken from the same token stream the keyword scorer
+reads); the fraction of equal signature slots estimates the Jaccard
+similarity of the two shingle sets. Signatures are split into BANDS bands
+and a document is a candidate whenever one band matches exactly, so a
+lookup is a few dozen hash probes plus a vectorized comparison against
+the candidates, independent of the corpus size.
+
+Set ANALYZER_DEDUP_DB to a SQLite file (shared by every worker process on
+the host) or to :memory: for a per-process index. Results then carry a
+duplicate_of entry when an earlier resume is at least
+ANALYZER_DEDUP_THRESHOLD similar, and callers that opt in with
+reuse_duplicates get that earlier analysis back instead of a fresh one.
+Text still has to be extracted to compute the signature; reuse saves the
+scoring, job matching and indexing that follow.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.85
+MAX_ENTRIES = 100_000
+# Candidates compared per lookup; only the most recent ones are kept
+MAX_CANDIDATES = 512
+
+# Fixed multiply-add-shift hash coefficients, derived from their index so
+# signatures stay comparable across processes, runs and numpy versions
+_A = np.array([int.from_bytes(hashlib.blake2b(b"minhash-a%d" % i, digest_size=8).digest(), "little") | 1
+               for i in range(NUM_PERM)], dtype=np.uint64)[:, None]
+_B = np.array([int.from_bytes(hashlib.blake2b(b"minhash-b%d" % i, digest_size=8).digest(), "little")
+               for i in range(NUM_PERM)], dtype=np.uint64)[:, None]
+_MIX = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+
+Match = namedtuple("Match", "id digest name similarity variant")
+
+
+def shingle_hashes(tokens):
+    """
+    32-bit hashes of the word SHINGLE_SIZE-grams of a token list, in order
+    (repeats are kept: they cannot change a minimum)
+    """
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    # Each distinct token is hashed once
+    vocabulary = dict.fromkeys(tokens)
+    codes = dict(zip(vocabulary, map(zlib.crc32, map(str.encode, vocabulary))))
+    hashes = np.fromiter(map(codes.__getitem__, tokens), dtype=np.uint64, count=len(tokens))
+    if len(hashes) >= SHINGLE_SIZE:
+        # Fold each window into one value: h0 * m0 + h1 * m1 + h2 (mod 2**64)
+        combined = hashes[SHINGLE_SIZE - 1:].copy()
+        for offset, mix in enumerate(_MIX[:SHINGLE_SIZE - 1]):
+            combined += hashes[offset:len(hashes) - SHINGLE_SIZE + 1 + offset] * mix
+        hashes = (combined ^ (combined >> np.uint64(32))) & np.uint64(0xFFFFFFFF)
+    return hashes
+
+
+def minhash(tokens):
+    """
+    NUM_PERM-slot uint32 MinHash signature of a token list, or None when it is empty
+    """
+    shingles = shingle_hashes(tokens)
+    if not len(shingles):
+        return None
+    # (a * x + b) mod 2**64, top 32 bits: one universal hash per slot
+    hashed = np.multiply(_A, shingles[None, :])
+    hashed += _B
+    hashed >>= np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def similarity(first, second):
+    """
+    Estimated Jaccard similarity of two signatures
+    """
+    return float(np.count_nonzero(first == second)) / NUM_PERM
+
+
+def band_keys(signature):
+    """
+    One bytes key per band; the band number is part of the key
+    """
+    data = signature.tobytes()
+    width = ROWS * signature.itemsize
+    return [bytes((band,)) + data[band * width:(band + 1) * width] for band in range(BANDS)]
+
+
+class MemoryDedupIndex:
+    """
+    In-process LSH index, bounded to max_entries (oldest evicted first)
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def add(self, signature, digest, name=None, result=None, variant=""):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            keys = band_keys(signature)
+            self._entries[entry_id] = (signature, digest, name, variant, result, keys)
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                old_id, old = self._entries.popitem(last=False)
+                for key in old[5]:
+                    bucket = self._buckets[key]
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del self._buckets[key]
+            return entry_id
+
+    def query(self, signature, threshold=DEFAULT_THRESHOLD):
+        """
+        Entries at least threshold similar, most similar first
+        """
+        with self._lock:
+            ids = set()
+            for key in band_keys(signature):
+                ids.update(self._buckets.get(key, ()))
+            ids = sorted(ids)[-MAX_CANDIDATES:]
+            entries = [(entry_id, self._entries[entry_id]) for entry_id in ids]
+        return _rank(signature, [(entry_id, entry[:4]) for entry_id, entry in entries], threshold)
+
+    def result(self, entry_id):
+        with self._lock:
+            entry = self._entries.get(entry_id)
+        return entry[4] if entry is not None else None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteDedupIndex:
+    """
+    LSH index in a SQLite file (safe to share across processes)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY, digest TEXT NOT NULL, name TEXT, variant TEXT NOT NULL, "
+            "signature BLOB NOT NULL, result TEXT, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bands (key BLOB NOT NULL, document INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_key ON bands (key)")
+        self._conn.commit()
+
+    def add(self, signature, digest, name=None, result=None, variant=""):
+        payload = json.dumps(result) if result is not None else None
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO documents (digest, name, variant, signature, result, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, name, variant, signature.tobytes(), payload, time.time()),
+            )
+            entry_id = cursor.lastrowid
+            self._conn.executemany("INSERT INTO bands (key, document) VALUES (?, ?)",
+                                   [(key, entry_id) for key in band_keys(signature)])
+            self._conn.commit()
+        return entry_id
+
+    def query(self, signature, threshold=DEFAULT_THRESHOLD):
+        """
+        Entries at least threshold similar, most similar first
+        """
+        keys = band_keys(signature)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, signature, digest, name, variant FROM documents WHERE id IN ("
+                f"SELECT DISTINCT document FROM bands WHERE key IN ({', '.join('?' * len(keys))}) "
+                "ORDER BY document DESC LIMIT ?)",
+                (*keys, MAX_CANDIDATES),
+            ).fetchall()
+        entries = [(row[0], (np.frombuffer(row[1], dtype=np.uint32),) + row[2:]) for row in rows]
+        return _rank(signature, entries, threshold)
+
+    def result(self, entry_id):
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM documents WHERE id = ?", (entry_id,)).fetchone()
+        return json.loads(row[0]) if row is not None and row[0] is not None else None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def _rank(signature, entries, threshold):
+    # entries: (id, (signature, digest, name, variant)) pairs
+    if not entries:
+        return []
+    signatures = np.stack([entry[0] for _, entry in entries])
+    scores = np.count_nonzero(signatures == signature, axis=1) / NUM_PERM
+    matches = [Match(entry_id, entry[1], entry[2], round(float(score), 4), entry[3])
+               for (entry_id, entry), score in zip(entries, scores) if score >= threshold]
+    matches.sort(key=lambda match: (-match.similarity, -match.id))
+    return matches
+
+
+def find_duplicates(token_lists, threshold=DEFAULT_THRESHOLD):
+    """
+    For each token list, the index of the most similar earlier list it
+    nearly duplicates (the latest one on a tie) and their similarity, or None
+    """
+    index = MemoryDedupIndex(max_entries=len(token_lists) or 1)
+    found = []
+    for position, tokens in enumerate(token_lists):
+        signature = minhash(tokens)
+        if signature is None:
+            found.append(None)
+            continue
+        matches = index.query(signature, threshold)
+        found.append((matches[0].digest, matches[0].similarity) if matches else None)
+        # The position stands in for a digest
+        index.add(signature, position)
+    return found
+
+
+def dedup_threshold():
+    return float(os.environ.get("ANALYZER_DEDUP_THRESHOLD", DEFAULT_THRESHOLD))
+
+
+_default_index = None
+_default_path = None
+_default_lock = threading.Lock()
+
+
+def get_default_dedup():
+    """
+    Process-wide index configured by ANALYZER_DEDUP_DB, or None when unset
+    """
+    global _default_index, _default_path
+    path = os.environ.get("ANALYZER_DEDUP_DB")
+    if not path:
+        return None
+    with _default_lock:
+        if _default_index is None or _default_path != path:
+            _default_index = MemoryDedupIndex() if path == ":memory:" else SQLiteDedupIndex(path)
+            _default_path = path
+        return _default_index
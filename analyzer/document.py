@@ -0,0 +1,79 @@
+"""
+Precomputed view of a resume's text shared by every scorer.
+
+Each derived representation is computed at most once per document, so the
+scorers no longer re-split or re-lowercase the full text on their own.
+"""
+import re
+from functools import cached_property
+
+from analyzer.keywords import TOKEN_PATTERN
+from analyzer.readability import TextStats
+
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+[.!?]*")
+
+
+class Document:
+    """
+    Extracted resume text plus lazily computed, cached derivatives
+    """
+
+    def __init__(self, text, pages=None, extraction=None, emphasis=None):
+        self.text = text
+        self.pages = pages if pages is not None else [text]
+        # ExtractionReport from analyzer.extraction, when built from a PDF
+        self.extraction = extraction
+        # Keys of lines set in a larger or bold font (None: layout unknown)
+        self.emphasis = emphasis
+        self._sections = {}
+
+    @classmethod
+    def from_pages(cls, pages, extraction=None, emphasis=None):
+        """
+        Build a document from per-page text, skipping empty pages
+        """
+        pages = [page for page in pages if page]
+        return cls("\n".join(pages).strip(), pages, extraction, emphasis)
+
+    @cached_property
+    def lower(self):
+        return self.text.lower()
+
+    @cached_property
+    def tokens(self):
+        return TOKEN_PATTERN.findall(self.lower)
+
+    @cached_property
+    def words(self):
+        return self.text.split()
+
+    @property
+    def word_count(self):
+        return len(self.words)
+
+    @property
+    def character_count(self):
+        return len(self.text)
+
+    @cached_property
+    def sentences(self):
+        """
+        (start, end) character offsets of each sentence-like span
+        """
+        return [match.span() for match in SENTENCE_PATTERN.finditer(self.text) if match.group().strip()]
+
+    @cached_property
+    def readability(self):
+        return TextStats(self.text)
+
+    def sections(self, segmenter):
+        """
+        Segmentation of the text by a SectionSegmenter, computed once per segmenter
+        """
+        segmentation = self._sections.get(segmenter)
+        if segmentation is None:
+            segmentation = self._sections[segmenter] = segmenter.segment(self.text, self.emphasis, self.lower)
+        return segmentation
+
+    def preview(self, limit):
+        return self.text[:limit] + "..." if len(self.text) > limit else self.text
@@ -0,0 +1,249 @@
+"""
+Pluggable PDF text extraction engines.
+
+pdfplumber computes character-level layout that scoring never uses, so
+"auto" mode first tries a fast engine that only reads the text stream
+(pypdfium2, then pypdf, whichever is installed) and falls back to
+pdfplumber when the fast output fails a quick quality check.
+
+Every engine opens a document handle exposing page_count and
+page_content(number) with 1-based page numbers. It returns the page text
+and the lines set in a larger or bold font (the layout cue used to find
+section headings), or None when the engine cannot see fonts. Only the
+first character of each line is inspected, so the cue costs a few
+lookups per line rather than a full character layout; pypdfium2 only
+looks up lines short enough to be headings and a sample of the rest.
+PDFium is not thread-safe, so pypdfium2 documents take turns on one lock.
+"""
+import ctypes
+import importlib.util
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+MIN_CHARS_PER_PAGE = 100
+MAX_GARBLED_RATIO = 0.05
+# A line in a font this much larger than the body text counts as emphasized
+EMPHASIS_SIZE_RATIO = 1.1
+# Longer lines are body text (see analyzer.sections)
+HEADING_MAX_CHARS = 80
+# Long lines whose style is looked up to establish the body style
+BODY_SAMPLE_LINES = 8
+BOLD_FONT_PATTERN = re.compile(r"bold|black|heavy|demi", re.IGNORECASE)
+# FPDF_FONT_FORCEBOLD in PDFium's font flags
+PDFIUM_FORCE_BOLD = 1 << 18
+WHITESPACE = re.compile(r"\s+")
+
+CID_PATTERN = re.compile(r"\(cid:\d+\)")
+# Replacement char, private-use glyphs and control chars other than \t and \n
+GARBLED_PATTERN = re.compile("[\ufffd\ue000-\uf8ff\x00-\x08\x0b-\x1f]")
+# PDFium is not thread-safe: every call into it, on any document, holds this
+PDFIUM_LOCK = threading.Lock()
+
+
+def line_key(line):
+    """
+    Case- and whitespace-insensitive form of a text line, for matching the
+    same line across engines' differing word spacing
+    """
+    return WHITESPACE.sub("", line).lower()
+
+
+def emphasized_lines(lines):
+    """
+    Keys of the lines that stand out from the body text
+
+    lines holds (text, font size, bold) per line, described by its first
+    character. The body style is the one covering the most characters; a
+    line is emphasized when its font is larger, or bold while the body is not.
+    """
+    sizes = Counter()
+    bold_chars = 0
+    total = 0
+    for text, size, bold in lines:
+        sizes[size] += len(text)
+        bold_chars += len(text) if bold else 0
+        total += len(text)
+    if not total:
+        return ()
+    body_size = sizes.most_common(1)[0][0]
+    body_bold = bold_chars * 2 > total
+    return tuple(line_key(text) for text, size, bold in lines
+                 if size >= body_size * EMPHASIS_SIZE_RATIO or (bold and not body_bold))
+
+
+class PdfplumberDocument:
+    def __init__(self, pdf_file):
+        import pdfplumber
+        from pdfplumber.utils import cluster_objects
+
+        self._pdf = pdfplumber.open(pdf_file)
+        self._cluster = cluster_objects
+        self.page_count = len(self._pdf.pages)
+
+    def page_content(self, number):
+        page = self._pdf.pages[number - 1]
+        text = page.extract_text() or ""
+        lines = []
+        # Same line grouping as extract_text (default y tolerance of 3)
+        for row in self._cluster(page.chars, "doctop", 3):
+            row.sort(key=lambda char: char["x0"])
+            first = next((char for char in row if not char["text"].isspace()), None)
+            if first is not None:
+                lines.append(("".join(char["text"] for char in row), round(first["size"], 1),
+                              bool(BOLD_FONT_PATTERN.search(first["fontname"]))))
+        # Drop the parsed layout objects; only the text and line styles are kept
+        page.flush_cache()
+        return text, emphasized_lines(lines)
+
+    def close(self):
+        self._pdf.close()
+
+
+class PdfiumDocument:
+    def __init__(self, pdf_file):
+        import pypdfium2
+        import pypdfium2.raw
+
+        with PDFIUM_LOCK:
+            self._pdf = pypdfium2.PdfDocument(pdf_file)
+            self.page_count = len(self._pdf)
+        self._raw = pypdfium2.raw
+        self._font_name = ctypes.create_string_buffer(128)
+        self._font_flags = ctypes.c_int()
+
+    def page_content(self, number):
+        with PDFIUM_LOCK:
+            page = self._pdf[number - 1]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                    lines = self._line_styles(textpage.raw, text)
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+        # PDFium uses CRLF line ends and marks soft hyphens with control chars
+        return text.replace("\r\n", "\n").replace("\x02", "").replace("\ufffe", ""), emphasized_lines(lines)
+
+    def _line_styles(self, textpage, text):
+        # Character indexes of the text page line up with offsets in its full text
+        raw = self._raw
+        lines = []
+        offset = 0
+        body_samples = 0
+        for line in text.split("\n"):
+            stripped = line.lstrip()
+            length = len(stripped.rstrip())
+            if length and (length <= HEADING_MAX_CHARS or body_samples < BODY_SAMPLE_LINES):
+                body_samples += length > HEADING_MAX_CHARS
+                index = offset + len(line) - len(stripped)
+                raw.FPDFText_GetFontInfo(textpage, index, self._font_name, len(self._font_name),
+                                         ctypes.byref(self._font_flags))
+                bold = (self._font_flags.value & PDFIUM_FORCE_BOLD
+                        or BOLD_FONT_PATTERN.search(self._font_name.value.decode("latin-1")))
+                lines.append((stripped.rstrip(), round(raw.FPDFText_GetFontSize(textpage, index), 1), bool(bold)))
+            offset += len(line) + 1
+        return lines
+
+    def close(self):
+        with PDFIUM_LOCK:
+            self._pdf.close()
+
+
+class PypdfDocument:
+    def __init__(self, pdf_file):
+        from pypdf import PdfReader
+
+        self._reader = PdfReader(pdf_file)
+        self.page_count = len(self._reader.pages)
+
+    def page_content(self, number):
+        return self._reader.pages[number - 1].extract_text() or "", None
+
+    def close(self):
+        pass
+
+
+class Engine:
+    """
+    An extraction backend: a name, the module it needs and its document type
+    """
+
+    def __init__(self, name, module, document_class):
+        self.name = name
+        self.module = module
+        self.document_class = document_class
+
+    def available(self):
+        return importlib.util.find_spec(self.module) is not None
+
+    def load(self):
+        """
+        Import the backend now rather than on the first open()
+        """
+        importlib.import_module(self.module)
+
+    def open(self, pdf_file):
+        return EngineSession(self.document_class(pdf_file))
+
+
+class EngineSession:
+    # Context manager so callers always release the native document
+    def __init__(self, document):
+        self.document = document
+
+    def __enter__(self):
+        return self.document
+
+    def __exit__(self, *exc_info):
+        self.document.close()
+
+
+ENGINES = {
+    engine.name: engine for engine in (
+        Engine("pdfplumber", "pdfplumber", PdfplumberDocument),
+        Engine("pypdfium2", "pypdfium2", PdfiumDocument),
+        Engine("pypdf", "pypdf", PypdfDocument),
+    )
+}
+FAST_ENGINES = ("pypdfium2", "pypdf")
+FALLBACK_ENGINE = "pdfplumber"
+ENGINE_CHOICES = ("auto",) + tuple(ENGINES)
+
+
+def get_engine(name):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown extraction engine: {name}")
+    return ENGINES[name]
+
+
+@lru_cache(maxsize=None)
+def fast_engine():
+    """
+    Name of the first installed fast engine, or None
+    """
+    for name in FAST_ENGINES:
+        if ENGINES[name].available():
+            return name
+    return None
+
+
+def text_quality_problem(texts):
+    """
+    Quick plausibility check of extracted page texts
+    Returns a short reason when the text looks unusable, otherwise None
+    """
+    if not texts:
+        return "no pages"
+    joined = "".join(texts)
+    visible = len("".join(joined.split()))
+    if visible < MIN_CHARS_PER_PAGE * len(texts):
+        return "too few characters"
+
+    garbled = len(CID_PATTERN.findall(joined)) * 5 + len(GARBLED_PATTERN.findall(joined))
+    if garbled / visible > MAX_GARBLED_RATIO:
+        return "garbled glyphs"
+    return None
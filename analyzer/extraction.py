@@ -0,0 +1,284 @@
+"""
+PDF text extraction.
+
+Pages are produced lazily by iter_pages, so a consumer can stop as soon as
+it has enough text, and extraction halts early once any limit is reached:
+
+ANALYZER_MAX_PAGES        pages to extract (default 50)
+ANALYZER_MAX_CHARS        characters to extract (default 200000)
+ANALYZER_EXTRACT_TIMEOUT  wall-clock seconds for the whole document (default 20)
+ANALYZER_EXTRACT_WORKERS  processes for parallel page extraction (default 0: serial)
+ANALYZER_PDF_ENGINE       auto (default), pdfplumber, pypdfium2 or pypdf; see analyzer.engines
+"""
+import io
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from analyzer.engines import FALLBACK_ENGINE, fast_engine, get_engine, text_quality_problem
+
+# emphasis: keys of the page's larger or bold lines, None if the engine has no font information
+PageText = namedtuple("PageText", "number text seconds emphasis", defaults=(None,))
+
+
+class ExtractionLimits:
+    """
+    Early-exit limits for one extraction (None disables a limit)
+    """
+
+    def __init__(self, max_pages=None, max_chars=None, time_budget=None):
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.time_budget = time_budget
+
+    def remaining(self, elapsed):
+        """
+        The same limits with `elapsed` seconds taken off the time budget
+        """
+        budget = None if self.time_budget is None else max(0.0, self.time_budget - elapsed)
+        return ExtractionLimits(self.max_pages, self.max_chars, budget)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_pages=int(os.environ.get("ANALYZER_MAX_PAGES", 50)),
+            max_chars=int(os.environ.get("ANALYZER_MAX_CHARS", 200000)),
+            time_budget=float(os.environ.get("ANALYZER_EXTRACT_TIMEOUT", 20)),
+        )
+
+
+class ExtractionError(Exception):
+    """
+    An extraction that stopped early; kind is one of EXTRACTION_ERROR_KINDS
+    """
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+    def as_dict(self):
+        return {"type": self.kind, "message": str(self)}
+
+
+# timeout: wall-clock kill; memory: address-space limit or MemoryError;
+# cpu: CPU-time limit; parse: the engine raised; crash: the worker died otherwise
+EXTRACTION_ERROR_KINDS = ("timeout", "memory", "cpu", "parse", "crash")
+
+
+class ExtractionReport:
+    """
+    What an extraction did: per-page timings, totals and why it stopped early
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.engine = None
+        self.fallback_reason = None
+        self.total_pages = 0
+        self.pages = []
+        self.truncated = None
+        self.seconds = 0.0
+        # ExtractionError.as_dict() when extraction failed
+        self.error = None
+
+    def as_dict(self):
+        return {
+            "engine": self.engine,
+            "fallback_reason": self.fallback_reason,
+            "total_pages": self.total_pages,
+            "pages_extracted": len(self.pages),
+            "truncated": self.truncated,
+            "seconds": round(self.seconds, 4),
+            "page_seconds": [round(page.seconds, 4) for page in self.pages],
+            "error": self.error,
+        }
+
+
+def iter_pages(pdf_file, limits=None, report=None, page_numbers=None, engine=FALLBACK_ENGINE):
+    """
+    Yield PageText for each page in order, stopping at the first limit hit
+
+    Closing the generator early closes the PDF. When a report is given it
+    is filled in as pages are produced (and notes the limit that stopped
+    extraction, if any).
+    """
+    limits = limits or ExtractionLimits()
+    report = report if report is not None else ExtractionReport()
+    report.engine = engine
+    start = time.perf_counter()
+    chars = 0
+    try:
+        with get_engine(engine).open(pdf_file) as pdf:
+            report.total_pages = pdf.page_count
+            for number in page_numbers or range(1, pdf.page_count + 1):
+                if limits.max_pages is not None and len(report.pages) >= limits.max_pages:
+                    report.truncated = "max_pages"
+                    return
+                # The first page is always attempted so a slow open still yields text
+                if (limits.time_budget is not None and report.pages
+                        and time.perf_counter() - start > limits.time_budget):
+                    report.truncated = "time_budget"
+                    return
+
+                page_start = time.perf_counter()
+                text, emphasis = pdf.page_content(number)
+                if limits.max_chars is not None and chars + len(text) > limits.max_chars:
+                    text = text[:limits.max_chars - chars]
+                    report.truncated = "max_chars"
+                chars += len(text)
+
+                page_text = PageText(number, text, time.perf_counter() - page_start, emphasis)
+                report.pages.append(page_text)
+                yield page_text
+                if report.truncated:
+                    return
+    finally:
+        report.seconds = time.perf_counter() - start
+
+
+def _extract_range(data, page_numbers, time_budget, engine):
+    # Worker entry point for parallel extraction; page numbers are 1-based
+    limits = ExtractionLimits(time_budget=time_budget)
+    return list(iter_pages(io.BytesIO(data), limits, page_numbers=page_numbers, engine=engine))
+
+
+def _count_pages(pdf_file, engine):
+    with get_engine(engine).open(pdf_file) as pdf:
+        return pdf.page_count
+
+
+_range_pool = None
+_range_pool_key = None
+_range_pool_lock = threading.Lock()
+
+
+def get_range_pool(workers):
+    """
+    Process-wide pool for parallel page extraction, so documents do not
+    each pay for starting processes (replaced if workers changes, or in a
+    forked child)
+    """
+    global _range_pool, _range_pool_key
+    key = (workers, os.getpid())
+    with _range_pool_lock:
+        if _range_pool is None or _range_pool_key != key:
+            if _range_pool is not None and _range_pool_key[1] == os.getpid():
+                _range_pool.shutdown(wait=False)
+            _range_pool = ProcessPoolExecutor(max_workers=workers)
+            _range_pool_key = key
+        return _range_pool
+
+
+def extract_pages_parallel(data, limits, workers, report=None, engine=FALLBACK_ENGINE, executor=None):
+    """
+    Extract page ranges concurrently in worker processes, then apply the
+    character limit in page order
+
+    Ranges run on executor, or on get_range_pool(workers) when None. A
+    range cut short by the time budget ends the document there, so the
+    pages returned never skip any.
+    """
+    report = report if report is not None else ExtractionReport()
+    report.engine = engine
+    start = time.perf_counter()
+    total = _count_pages(io.BytesIO(data), engine)
+    report.total_pages = total
+    wanted = total
+    if limits.max_pages is not None and limits.max_pages < total:
+        wanted = limits.max_pages
+        report.truncated = "max_pages"
+
+    step = max(1, -(-wanted // workers))
+    ranges = [list(range(first, min(first + step, wanted + 1))) for first in range(1, wanted + 1, step)]
+    executor = executor or get_range_pool(workers)
+    chunks = list(executor.map(_extract_range, [data] * len(ranges), ranges,
+                               [limits.time_budget] * len(ranges), [engine] * len(ranges)))
+
+    chars = 0
+    for page_range, chunk in zip(ranges, chunks):
+        short = len(chunk) < len(page_range)
+        if short:
+            report.truncated = "time_budget"
+        for page in chunk:
+            text = page.text
+            if limits.max_chars is not None and chars + len(text) > limits.max_chars:
+                text = text[:limits.max_chars - chars]
+                report.truncated = "max_chars"
+            chars += len(text)
+            report.pages.append(page._replace(text=text))
+            if report.truncated == "max_chars":
+                break
+        if short or report.truncated == "max_chars":
+            break
+    report.seconds = time.perf_counter() - start
+    return report.pages
+
+
+def default_engine():
+    return os.environ.get("ANALYZER_PDF_ENGINE", "auto")
+
+
+def _iter_with(pdf_file, limits, workers, report, engine):
+    if workers > 1:
+        data = pdf_file.getvalue() if isinstance(pdf_file, io.BytesIO) else pdf_file.read()
+        # Ranges finish out of order, so pages are only released at the end
+        yield from extract_pages_parallel(data, limits, workers, report, engine)
+        return
+    yield from iter_pages(pdf_file, limits, report, engine=engine)
+
+
+def iter_extract(pdf_file, limits=None, workers=None, report=None, engine=None):
+    """
+    extract_pages as a generator, yielding each PageText as it is extracted
+
+    When auto mode falls back to pdfplumber, the fast engine's pages have
+    already been yielded and pdfplumber's follow from page 1 again
+    (report.engine tells them apart). Once the generator is exhausted,
+    report.pages holds the pages extract_pages would have returned. The
+    fallback only gets what is left of limits.time_budget.
+    """
+    limits = limits or ExtractionLimits.from_env()
+    report = report if report is not None else ExtractionReport()
+    engine = engine or default_engine()
+    if workers is None:
+        workers = int(os.environ.get("ANALYZER_EXTRACT_WORKERS", 0))
+    if isinstance(pdf_file, (bytes, bytearray)):
+        pdf_file = io.BytesIO(pdf_file)
+
+    if engine == "auto":
+        start = time.perf_counter()
+        engine = fast_engine() or FALLBACK_ENGINE
+        if engine != FALLBACK_ENGINE:
+            try:
+                yield from _iter_with(pdf_file, limits, workers, report, engine)
+                problem = text_quality_problem([page.text for page in report.pages])
+            except Exception as e:
+                problem = f"{engine} failed: {e}"
+            if problem is None:
+                return
+            report.reset()
+            report.fallback_reason = problem
+            engine = FALLBACK_ENGINE
+            limits = limits.remaining(time.perf_counter() - start)
+            pdf_file.seek(0)
+
+    yield from _iter_with(pdf_file, limits, workers, report, engine)
+
+
+def extract_pages(pdf_file, limits=None, workers=None, report=None, engine=None):
+    """
+    Extract the text of each page (empty string for image-only pages)
+
+    engine "auto" tries the fastest installed engine and re-extracts with
+    pdfplumber when its text fails the quality check. With workers > 1,
+    page ranges are extracted in parallel processes. Returns a list of
+    PageText.
+    """
+    report = report if report is not None else ExtractionReport()
+    for _ in iter_extract(pdf_file, limits, workers, report, engine):
+        pass
+    return report.pages
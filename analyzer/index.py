@@ -0,0 +1,729 @@
+"""
+Persistent inverted index over analyzed resumes.
+
+Usage:
+    python -m analyzer.index INDEX_DIR add resumes/ applicants.zip
+    python -m analyzer.index INDEX_DIR search 'python AND ("machine learning" OR pytorch) -php' --min-score 70
+    python -m analyzer.index INDEX_DIR stats
+    python -m analyzer.index INDEX_DIR merge
+
+An index directory holds immutable segment files plus manifest.json, the
+list of live segments. A segment is a single file: a JSON header followed
+by flat arrays (sorted term dictionary, posting lists with token
+positions, per-document score columns) that readers memory-map without
+copying. The manifest is replaced atomically, so a reader always sees a
+complete set of segments, and commits are serialized with an exclusive
+fcntl lock: any number of processes can search while one appends.
+
+Segments of similar size are merged in tiers of MERGE_FACTOR, so the
+number of segments a query visits grows with the log of the document
+count. Set ANALYZER_INDEX_DIR to add every freshly analyzed resume (cached
+results are not re-indexed).
+
+Query syntax: words, "quoted phrases", AND (implicit), OR, NOT or a
+leading -, and parentheses. Filters on total_score, word_count and
+required sections are applied to the memory-mapped columns.
+"""
+import argparse
+import fcntl
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from analyzer.keywords import tokenize
+
+MAGIC = b"RIDX"
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+LOCK_FILE = "write.lock"
+MERGE_FACTOR = 10
+DEFAULT_LIMIT = 20
+
+# Fixed bit order of the stored section masks; sections a ruleset adds beyond
+# these are kept in the metadata but cannot be filtered on
+SECTION_NAMES = ("contact", "experience", "education", "skills", "projects")
+SECTION_BITS = {name: 1 << bit for bit, name in enumerate(SECTION_NAMES)}
+META_FIELDS = ("total_score", "keyword_score", "readability_score", "section_score", "length_score",
+               "word_count", "section_details")
+
+QUERY_TOKEN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+
+
+class IndexFormatError(Exception):
+    pass
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _ranges(starts, lengths):
+    """
+    Concatenated np.arange(start, start + length) for each pair, vectorized
+    """
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return shift + np.arange(total, dtype=np.int64)
+
+
+def _offsets(lengths):
+    return np.concatenate(([0], np.cumsum(lengths, dtype=np.uint64))).astype(np.uint64)
+
+
+def write_segment(path, terms, posting_terms, posting_docs, posting_lengths, positions, columns):
+    """
+    Write one segment file
+
+    terms is the sorted term list; postings are sorted by (term, doc) and
+    give each posting's term index, segment-local doc number and number
+    of positions; positions holds those token positions back to back.
+    columns maps per-document array names to arrays.
+    """
+    encoded = [term.encode() for term in terms]
+    arrays = {
+        "term_offsets": _offsets(np.array([len(term) for term in encoded], dtype=np.uint64)),
+        "term_blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "posting_offsets": _offsets(np.bincount(posting_terms, minlength=len(terms))),
+        "posting_docs": posting_docs.astype(np.uint32),
+        "position_offsets": _offsets(posting_lengths),
+        "positions": positions.astype(np.uint32),
+    }
+    arrays.update(columns)
+
+    specs = {}
+    offset = 0
+    for name, array in arrays.items():
+        specs[name] = [array.dtype.str, offset, len(array)]
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "docs": len(columns["doc_ids"]),
+        "terms": len(terms),
+        "arrays": specs,
+    }).encode()
+    start = _align(len(MAGIC) + 4 + len(header))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(start + specs[name][1])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """
+    Read-only, memory-mapped view of one segment file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != MAGIC:
+            raise IndexFormatError(f"Not an index segment: {path}")
+        header_length = struct.unpack("<I", self._mmap[4:8])[0]
+        header = json.loads(self._mmap[8:8 + header_length])
+        start = _align(8 + header_length)
+        for name, (dtype, offset, count) in header["arrays"].items():
+            setattr(self, name, np.frombuffer(self._mmap, dtype=dtype, count=count, offset=start + offset))
+        self.n_docs = header["docs"]
+        self.n_terms = header["terms"]
+        self._digests = None
+
+    def term_at(self, index):
+        return bytes(self.term_blob[self.term_offsets[index]:self.term_offsets[index + 1]]).decode()
+
+    def terms(self):
+        blob = self.term_blob.tobytes()
+        offsets = self.term_offsets.tolist()
+        return [blob[offsets[i]:offsets[i + 1]].decode() for i in range(self.n_terms)]
+
+    def find(self, term):
+        """
+        Index of term in the sorted dictionary, or -1
+        """
+        key = term.encode()
+        low, high = 0, self.n_terms
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(self.term_blob[self.term_offsets[middle]:self.term_offsets[middle + 1]]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_terms and self.term_at(low) == term:
+            return low
+        return -1
+
+    def postings(self, term):
+        """
+        (first, last) posting indexes for term; empty range when absent
+        """
+        index = self.find(term)
+        if index < 0:
+            return 0, 0
+        return int(self.posting_offsets[index]), int(self.posting_offsets[index + 1])
+
+    def docs(self, term):
+        first, last = self.postings(term)
+        return self.posting_docs[first:last].astype(np.int64)
+
+    def phrase_docs(self, words, candidates):
+        """
+        Candidate docs in which words occur at consecutive positions
+        """
+        keys = None
+        for offset, word in enumerate(words):
+            first, last = self.postings(word)
+            docs = self.posting_docs[first:last].astype(np.int64)
+            selected = np.nonzero(np.isin(docs, candidates, assume_unique=True))[0] + first
+            starts = self.position_offsets[selected].astype(np.int64)
+            lengths = self.position_offsets[selected + 1].astype(np.int64) - starts
+            positions = self.positions[_ranges(starts, lengths)].astype(np.int64) - offset
+            owners = np.repeat(self.posting_docs[selected].astype(np.int64), lengths)
+            valid = positions >= 0
+            # One key per (doc, phrase start): the phrase matches where every word agrees
+            word_keys = np.unique((owners[valid] << 32) | positions[valid])
+            keys = word_keys if keys is None else np.intersect1d(keys, word_keys, assume_unique=True)
+            if not len(keys):
+                break
+        return np.unique(keys >> 32) if keys is not None else candidates
+
+    def digests(self):
+        if self._digests is None:
+            raw = self.digest_blob.tobytes()
+            self._digests = {raw[i:i + 32] for i in range(0, len(raw), 32)}
+        return self._digests
+
+    def meta(self, local):
+        return json.loads(bytes(self.meta_blob[self.meta_offsets[local]:self.meta_offsets[local + 1]]))
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": FORMAT_VERSION, "generation": 0, "next_doc": 0, "segments": []}
+
+
+def write_manifest(path, manifest):
+    tmp_path = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+
+
+class _WriteLock:
+    # Exclusive fcntl lock held for the duration of one commit
+    def __init__(self, path):
+        self.path = os.path.join(path, LOCK_FILE)
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def _document_run(tokens):
+    """
+    Postings of one document: (sorted terms, positions grouped by term, counts)
+    """
+    if not tokens:
+        return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    terms, inverse, counts = np.unique(np.array(tokens), return_inverse=True, return_counts=True)
+    positions = np.argsort(inverse, kind="stable")
+    return terms.tolist(), positions, counts
+
+
+def _merge_runs(runs):
+    """
+    Combine runs of (terms, posting_terms, posting_docs, posting_lengths,
+    positions) with disjoint docs into one run sorted by (term, doc)
+    """
+    terms = sorted(set().union(*(run[0] for run in runs)))
+    term_ids = {term: index for index, term in enumerate(terms)}
+    posting_terms = []
+    posting_docs = []
+    posting_lengths = []
+    position_starts = []
+    positions = []
+    base = 0
+    for run_terms, run_posting_terms, run_docs, run_lengths, run_positions in runs:
+        mapping = np.fromiter(map(term_ids.__getitem__, run_terms), dtype=np.int64, count=len(run_terms))
+        posting_terms.append(mapping[run_posting_terms])
+        posting_docs.append(run_docs)
+        posting_lengths.append(run_lengths)
+        position_starts.append(base + np.concatenate(([0], np.cumsum(run_lengths)[:-1])).astype(np.int64))
+        positions.append(run_positions)
+        base += len(run_positions)
+
+    posting_terms = np.concatenate(posting_terms) if runs else np.zeros(0, dtype=np.int64)
+    posting_docs = np.concatenate(posting_docs).astype(np.int64) if runs else np.zeros(0, dtype=np.int64)
+    posting_lengths = np.concatenate(posting_lengths).astype(np.int64) if runs else np.zeros(0, dtype=np.int64)
+    position_starts = np.concatenate(position_starts) if runs else np.zeros(0, dtype=np.int64)
+    positions = np.concatenate(positions) if runs else np.zeros(0, dtype=np.int64)
+
+    order = np.lexsort((posting_docs, posting_terms))
+    posting_lengths = posting_lengths[order]
+    positions = positions[_ranges(position_starts[order], posting_lengths)]
+    return terms, posting_terms[order], posting_docs[order], posting_lengths, positions
+
+
+def _segment_run(segment, doc_base):
+    lengths = np.diff(segment.position_offsets.astype(np.int64))
+    posting_terms = np.repeat(np.arange(segment.n_terms), np.diff(segment.posting_offsets.astype(np.int64)))
+    return (segment.terms(), posting_terms, segment.posting_docs.astype(np.int64) + doc_base,
+            lengths, segment.positions)
+
+
+def _columns(docs):
+    meta = [json.dumps(doc["meta"]).encode() for doc in docs]
+    return {
+        "doc_ids": np.array([doc["id"] for doc in docs], dtype=np.uint64),
+        "total_score": np.array([doc["total_score"] for doc in docs], dtype=np.float32),
+        "word_count": np.array([doc["word_count"] for doc in docs], dtype=np.uint32),
+        "sections": np.array([doc["sections"] for doc in docs], dtype=np.uint8),
+        "digest_blob": np.frombuffer(b"".join(doc["digest"] for doc in docs), dtype=np.uint8),
+        "meta_offsets": _offsets(np.array([len(item) for item in meta], dtype=np.uint64)),
+        "meta_blob": np.frombuffer(b"".join(meta), dtype=np.uint8),
+    }
+
+
+def _concat_columns(segments):
+    columns = {}
+    for name in ("doc_ids", "total_score", "word_count", "sections", "digest_blob"):
+        columns[name] = np.concatenate([getattr(segment, name) for segment in segments])
+    meta_lengths = np.concatenate([np.diff(segment.meta_offsets) for segment in segments])
+    columns["meta_offsets"] = _offsets(meta_lengths)
+    columns["meta_blob"] = np.concatenate([segment.meta_blob for segment in segments])
+    return columns
+
+
+def section_mask(section_details):
+    return sum(SECTION_BITS[name] for name, found in section_details.items() if found and name in SECTION_BITS)
+
+
+class IndexWriter:
+    """
+    Buffers analyzed documents and commits them as new segments
+
+    Safe to share between threads; separate processes may each hold a
+    writer, since commits take the index-wide lock.
+    """
+
+    def __init__(self, path, merge_factor=MERGE_FACTOR):
+        self.path = path
+        self.merge_factor = merge_factor
+        self._pending = []
+        self._lock = threading.Lock()
+        self._segments = {}
+        os.makedirs(path, exist_ok=True)
+
+    def add(self, tokens, result, digest, name=None):
+        """
+        Queue one analyzed resume: its tokens, result dict and hex digest
+        """
+        meta = {field: result[field] for field in META_FIELDS if field in result}
+        meta.update({"name": name, "digest": digest, "indexed_at": round(time.time(), 3)})
+        document = {
+            "tokens": tokens,
+            "total_score": result["total_score"],
+            "word_count": result["word_count"],
+            "sections": section_mask(result["section_details"]),
+            "digest": bytes.fromhex(digest),
+            "meta": meta,
+        }
+        with self._lock:
+            self._pending.append(document)
+
+    def add_document(self, doc, result, digest, name=None):
+        """
+        Index a Document right away (one small segment per call)
+        """
+        self.add(doc.tokens, result, digest, name)
+        return self.commit()
+
+    def commit(self):
+        """
+        Write queued documents as a segment; returns how many were added
+        (documents whose digest is already indexed are skipped)
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            with _WriteLock(self.path):
+                manifest = read_manifest(self.path)
+                live = {entry["name"] for entry in manifest["segments"]}
+                # Forget segments another process merged away
+                for name in set(self._segments) - live:
+                    del self._segments[name]
+                known = [self._segment(name).digests() for name in live]
+                seen = set()
+                docs = []
+                for document in pending:
+                    digest = document["digest"]
+                    if digest not in seen and not any(digest in digests for digests in known):
+                        seen.add(digest)
+                        docs.append(document)
+                if not docs:
+                    return 0
+
+                runs = []
+                for local, document in enumerate(docs):
+                    document["id"] = manifest["next_doc"] + local
+                    terms, positions, counts = _document_run(document["tokens"])
+                    runs.append((terms, np.arange(len(terms)), np.full(len(terms), local), counts, positions))
+                name = self._new_segment_name(manifest)
+                write_segment(os.path.join(self.path, name), *_merge_runs(runs), _columns(docs))
+                manifest["next_doc"] += len(docs)
+                manifest["segments"].append({"name": name, "docs": len(docs)})
+                write_manifest(self.path, manifest)
+                self._merge_tiers(manifest)
+                return len(docs)
+
+    def merge(self, entries=None):
+        """
+        Merge the given manifest entries (default: all segments) into one
+        """
+        with self._lock, _WriteLock(self.path):
+            manifest = read_manifest(self.path)
+            self._merge(manifest, entries or list(manifest["segments"]))
+
+    def _merge_tiers(self, manifest):
+        while True:
+            tiers = {}
+            for entry in manifest["segments"]:
+                tiers.setdefault(self._tier(entry["docs"]), []).append(entry)
+            full = [entries for entries in tiers.values() if len(entries) >= self.merge_factor]
+            if not full:
+                return
+            self._merge(manifest, full[0])
+
+    def _tier(self, docs):
+        # Segments of merge_factor ** n up to merge_factor ** (n + 1) docs share tier n
+        tier = 0
+        while docs >= self.merge_factor:
+            docs //= self.merge_factor
+            tier += 1
+        return tier
+
+    def _merge(self, manifest, entries):
+        if len(entries) < 2:
+            return
+        segments = [self._segment(entry["name"]) for entry in entries]
+        runs = []
+        base = 0
+        for segment in segments:
+            runs.append(_segment_run(segment, base))
+            base += segment.n_docs
+        name = self._new_segment_name(manifest)
+        write_segment(os.path.join(self.path, name), *_merge_runs(runs), _concat_columns(segments))
+
+        merged = {entry["name"] for entry in entries}
+        position = min(index for index, entry in enumerate(manifest["segments"]) if entry["name"] in merged)
+        remaining = [entry for entry in manifest["segments"] if entry["name"] not in merged]
+        remaining.insert(position, {"name": name, "docs": base})
+        manifest["segments"] = remaining
+        write_manifest(self.path, manifest)
+        # Readers that already mapped the old files keep them until they refresh
+        for old in merged:
+            self._segments.pop(old, None)
+            os.remove(os.path.join(self.path, old))
+
+    def _new_segment_name(self, manifest):
+        manifest["generation"] += 1
+        return "seg-%08d.ridx" % manifest["generation"]
+
+    def _segment(self, name):
+        if name not in self._segments:
+            self._segments[name] = Segment(os.path.join(self.path, name))
+        return self._segments[name]
+
+
+def parse_query(text):
+    """
+    Parse a query into a tree of ("term", word), ("phrase", words),
+    ("and", a, b), ("or", a, b), ("not", a) and ("all",) nodes
+    """
+    tokens = QUERY_TOKEN.findall(text)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def advance():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            advance()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_unary()
+        while peek() is not None and peek() not in ("OR", ")"):
+            if peek() == "AND":
+                advance()
+            node = ("and", node, parse_unary())
+        return node
+
+    def parse_unary():
+        token = peek()
+        if token in ("NOT", "-"):
+            advance()
+            return ("not", parse_unary())
+        if token is not None and token.startswith("-") and len(token) > 1:
+            tokens[position] = token[1:]
+            return ("not", parse_unary())
+        return parse_atom()
+
+    def parse_atom():
+        token = advance() if peek() is not None else None
+        if token is None:
+            raise ValueError("Query ended unexpectedly")
+        if token == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("Missing closing parenthesis")
+            advance()
+            return node
+        if token == ")":
+            raise ValueError("Unexpected closing parenthesis")
+        words = tokenize(token.strip('"'))
+        if not words:
+            return ("all",)
+        # Words that tokenize to several tokens ("node.js") match as a phrase
+        return ("term", words[0]) if len(words) == 1 else ("phrase", words)
+
+    if not tokens:
+        return ("all",)
+    node = parse_or()
+    if position != len(tokens):
+        raise ValueError(f"Unexpected token: {tokens[position]}")
+    return node
+
+
+def _evaluate(node, segment, everything):
+    kind = node[0]
+    if kind == "all":
+        return everything
+    if kind == "term":
+        return segment.docs(node[1])
+    if kind == "phrase":
+        candidates = everything
+        for word in set(node[1]):
+            candidates = np.intersect1d(candidates, segment.docs(word), assume_unique=True)
+        return segment.phrase_docs(node[1], candidates) if len(candidates) else candidates
+    if kind == "not":
+        return np.setdiff1d(everything, _evaluate(node[1], segment, everything), assume_unique=True)
+    left = _evaluate(node[1], segment, everything)
+    if kind == "and":
+        if node[2][0] == "not":
+            return np.setdiff1d(left, _evaluate(node[2][1], segment, everything), assume_unique=True)
+        if not len(left):
+            return left
+        return np.intersect1d(left, _evaluate(node[2], segment, everything), assume_unique=True)
+    return np.union1d(left, _evaluate(node[2], segment, everything))
+
+
+class IndexReader:
+    """
+    Searches the segments listed in the manifest; refresh() picks up commits
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._segments = {}
+        self._manifest_stamp = False
+        self.refresh()
+
+    def refresh(self):
+        manifest_path = os.path.join(self.path, MANIFEST)
+        try:
+            stat = os.stat(manifest_path)
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._manifest_stamp:
+            return
+        for attempt in range(3):
+            manifest = read_manifest(self.path)
+            try:
+                segments = {}
+                for entry in manifest["segments"]:
+                    name = entry["name"]
+                    segments[name] = self._segments.get(name) or Segment(os.path.join(self.path, name))
+            except FileNotFoundError:
+                # A merge removed a segment between reading the manifest and opening it
+                continue
+            self._segments = segments
+            self._manifest_stamp = stamp
+            self.manifest = manifest
+            return
+        raise IndexFormatError("Index changed too often while opening it")
+
+    @property
+    def segments(self):
+        return list(self._segments.values())
+
+    def stats(self):
+        return {
+            "documents": sum(segment.n_docs for segment in self.segments),
+            "segments": len(self._segments),
+            "terms": sum(segment.n_terms for segment in self.segments),
+            "bytes": sum(os.path.getsize(segment.path) for segment in self.segments),
+        }
+
+    def search(self, query="", min_score=None, max_score=None, min_words=None, max_words=None,
+               sections=(), limit=DEFAULT_LIMIT):
+        """
+        Documents matching query and filters, best total_score first
+
+        Returns {"total": matches, "hits": [stored metadata...], "took_ms": ...}.
+        """
+        started = time.perf_counter()
+        self.refresh()
+        tree = parse_query(query)
+        required = 0
+        for name in sections:
+            if name not in SECTION_BITS:
+                raise ValueError(f"Unknown section: {name}")
+            required |= SECTION_BITS[name]
+
+        matches = []
+        for segment in self.segments:
+            mask = np.ones(segment.n_docs, dtype=bool)
+            if min_score is not None:
+                mask &= segment.total_score >= min_score
+            if max_score is not None:
+                mask &= segment.total_score <= max_score
+            if min_words is not None:
+                mask &= segment.word_count >= min_words
+            if max_words is not None:
+                mask &= segment.word_count <= max_words
+            if required:
+                mask &= (segment.sections & required) == required
+            everything = np.nonzero(mask)[0]
+            if not len(everything):
+                continue
+            found = _evaluate(tree, segment, everything)
+            if tree[0] != "all" and len(found) and not mask.all():
+                found = found[mask[found]]
+            if len(found):
+                matches.append((segment, found))
+
+        total = sum(len(found) for _, found in matches)
+        scores = np.concatenate([segment.total_score[found] for segment, found in matches]) if matches else []
+        ids = np.concatenate([segment.doc_ids[found] for segment, found in matches]) if matches else []
+        hits = []
+        if total:
+            order = np.lexsort((ids, -scores.astype(np.float64)))[:limit]
+            bounds = np.cumsum([0] + [len(found) for _, found in matches])
+            for position in order:
+                which = int(np.searchsorted(bounds, position, side="right")) - 1
+                segment, found = matches[which]
+                local = int(found[position - bounds[which]])
+                hits.append({"id": int(segment.doc_ids[local]), **segment.meta(local)})
+        return {"total": total, "hits": hits, "took_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+
+_default_writer = None
+_default_writer_lock = threading.Lock()
+
+
+def get_default_index():
+    """
+    Process-wide writer for ANALYZER_INDEX_DIR, or None when indexing is off
+    """
+    global _default_writer
+    path = os.environ.get("ANALYZER_INDEX_DIR")
+    if not path:
+        return None
+    with _default_writer_lock:
+        if _default_writer is None or _default_writer.path != path:
+            _default_writer = IndexWriter(path)
+        return _default_writer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and search the resume index")
+    parser.add_argument("index", help="index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="analyze PDFs and add them to the index")
+    add.add_argument("paths", nargs="+", help="PDF files, directories or zip archives")
+    add.add_argument("--commit-every", type=int, default=500, help="documents per segment")
+
+    search = commands.add_parser("search", help="run a query")
+    search.add_argument("query", nargs="?", default="")
+    search.add_argument("--min-score", type=float)
+    search.add_argument("--max-score", type=float)
+    search.add_argument("--min-words", type=int)
+    search.add_argument("--max-words", type=int)
+    search.add_argument("--section", action="append", default=[], choices=SECTION_NAMES)
+    search.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+
+    commands.add_parser("stats", help="show index size")
+    commands.add_parser("merge", help="merge all segments into one")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        from analyzer.batch import iter_pdf_sources
+        from analyzer.cache import content_digest
+        from analyzer.pipeline import load_document
+        from analyzer.scoring import score_document
+
+        writer = IndexWriter(args.index)
+        added = queued = 0
+        for name, data in iter_pdf_sources(args.paths):
+            doc = load_document(data)
+            if not doc.text:
+                print(f"skipped {name}: no extractable text", file=sys.stderr)
+                continue
+            writer.add(doc.tokens, score_document(doc), content_digest(data), name)
+            queued += 1
+            if queued % args.commit_every == 0:
+                added += writer.commit()
+        added += writer.commit()
+        print(json.dumps({"added": added, **IndexReader(args.index).stats()}))
+    elif args.command == "search":
+        reader = IndexReader(args.index)
+        try:
+            result = reader.search(args.query, args.min_score, args.max_score, args.min_words, args.max_words,
+                                   args.section, args.limit)
+        except ValueError as e:
+            sys.exit(f"Invalid query: {e}")
+        print(json.dumps(result, indent=2))
+    elif args.command == "stats":
+        print(json.dumps(IndexReader(args.index).stats()))
+    elif args.command == "merge":
+        IndexWriter(args.index).merge()
+        print(json.dumps(IndexReader(args.index).stats()))
+
+
+if __name__ == "__main__":
+    main()
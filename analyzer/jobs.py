@@ -0,0 +1,667 @@
+"""
+Background analysis jobs: submit a resume, poll (or get called back) later.
+
+Usage:
+    python -m analyzer.jobs worker [--workers 4] [--threads 2]   # extra worker process for a shared ANALYZER_JOBS_DB
+
+ANALYZER_JOBS_DB           SQLite file holding the queue (default: in-process memory queue)
+ANALYZER_JOB_THREADS       jobs dispatched concurrently per process (default: CPU count)
+ANALYZER_JOB_RETRIES       retries after a failed attempt (default 2)
+ANALYZER_JOB_TTL           seconds a finished job and its result are kept (default 3600)
+ANALYZER_JOB_MAX_PENDING   queued jobs accepted before submissions get 503 (default 256)
+ANALYZER_CALLBACK_HOSTS    comma-separated callback hosts allowed even though they
+                           resolve to private, loopback or link-local addresses
+
+Jobs run highest priority first, then oldest first. An attempt that raises
+is retried with exponential backoff; a PDF without extractable text fails
+at once since retrying cannot help. With a callback URL the finished job
+is POSTed there as JSON, unless its host resolves to a non-public address
+(see check_callback_url).
+
+The memory queue lives and dies with its process. The SQLite queue
+survives restarts and can be shared by several processes on one host:
+claims are transactional, and a job whose worker disappeared is claimed
+again once its lease expires. The runner renews the lease of every job it
+holds, and a finished attempt is only recorded while its claim is still
+current, so a job that outlived its lease cannot overwrite a newer run.
+"""
+import argparse
+import heapq
+import ipaddress
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+from analyzer import metrics
+from analyzer.cache import get_default_cache
+from analyzer.pipeline import analyze_pdf, warm_pool
+
+DEFAULT_RETRIES = 2
+DEFAULT_TTL = 3600
+DEFAULT_MAX_PENDING = 256
+RETRY_DELAY = 1.0
+# A claimed job is handed to another worker if its lease is not renewed within this time
+LEASE_SECONDS = 300
+# How often a runner renews the leases of the jobs it holds
+RENEW_INTERVAL = LEASE_SECONDS / 5
+POLL_INTERVAL = 0.5
+PURGE_INTERVAL = 60
+CALLBACK_TIMEOUT = 10
+CALLBACK_ATTEMPTS = 3
+CALLBACK_SCHEMES = ('http', 'https')
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class LeaseLost(Exception):
+    """
+    The job was claimed again after this attempt's lease ran out
+    """
+
+
+class Job:
+    """
+    One submitted analysis and its state
+    """
+
+    def __init__(self, data, options=None, priority=0, max_attempts=DEFAULT_RETRIES + 1, callback_url=None,
+                 job_id=None, created=None):
+        self.id = job_id or uuid.uuid4().hex
+        # PDF bytes; dropped once the job has finished
+        self.data = data
+        # Keyword arguments for analyze_pdf: name, engine, ruleset, job_description, reuse_duplicates
+        self.options = options or {}
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.callback_url = callback_url
+        self.status = QUEUED
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.callback_status = None
+        self.created = created if created is not None else time.time()
+        self.started = None
+        self.finished = None
+        self.available = self.created
+        self.expires = None
+
+    def to_dict(self):
+        """
+        Public view for API responses and callbacks
+        """
+        view = {
+            'id': self.id,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+        if self.options.get('name'):
+            view['name'] = self.options['name']
+        if self.status == DONE:
+            view['result'] = self.result
+        if self.error is not None:
+            view['error'] = self.error
+        if self.callback_url:
+            view['callback_status'] = self.callback_status
+        return view
+
+
+def retry_delay(attempts):
+    return RETRY_DELAY * 2 ** (attempts - 1)
+
+
+class MemoryQueue:
+    """
+    Priority queue of jobs held in this process
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_pending=DEFAULT_MAX_PENDING):
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self._jobs = {}
+        # (-priority, sequence, job id) of jobs ready to run
+        self._ready = []
+        # (available time, sequence, job id) of jobs waiting to be retried
+        self._delayed = []
+        self._sequence = itertools.count()
+        self._pending = 0
+        self._last_purge = time.monotonic()
+        self._lock = threading.Lock()
+
+    def put(self, job):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull(f'{self._pending} jobs already pending')
+            self._jobs[job.id] = job
+            self._pending += 1
+            heapq.heappush(self._ready, (-job.priority, next(self._sequence), job.id))
+
+    def claim(self):
+        """
+        Mark the next runnable job as running and return it (None if idle)
+        """
+        now = time.time()
+        with self._lock:
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, job_id = heapq.heappop(self._delayed)
+                job = self._jobs[job_id]
+                heapq.heappush(self._ready, (-job.priority, next(self._sequence), job_id))
+            if not self._ready:
+                return None
+            _, _, job_id = heapq.heappop(self._ready)
+            job = self._jobs[job_id]
+            job.status = RUNNING
+            job.attempts += 1
+            job.started = now
+            return job
+
+    def renew(self, job):
+        # Memory jobs are never claimed twice, so they need no lease
+        return True
+
+    def complete(self, job, result):
+        with self._lock:
+            self._finish(job, DONE, result=result)
+
+    def fail(self, job, error, retry=True):
+        """
+        Record a failed attempt; the job is queued again while attempts remain
+        Returns True if it will be retried.
+        """
+        with self._lock:
+            if retry and job.attempts < job.max_attempts:
+                job.status = QUEUED
+                job.error = error
+                job.available = time.time() + retry_delay(job.attempts)
+                heapq.heappush(self._delayed, (job.available, next(self._sequence), job.id))
+                return True
+            self._finish(job, FAILED, error=error)
+            return False
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished = time.time()
+        job.expires = job.finished + self.ttl
+        job.data = None
+        self._pending -= 1
+
+    def set_callback_status(self, job, status):
+        with self._lock:
+            job.callback_status = status
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+        if job is not None and job.expires is not None and job.expires <= time.time():
+            return None
+        return job
+
+    def _purge(self):
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = time.monotonic()
+        now = time.time()
+        for job_id in [job.id for job in self._jobs.values() if job.expires is not None and job.expires <= now]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+
+class SQLiteQueue:
+    """
+    Job queue in a SQLite file, shareable by processes on one host
+    """
+
+    COLUMNS = ("id", "status", "priority", "attempts", "max_attempts", "options", "data", "callback_url",
+               "result", "error", "callback_status", "created", "started", "finished", "available", "expires")
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_pending=DEFAULT_MAX_PENDING, lease=LEASE_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; claims open their own IMMEDIATE transaction
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "attempts INTEGER NOT NULL, max_attempts INTEGER NOT NULL, options TEXT NOT NULL, data BLOB, "
+            "callback_url TEXT, result TEXT, error TEXT, callback_status TEXT, created REAL NOT NULL, "
+            "started REAL, finished REAL, available REAL NOT NULL, expires REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_runnable ON jobs (status, priority DESC, created)")
+
+    def _row_to_job(self, row):
+        values = dict(zip(self.COLUMNS, row))
+        job = Job(values["data"], json.loads(values["options"]), values["priority"], values["max_attempts"],
+                  values["callback_url"], values["id"], values["created"])
+        job.status = values["status"]
+        job.attempts = values["attempts"]
+        job.result = json.loads(values["result"]) if values["result"] is not None else None
+        job.error = values["error"]
+        job.callback_status = values["callback_status"]
+        job.started = values["started"]
+        job.finished = values["finished"]
+        job.available = values["available"]
+        job.expires = values["expires"]
+        return job
+
+    def put(self, job):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                pending = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+                ).fetchone()[0]
+                if pending >= self.max_pending:
+                    raise QueueFull(f'{pending} jobs already pending')
+                self._conn.execute(
+                    "INSERT INTO jobs (id, status, priority, attempts, max_attempts, options, data, callback_url, "
+                    "created, available) VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?, ?)",
+                    (job.id, QUEUED, job.priority, job.max_attempts, json.dumps(job.options), job.data,
+                     job.callback_url, job.created, job.available),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def claim(self):
+        """
+        Mark the next runnable job as running and return it (None if idle)
+
+        Running jobs whose lease ran out (their worker died) count as
+        runnable, or fail once they have used up their attempts.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._conn.execute(
+                        "SELECT id, attempts, max_attempts, status FROM jobs "
+                        "WHERE (status = ? AND available <= ?) OR (status = ? AND available <= ?) "
+                        "ORDER BY priority DESC, created LIMIT 1",
+                        (QUEUED, now, RUNNING, now),
+                    ).fetchone()
+                    if row is None:
+                        self._conn.execute("COMMIT")
+                        return None
+                    job_id, attempts, max_attempts, status = row
+                    if status == RUNNING and attempts >= max_attempts:
+                        self._conn.execute(
+                            "UPDATE jobs SET status = ?, error = ?, finished = ?, expires = ?, data = NULL "
+                            "WHERE id = ?",
+                            (FAILED, 'Worker stopped before finishing', now, now + self.ttl, job_id),
+                        )
+                        continue
+                    # While running, `available` holds the lease deadline
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, started = ?, available = ? "
+                        "WHERE id = ?",
+                        (RUNNING, now, now + self.lease, job_id),
+                    )
+                    job = self._row_to_job(self._conn.execute(
+                        f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+                    ).fetchone())
+                    self._conn.execute("COMMIT")
+                    return job
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # Updates for a claimed job only apply while that claim is current: the
+    # job is still running and `started` is the time this attempt claimed it
+    CLAIMED = "id = ? AND status = ? AND started = ?"
+
+    def _claimed(self, job):
+        return job.id, RUNNING, job.started
+
+    def renew(self, job):
+        """
+        Extend the lease of a job being worked on; False if it was lost
+        """
+        with self._lock:
+            cursor = self._conn.execute(f"UPDATE jobs SET available = ? WHERE {self.CLAIMED}",
+                                        (time.time() + self.lease, *self._claimed(job)))
+        return cursor.rowcount > 0
+
+    def complete(self, job, result):
+        self._finish(job, DONE, result=result)
+
+    def fail(self, job, error, retry=True):
+        """
+        Record a failed attempt; the job is queued again while attempts remain
+        Returns True if it will be retried; raises LeaseLost for a stale claim.
+        """
+        if retry and job.attempts < job.max_attempts:
+            available = time.time() + retry_delay(job.attempts)
+            with self._lock:
+                cursor = self._conn.execute(
+                    f"UPDATE jobs SET status = ?, error = ?, available = ? WHERE {self.CLAIMED}",
+                    (QUEUED, error, available, *self._claimed(job)),
+                )
+            if not cursor.rowcount:
+                raise LeaseLost(job.id)
+            job.status = QUEUED
+            job.error = error
+            job.available = available
+            return True
+        self._finish(job, FAILED, error=error)
+        return False
+
+    def _finish(self, job, status, result=None, error=None):
+        finished = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, expires = ?, data = NULL "
+                f"WHERE {self.CLAIMED}",
+                (status, json.dumps(result) if result is not None else None, error, finished,
+                 finished + self.ttl, *self._claimed(job)),
+            )
+        if not cursor.rowcount:
+            raise LeaseLost(job.id)
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished = finished
+        job.expires = finished + self.ttl
+        job.data = None
+
+    def set_callback_status(self, job, status):
+        job.callback_status = status
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (status, job.id))
+
+    def get(self, job_id):
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge >= PURGE_INTERVAL:
+                self._last_purge = now
+                self._conn.execute("DELETE FROM jobs WHERE expires <= ?", (now,))
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ? AND (expires IS NULL OR expires > ?)",
+                (job_id, now),
+            ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+        counts.update(rows)
+        return counts
+
+
+def callback_hosts():
+    return {host.strip().lower() for host in os.environ.get('ANALYZER_CALLBACK_HOSTS', '').split(',') if host.strip()}
+
+
+def check_callback_url(url):
+    """
+    Raise ValueError unless url is an http(s) URL whose host resolves only
+    to public addresses (or is listed in ANALYZER_CALLBACK_HOSTS), so
+    callbacks cannot be aimed at the server's own network
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in CALLBACK_SCHEMES or not parsed.hostname:
+        raise ValueError('callback_url must be an http(s) URL')
+    if parsed.hostname.lower() in callback_hosts():
+        return
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError):
+        raise ValueError(f'callback_url host cannot be resolved: {parsed.hostname}')
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f'callback_url host resolves to a non-public address: {parsed.hostname}')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could lead a checked URL to a private address
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def deliver_callback(job, attempts=CALLBACK_ATTEMPTS):
+    """
+    POST the finished job to its callback URL; returns True once accepted
+    """
+    body = json.dumps(job.to_dict()).encode()
+    for attempt in range(attempts):
+        request = urllib.request.Request(job.callback_url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            # Checked again on delivery: the host may resolve differently by now
+            check_callback_url(job.callback_url)
+            with _callback_opener.open(request, timeout=CALLBACK_TIMEOUT) as response:
+                if 200 <= response.status < 300:
+                    return True
+        except ValueError:
+            return False
+        except Exception:
+            pass
+        if attempt + 1 < attempts:
+            time.sleep(retry_delay(attempt + 1))
+    return False
+
+
+class JobRunner:
+    """
+    Threads that claim jobs from a queue and analyze them
+
+    With an executor (the server's process pool) the threads only wait on
+    it, so a few threads keep every pool process busy.
+    """
+
+    def __init__(self, queue, executor=None, threads=None):
+        self.queue = queue
+        self.executor = executor
+        self.threads = threads or int(os.environ.get('ANALYZER_JOB_THREADS', os.cpu_count() or 1))
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._workers = []
+        # Claimed jobs whose leases the renewer keeps alive
+        self._held = set()
+        self._held_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._callbacks = ThreadPoolExecutor(max_workers=2, thread_name_prefix='job-callback')
+
+    def start(self):
+        for index in range(self.threads):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._workers.append(thread)
+        self._renewer = threading.Thread(target=self._renew, name='job-lease-renewer', daemon=True)
+        self._renewer.start()
+        return self
+
+    def submit(self, job):
+        """
+        Queue a job (raises QueueFull when the backlog limit is reached)
+        """
+        self.queue.put(job)
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def stop(self, timeout=None):
+        """
+        Let running jobs finish, then stop; queued jobs stay queued
+        """
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        self._stopped.set()
+        for thread in self._workers:
+            thread.join(timeout)
+        self._renewer.join(timeout)
+        self._callbacks.shutdown(wait=True)
+
+    def _renew(self):
+        # A job may wait behind other work in the shared pool, or simply run
+        # long; its lease must not run out while this process still has it
+        while not self._stopped.wait(RENEW_INTERVAL):
+            with self._held_lock:
+                held = list(self._held)
+            for job in held:
+                try:
+                    self.queue.renew(job)
+                except Exception:
+                    metrics.ERRORS.inc(1, 'job_lease')
+
+    def _work(self):
+        while not self._stopping:
+            job = self.queue.claim()
+            if job is None:
+                # Submissions notify; the timeout picks up retries and other processes' jobs
+                with self._wakeup:
+                    if not self._stopping:
+                        self._wakeup.wait(POLL_INTERVAL)
+                continue
+            self.run(job)
+
+    def run(self, job):
+        with self._held_lock:
+            self._held.add(job)
+        try:
+            self._attempt(job)
+        except LeaseLost:
+            # Claimed again elsewhere after this attempt's lease expired; that run's outcome counts
+            metrics.JOBS.inc(1, 'lost')
+            return
+        finally:
+            with self._held_lock:
+                self._held.discard(job)
+        if job.status == QUEUED:
+            metrics.JOBS.inc(1, 'retried')
+            return
+        metrics.JOBS.inc(1, job.status)
+        if job.callback_url:
+            self._callbacks.submit(self._callback, job)
+
+    def _attempt(self, job):
+        try:
+            with metrics.span('job'):
+                result = analyze_pdf(job.data, cache=get_default_cache(), executor=self.executor, **job.options)
+        except Exception as e:
+            self.queue.fail(job, f'Analysis failed: {e}')
+            return
+        if 'error' in result:
+            # Deterministic for the same bytes, so not worth retrying
+            self.queue.fail(job, result['error'], retry=False)
+        else:
+            self.queue.complete(job, result)
+
+    def _callback(self, job):
+        delivered = deliver_callback(job)
+        if not delivered:
+            metrics.ERRORS.inc(1, 'callback')
+        self.queue.set_callback_status(job, 'delivered' if delivered else 'failed')
+
+
+def create_queue():
+    """
+    Queue configured by the ANALYZER_JOB* environment variables
+    """
+    ttl = float(os.environ.get('ANALYZER_JOB_TTL', DEFAULT_TTL))
+    max_pending = int(os.environ.get('ANALYZER_JOB_MAX_PENDING', DEFAULT_MAX_PENDING))
+    path = os.environ.get('ANALYZER_JOBS_DB')
+    if path:
+        return SQLiteQueue(path, ttl, max_pending)
+    return MemoryQueue(ttl, max_pending)
+
+
+_default_runner = None
+_default_runner_lock = threading.Lock()
+
+
+def get_default_runner(executor=None):
+    """
+    Process-wide runner, started on first use
+    """
+    global _default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            _default_runner = JobRunner(create_queue(), executor).start()
+        return _default_runner
+
+
+def job_options(name=None, engine=None, ruleset=None, job_description=None, reuse_duplicates=False):
+    """
+    analyze_pdf keyword arguments stored with a job (unset ones omitted)
+    """
+    options = {'name': name, 'engine': engine, 'ruleset': ruleset, 'job_description': job_description,
+               'reuse_duplicates': reuse_duplicates or None}
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def max_attempts():
+    return int(os.environ.get('ANALYZER_JOB_RETRIES', DEFAULT_RETRIES)) + 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process queued analysis jobs from ANALYZER_JOBS_DB")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="analysis processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=None, help="concurrent jobs (default: ANALYZER_JOB_THREADS)")
+    args = parser.parse_args(argv)
+    if not os.environ.get('ANALYZER_JOBS_DB'):
+        parser.error("ANALYZER_JOBS_DB must point at the queue shared with the server")
+
+    # Like analyzer.server, jobs are analyzed in a warmed process pool
+    executor = warm_pool(args.workers)
+    runner = JobRunner(create_queue(), executor, threads=args.threads).start()
+    print(f"Processing jobs from {os.environ['ANALYZER_JOBS_DB']} with {args.workers} workers "
+          f"and {runner.threads} threads", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        runner.stop()
+    finally:
+        executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Single-pass keyword matching.
+
+Terms are split into word tokens the same way resume text is
+("node.js" -> node, js; "scikit-learn" -> scikit, learn) and compiled into
+an Aho-Corasick automaton over token ids. One walk over the token stream
+reports every occurrence of every term, including multi-word phrases,
+so matching cost does not grow with the size of the dictionary.
+"""
+import re
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"\b\w+\b")
+
+
+def tokenize(text):
+    """
+    Lowercase and split text into word tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton whose alphabet is word tokens rather than characters
+    """
+
+    def __init__(self, terms):
+        self.terms = []
+        # Node 0 is the root; each node maps token -> child node
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        # Spellings that tokenize alike ("Machine-Learning", "machine learning")
+        # are one term; the first is the one reported
+        seen = set()
+        for term in terms:
+            tokens = tuple(tokenize(term))
+            if not tokens or tokens in seen:
+                continue
+            seen.add(tokens)
+            term_index = len(self.terms)
+            self.terms.append(term)
+            node = 0
+            for token in tokens:
+                child = self._goto[node].get(token)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][token] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                node = child
+            self._output[node] += (term_index,)
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                # Inherit matches that end at the suffix state
+                self._output[child] += self._output[self._fail[child]]
+
+    def count_tokens(self, tokens):
+        """
+        Count term occurrences in an already tokenized, lowercased stream
+        Returns a Counter of term -> occurrences (only terms that matched)
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        hits = Counter()
+        node = 0
+        for token in tokens:
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            if output[node]:
+                hits.update(output[node])
+        terms = self.terms
+        return Counter({terms[index]: count for index, count in hits.items()})
+
+    def count(self, text):
+        """
+        Count term occurrences in raw text
+        """
+        return self.count_tokens(tokenize(text))
+
@@ -0,0 +1,260 @@
+"""
+In-process request metrics in the Prometheus text format.
+
+ANALYZER_METRICS        1 (default) records counters and stage timings; 0 disables
+ANALYZER_SERVER_TIMING  1 adds a Server-Timing header with the stage timings
+                        of each analysis (default 0)
+
+Stages are timed with span(name). While a request is being handled,
+collect() also gathers its stage timings and counter increments, so they
+can be sent back in a Server-Timing header or, when the work ran in a
+pool process, returned to the parent and replayed into its registry.
+With metrics disabled span() returns a shared no-op context manager.
+
+Every process has its own registry: run one server process (with a pool)
+per scrape target rather than several independent workers.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("ANALYZER_METRICS", "1") != "0"
+SERVER_TIMING = os.environ.get("ANALYZER_SERVER_TIMING", "0") == "1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Route labels are limited to known paths to keep series bounded
+ROUTES = {"/api/analyze", "/api/batch", "/api/jobs", "/api/match", "/api/metrics", "/api/search"}
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_collector = contextvars.ContextVar("analyzer_metrics_collector", default=None)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic count, optionally split by label values
+    """
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+        collector = _collector.get()
+        if collector is not None:
+            collector.counts.append((self.name, labels, amount))
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name + _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """
+    Distribution of observed values in cumulative buckets
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        if not ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield self.name + "_bucket" + _format_labels(self.labelnames, labels, [("le", le)]), cumulative
+            yield self.name + "_sum" + _format_labels(self.labelnames, labels), total
+            yield self.name + "_count" + _format_labels(self.labelnames, labels), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def render(self):
+        """
+        Prometheus text exposition of every metric
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name} {_format_value(value)}" for name, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter("analyzer_requests_total", "HTTP responses sent", ("route", "status"))
+ERRORS = REGISTRY.counter("analyzer_errors_total", "Failed requests and analyses", ("kind",))
+BYTES_IN = REGISTRY.counter("analyzer_request_bytes_total", "Request body bytes accepted for analysis")
+PAGES = REGISTRY.counter("analyzer_pages_total", "PDF pages extracted")
+EXTRACTION_FAILURES = REGISTRY.counter("analyzer_extraction_failures_total",
+                                       "Extractions stopped by an engine error or a sandbox limit", ("kind",))
+CACHE = REGISTRY.counter("analyzer_cache_requests_total", "Result cache lookups", ("result",))
+JOBS = REGISTRY.counter("analyzer_jobs_total", "Background job attempts by outcome", ("status",))
+DUPLICATES = REGISTRY.counter("analyzer_duplicates_total", "Near-duplicate resumes flagged or reused", ("action",))
+REJECTED = REGISTRY.counter("analyzer_rejected_connections_total", "Connections refused with 503 at accept time")
+BUSY = REGISTRY.counter("analyzer_rejected_analyses_total", "Analyses refused with 503 because every slot was taken")
+STAGE_SECONDS = REGISTRY.histogram("analyzer_stage_seconds", "Time spent in each analysis stage", ("stage",))
+
+
+class Collector:
+    """
+    Stage timings and counter increments recorded during one request
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self.counts = []
+
+    def server_timing(self):
+        entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(entries)
+
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe_stage(self.stage, time.perf_counter() - self.started)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage):
+    """
+    Context manager timing one pipeline stage
+    """
+    return _Span(stage) if ENABLED else _NULL_SPAN
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage)
+    collector = _collector.get()
+    if collector is not None:
+        collector.stages.append((stage, seconds))
+
+
+@contextmanager
+def collect():
+    """
+    Gather the measurements taken inside the block into a Collector
+    """
+    collector = Collector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+
+
+def replay(stages, counts):
+    """
+    Apply measurements returned from a pool process to this process
+    """
+    for stage, seconds in stages:
+        observe_stage(stage, seconds)
+    for name, labels, amount in counts:
+        REGISTRY.get(name).inc(amount, *labels)
+
+
+def server_timing_headers():
+    """
+    Server-Timing header for the current request, when enabled
+    """
+    collector = _collector.get()
+    if not (SERVER_TIMING and ENABLED) or collector is None:
+        return {}
+    return {"Server-Timing": collector.server_timing()}
+
+
+def route_label(path):
+    """
+    Bounded route label for a request path (query string dropped)
+    """
+    path = path.split("?")[0].rstrip("/")
+    if path.startswith("/api/jobs/"):
+        # One label for every job id
+        return "/api/jobs"
+    return path if path in ROUTES else "other"
@@ -0,0 +1,223 @@
+"""
+Incremental multipart/form-data parser.
+
+The request body is read in fixed-size chunks and each file part is
+streamed straight into a SpooledTemporaryFile (in memory while small,
+on disk beyond SPOOL_THRESHOLD) while its SHA-256 is computed on the
+fly, so an upload is held once rather than copied per split/slice and
+the result cache can be consulted without re-reading the file.
+"""
+import hashlib
+import re
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_THRESHOLD = 1024 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+MAX_FIELD_BYTES = 256 * 1024
+
+DISPOSITION_PARAM = re.compile(r';\s*(name|filename)="((?:[^"\\]|\\.)*)"', re.IGNORECASE)
+
+
+class UploadError(Exception):
+    """
+    Malformed or unacceptable upload; status is the HTTP code to answer with
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class FilePart:
+    """
+    A file field spooled to memory/disk, with its size and SHA-256 digest
+    """
+
+    def __init__(self, name, filename, content_type):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD)
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self.sha256 = None
+
+    def write(self, data):
+        self.file.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+    def finish(self):
+        self.sha256 = self._hash.hexdigest()
+        self.file.seek(0)
+
+    def read(self):
+        self.file.seek(0)
+        data = self.file.read()
+        self.file.seek(0)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class FormData:
+    """
+    Parsed form: text fields by name plus file parts in upload order
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.files = []
+
+    def close(self):
+        for part in self.files:
+            part.close()
+
+
+def get_boundary(content_type):
+    """
+    Pull the boundary out of a multipart Content-Type header
+    """
+    if not content_type or 'multipart/form-data' not in content_type.lower():
+        raise UploadError('Invalid content type')
+    match = re.search(r'boundary=(?:"([^"]+)"|([^;\s]+))', content_type)
+    if not match:
+        raise UploadError('Missing multipart boundary')
+    boundary = (match.group(1) or match.group(2)).encode('latin-1')
+    if len(boundary) > 200:
+        raise UploadError('Invalid multipart boundary')
+    return boundary
+
+
+def _parse_part_headers(raw):
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+    headers = {}
+    for line in text.split('\r\n'):
+        if not line:
+            continue
+        key, sep, value = line.partition(':')
+        if not sep:
+            raise UploadError('Malformed part header')
+        headers[key.strip().lower()] = value.strip()
+    disposition = headers.get('content-disposition', '')
+    if not disposition.lower().startswith('form-data'):
+        raise UploadError('Missing Content-Disposition in multipart part')
+    params = {key.lower(): value for key, value in DISPOSITION_PARAM.findall(disposition)}
+    return params.get('name', ''), params.get('filename'), headers.get('content-type', '')
+
+
+def parse_multipart(stream, content_type, content_length, max_size, allowed_extensions=None):
+    """
+    Parse a multipart body from a binary stream
+
+    content_length must be known up front so oversized uploads are rejected
+    before any of the body is read. File parts whose filename does not end in
+    one of allowed_extensions (when given) are skipped without being stored.
+    Raises UploadError on malformed input.
+    """
+    boundary = get_boundary(content_type)
+    if content_length is None:
+        raise UploadError('Content-Length required', 411)
+    try:
+        remaining = int(content_length)
+    except ValueError:
+        raise UploadError('Invalid Content-Length')
+    if remaining > max_size:
+        raise UploadError(f'Upload exceeds the {max_size} byte limit', 413)
+
+    delimiter = b'\r\n--' + boundary
+    form = FormData()
+    # Prefixing CRLF lets the first boundary match the same delimiter as the rest
+    buffer = bytearray(b'\r\n')
+    eof = False
+
+    def fill():
+        nonlocal remaining, eof
+        if remaining <= 0:
+            eof = True
+            return
+        chunk = stream.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            eof = True
+            return
+        remaining -= len(chunk)
+        buffer.extend(chunk)
+
+    try:
+        # Skip the preamble up to the first boundary
+        while True:
+            index = buffer.find(delimiter)
+            if index != -1:
+                del buffer[:index + len(delimiter)]
+                break
+            if eof:
+                raise UploadError('Multipart boundary not found')
+            del buffer[:max(0, len(buffer) - len(delimiter))]
+            fill()
+
+        while True:
+            while len(buffer) < 2 and not eof:
+                fill()
+            if buffer[:2] == b'--':
+                return form
+            if buffer[:2] != b'\r\n':
+                raise UploadError('Malformed multipart boundary')
+            del buffer[:2]
+
+            # Part headers, bounded so a bad request is rejected early
+            while True:
+                header_end = buffer.find(b'\r\n\r\n')
+                if header_end != -1:
+                    break
+                if len(buffer) > MAX_HEADER_BYTES:
+                    raise UploadError('Multipart part headers too large')
+                if eof:
+                    raise UploadError('Truncated multipart body')
+                fill()
+            if header_end > MAX_HEADER_BYTES:
+                raise UploadError('Multipart part headers too large')
+            name, filename, part_type = _parse_part_headers(bytes(buffer[:header_end]))
+            del buffer[:header_end + 4]
+
+            if filename is not None:
+                keep = allowed_extensions is None or filename.lower().endswith(tuple(allowed_extensions))
+                target = FilePart(name, filename, part_type) if keep else None
+            else:
+                target = bytearray()
+
+            # Part body: everything up to the next delimiter
+            while True:
+                index = buffer.find(delimiter)
+                if index != -1:
+                    body_end = index
+                elif eof:
+                    raise UploadError('Truncated multipart body')
+                else:
+                    # Hold back enough bytes for a delimiter split across reads
+                    body_end = max(0, len(buffer) - len(delimiter) + 1)
+                if body_end:
+                    if isinstance(target, bytearray):
+                        if len(target) + body_end > MAX_FIELD_BYTES:
+                            raise UploadError('Form field too large', 413)
+                        target.extend(memoryview(buffer)[:body_end])
+                    elif target is not None:
+                        target.write(memoryview(buffer)[:body_end])
+                    del buffer[:body_end]
+                if index != -1:
+                    del buffer[:len(delimiter)]
+                    break
+                fill()
+
+            if isinstance(target, bytearray):
+                form.fields[name] = target.decode('utf-8', 'replace')
+            elif target is not None:
+                target.finish()
+                form.files.append(target)
+    except BaseException:
+        form.close()
+        raise
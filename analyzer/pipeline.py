@@ -0,0 +1,443 @@
+"""
+End-to-end analysis: raw PDF bytes in, result dict out.
+"""
+import io
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from analyzer import metrics
+from analyzer.cache import content_digest, make_key
+from analyzer.document import Document
+from analyzer.engines import FALLBACK_ENGINE, fast_engine, get_engine
+from analyzer.extraction import ExtractionError, ExtractionLimits, ExtractionReport, default_engine, iter_extract
+from analyzer.rules import get_ruleset
+from analyzer.scoring import PREVIEW_CHARS, iter_score_document, score_document
+
+# Scored by warm_up to exercise every scorer once
+WARM_UP_TEXT = (
+    "Jane Doe\nEmail: jane@example.com\n\nEXPERIENCE\n"
+    "Led a team of engineers building Python services and SQL pipelines on AWS.\n\n"
+    "EDUCATION\nB.S. Computer Science, 2015.\n\nSKILLS\nPython, Docker, communication, leadership.\n"
+)
+
+
+def warm_up(ruleset=None, engine=None):
+    """
+    Do the one-time work the first analysis would otherwise pay for
+
+    Compiles the ruleset, imports the extraction engine (in auto mode the
+    fast one; pdfplumber is only needed for fallbacks) and scores a short
+    sample text, which loads the hyphenation dictionary. Nothing is cached
+    or indexed. Used as the process pool initializer by analyzer.server and
+    at import by api/analyze.py when ANALYZER_WARM_UP=1.
+    """
+    rules = get_ruleset(ruleset)
+    engine = engine or default_engine()
+    if engine == "auto":
+        engine = fast_engine() or FALLBACK_ENGINE
+    get_engine(engine).load()
+    score_document(Document(WARM_UP_TEXT), ruleset=rules)
+
+
+def _warm_worker():
+    # An initializer that raises breaks the whole pool; a real problem
+    # (say, a broken ruleset) is reported by the first analysis instead
+    try:
+        warm_up()
+    except Exception:
+        pass
+
+
+def warm_pool(workers):
+    """
+    ProcessPoolExecutor whose workers start, and warm up, right away
+    instead of on the first requests
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker)
+    for _ in range(workers):
+        # Each submit to a pool without idle workers starts one
+        executor.submit(int)
+    return executor
+
+
+def iter_load_document(data, limits=None, engine=None):
+    """
+    load_document as a generator: yields a ("page", progress) pair as each
+    page is extracted and returns the Document (use with yield from)
+
+    progress is {page, pages, engine, characters}; after an auto-mode
+    fallback the page numbers start over under the fallback engine. With
+    ANALYZER_SANDBOX_WORKERS set, extraction runs in a resource-limited
+    worker process (see analyzer.sandbox). A failed extraction is recorded
+    in doc.extraction.error and keeps the pages read before it.
+    """
+    pdf_file = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    report = ExtractionReport()
+    sandbox = default_sandbox()
+    with metrics.span("extract"):
+        try:
+            if sandbox is not None:
+                raw = data if isinstance(data, (bytes, bytearray)) else pdf_file.read()
+                pages = sandbox.iter_extract(raw, limits or ExtractionLimits.from_env(), report, engine)
+            else:
+                pages = iter_extract(pdf_file, limits, report=report, engine=engine)
+            for page in pages:
+                yield "page", {'page': page.number, 'pages': report.total_pages, 'engine': report.engine,
+                               'characters': len(page.text)}
+        except ExtractionError as e:
+            extraction_failed(report, e)
+        except MemoryError:
+            extraction_failed(report, ExtractionError("memory", "Extraction ran out of memory"))
+        except Exception as e:
+            extraction_failed(report, ExtractionError("parse", f"{type(e).__name__}: {e}"))
+    pages = report.pages
+    metrics.PAGES.inc(len(pages))
+    emphasis = None
+    if any(page.emphasis is not None for page in pages):
+        emphasis = frozenset(key for page in pages for key in page.emphasis or ())
+    return Document.from_pages([page.text for page in pages], extraction=report, emphasis=emphasis)
+
+
+def extraction_failed(report, error):
+    # Pages read before the failure are still scored; truncated says why there are no more
+    report.error = error.as_dict()
+    if report.pages:
+        report.truncated = error.kind
+    metrics.EXTRACTION_FAILURES.inc(1, error.kind)
+
+
+def extraction_error_result(report):
+    """
+    The error result for a document without text, saying why when extraction failed
+    """
+    result = {'error': 'Could not extract text from PDF'}
+    if report is not None and report.error is not None:
+        result['error_type'] = report.error['type']
+        result['error_detail'] = report.error['message']
+    else:
+        result['error_type'] = 'no_text'
+    return result
+
+
+def default_sandbox():
+    """
+    The ANALYZER_SANDBOX_WORKERS extraction pool, or None; analyzer.sandbox
+    is only imported once it is configured
+    """
+    if int(os.environ.get("ANALYZER_SANDBOX_WORKERS", 0)) <= 0:
+        return None
+    from analyzer.sandbox import get_default_sandbox
+
+    return get_default_sandbox()
+
+
+def _run(generator):
+    # Drives a generator to the end and returns its return value
+    while True:
+        try:
+            next(generator)
+        except StopIteration as done:
+            return done.value
+
+
+def load_document(data, limits=None, engine=None):
+    """
+    Extract a Document from raw PDF bytes or a seekable binary file
+
+    Pages extracted before a parse error are kept; a PDF that cannot be
+    opened at all yields an empty document.
+    """
+    return _run(iter_load_document(data, limits, engine))
+
+
+def default_index():
+    """
+    The ANALYZER_INDEX_DIR index writer, or None; analyzer.index (and
+    numpy) is only imported once indexing is configured
+    """
+    if not os.environ.get("ANALYZER_INDEX_DIR"):
+        return None
+    from analyzer.index import get_default_index
+
+    return get_default_index()
+
+
+def default_dedup():
+    """
+    The ANALYZER_DEDUP_DB near-duplicate index, or None; imported on the same terms
+    """
+    if not os.environ.get("ANALYZER_DEDUP_DB"):
+        return None
+    from analyzer.dedup import get_default_dedup
+
+    return get_default_dedup()
+
+
+def index_result(doc, result, digest, name=None):
+    """
+    Add a scored document to the ANALYZER_INDEX_DIR index, when configured
+
+    Indexing problems are counted in the metrics but never fail the analysis.
+    """
+    writer = default_index()
+    if writer is None:
+        return
+    try:
+        with metrics.span("index"):
+            writer.add_document(doc, result, digest, name)
+    except Exception:
+        metrics.ERRORS.inc(1, "index")
+
+
+def result_variant(preview_chars, engine, rules, job_description=None):
+    """
+    Everything besides the content that a result depends on, as a string
+    """
+    parts = [preview_chars, engine, rules.key]
+    if job_description:
+        parts.append(content_digest(job_description.encode()))
+    return ":".join(str(part) for part in parts)
+
+
+def duplicate_entry(match, reused=False):
+    return {'digest': match.digest, 'name': match.name, 'similarity': match.similarity, 'reused': reused}
+
+
+def iter_score_pdf(data, preview_chars=PREVIEW_CHARS, engine=None, job_description=None, digest=None, name=None,
+                   ruleset=None, reuse_duplicates=False):
+    """
+    score_pdf as a stream of (event, payload) pairs: a "page" event per
+    extracted page (see iter_load_document), then the scoring stages of
+    analyzer.scoring.iter_score_document as they complete, and last
+    ("result", the dict score_pdf returns). A document without text or a
+    reused near duplicate goes straight from the pages to the result.
+    """
+    doc = yield from iter_load_document(data, engine=engine)
+    if not doc.text:
+        metrics.ERRORS.inc(1, "extraction")
+        yield "result", extraction_error_result(doc.extraction)
+        return
+    rules = get_ruleset(ruleset)
+
+    # Like indexing, near-duplicate checks never fail the analysis
+    dedup = default_dedup() if digest is not None else None
+    signature = duplicate = None
+    matches = []
+    if dedup is not None:
+        from analyzer.dedup import dedup_threshold, minhash
+
+        variant = result_variant(preview_chars, engine or default_engine(), rules, job_description)
+        try:
+            with metrics.span("dedup"):
+                signature = minhash(doc.tokens)
+                if signature is not None:
+                    matches = dedup.query(signature, dedup_threshold())
+        except Exception:
+            metrics.ERRORS.inc(1, "dedup")
+            signature = None
+        if matches:
+            duplicate = matches[0]
+            metrics.DUPLICATES.inc(1, "flagged")
+        if reuse_duplicates:
+            for match in matches:
+                previous = dedup.result(match.id) if match.variant == variant else None
+                if previous is not None:
+                    metrics.DUPLICATES.inc(1, "reused")
+                    # The scores carry over, but the preview must show this upload's text
+                    yield "result", {**previous, 'text_preview': doc.preview(preview_chars),
+                                     'duplicate_of': duplicate_entry(match, reused=True)}
+                    return
+
+    for stage, partial in iter_score_document(doc, preview_chars, job_description, rules):
+        if stage != "result":
+            yield stage, partial
+    result = partial
+    if duplicate is not None:
+        result['duplicate_of'] = duplicate_entry(duplicate)
+    if digest is not None:
+        index_result(doc, result, digest, name)
+    # An identical file already stored with the same options adds nothing
+    if signature is not None and not any(match.digest == digest and match.variant == variant for match in matches):
+        try:
+            dedup.add(signature, digest, name, result, variant)
+        except Exception:
+            metrics.ERRORS.inc(1, "dedup")
+    yield "result", result
+
+
+def score_pdf(data, preview_chars=PREVIEW_CHARS, engine=None, job_description=None, digest=None, name=None,
+              ruleset=None, reuse_duplicates=False):
+    """
+    Extract and score one PDF with no caching (safe to run in a worker process)
+    With a digest the document is also added to the search index and checked
+    against the near-duplicate index, when those are enabled. With
+    reuse_duplicates a near duplicate's stored result (same options) is
+    returned instead of scoring again.
+    ruleset is a ruleset name; workers load and hot-reload it themselves.
+    """
+    for _, result in iter_score_pdf(data, preview_chars, engine, job_description, digest, name, ruleset,
+                                    reuse_duplicates):
+        pass
+    return result
+
+
+def score_pdf_measured(data, preview_chars=PREVIEW_CHARS, engine=None, job_description=None, digest=None,
+                       name=None, ruleset=None, reuse_duplicates=False):
+    """
+    score_pdf for pool processes: also returns the stage timings and counts
+    it recorded, for the parent to replay into its own metrics
+    """
+    with metrics.collect() as collected:
+        result = score_pdf(data, preview_chars, engine, job_description, digest, name, ruleset, reuse_duplicates)
+    return result, collected.stages, collected.counts
+
+
+def score_pdf_relayed(events, data, preview_chars=PREVIEW_CHARS, engine=None, job_description=None, digest=None,
+                      name=None, ruleset=None, reuse_duplicates=False):
+    """
+    iter_score_pdf for pool processes: puts each event on the events queue
+    (see event_queue) and returns the stage timings and counts it recorded
+    """
+    with metrics.collect() as collected:
+        for event in iter_score_pdf(data, preview_chars, engine, job_description, digest, name, ruleset,
+                                    reuse_duplicates):
+            events.put(event)
+    return collected.stages, collected.counts
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def event_queue():
+    """
+    A queue that pool workers can put events on for this process to read;
+    the multiprocessing manager serving it is started on first use
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = multiprocessing.Manager()
+        return _manager.Queue()
+
+
+def extract_text(data, engine=None):
+    """
+    Full extracted text of one PDF (pool entry point for ranking)
+    """
+    return load_document(data, engine=engine).text
+
+
+def _lookup(data, cache, preview_chars, digest, engine, job_description, ruleset):
+    # Shared start of analyze_pdf and iter_analyze_pdf: resolves the options
+    # and returns (engine, rules, cache key, digest to index under, cached result)
+    engine = engine or default_engine()
+    # Resolved here so edits to the ruleset file also change the cache key
+    rules = get_ruleset(ruleset)
+    # The search and near-duplicate indexes both record documents by digest
+    indexing = default_index() is not None or default_dedup() is not None
+    if digest is None and (cache is not None or indexing):
+        digest = content_digest(data)
+    key = result = None
+    if cache is not None:
+        with metrics.span("cache"):
+            key = make_key(digest, result_variant(preview_chars, engine, rules, job_description))
+            result = cache.get(key)
+        metrics.CACHE.inc(1, "miss" if result is None else "hit")
+    return engine, rules, key, digest if indexing else None, result
+
+
+def _store(cache, key, result):
+    # A reused result stands in for this file only on request, so it is not cached
+    if cache is not None and 'error' not in result and not result.get('duplicate_of', {}).get('reused'):
+        cache.set(key, result)
+
+
+def analyze_pdf(data, cache=None, preview_chars=PREVIEW_CHARS, digest=None, executor=None, engine=None,
+                job_description=None, name=None, ruleset=None, reuse_duplicates=False):
+    """
+    Score a resume PDF, consulting the result cache first when one is given
+
+    data is raw bytes or a seekable binary file; pass the content digest
+    along with a file so it does not have to be read twice. With an
+    executor (e.g. a ProcessPoolExecutor) the CPU-bound work runs there
+    while cache lookups stay in the calling process. engine selects the
+    extraction backend (default: ANALYZER_PDF_ENGINE); a job_description
+    adds a job_match section scored against it. ruleset names the scoring
+    ruleset (default: ANALYZER_RULESET); an unknown name raises
+    UnknownRulesetError. Freshly scored documents are added to the search
+    index under name when ANALYZER_INDEX_DIR is set, and checked for near
+    duplicates when ANALYZER_DEDUP_DB is set (see analyzer.dedup);
+    reuse_duplicates then returns a near duplicate's earlier result.
+    """
+    engine, rules, key, index_digest, result = _lookup(data, cache, preview_chars, digest, engine,
+                                                       job_description, ruleset)
+    if result is not None:
+        return result
+
+    if executor is not None:
+        if not isinstance(data, (bytes, bytearray)):
+            data = data.read()
+        with metrics.span("pool"):
+            result, stages, counts = executor.submit(score_pdf_measured, data, preview_chars, engine,
+                                                     job_description, index_digest, name, rules.name,
+                                                     reuse_duplicates).result()
+        metrics.replay(stages, counts)
+    else:
+        result = score_pdf(data, preview_chars, engine, job_description, index_digest, name, rules.name,
+                           reuse_duplicates)
+    _store(cache, key, result)
+    return result
+
+
+# How often a relayed stream checks whether its worker died without a result
+RELAY_POLL_SECONDS = 0.5
+
+
+def iter_analyze_pdf(data, cache=None, preview_chars=PREVIEW_CHARS, digest=None, executor=None, engine=None,
+                     job_description=None, name=None, ruleset=None, reuse_duplicates=False):
+    """
+    analyze_pdf as a stream of (event, payload) pairs for progressive
+    responses (see iter_score_pdf); the last is ("result", the dict
+    analyze_pdf would return). A cache hit yields only the result. With an
+    executor the worker's events are relayed through an event_queue as
+    they happen.
+    """
+    engine, rules, key, index_digest, result = _lookup(data, cache, preview_chars, digest, engine,
+                                                       job_description, ruleset)
+    if result is not None:
+        yield "result", result
+        return
+
+    args = (preview_chars, engine, job_description, index_digest, name, rules.name, reuse_duplicates)
+    if executor is None:
+        for event, payload in iter_score_pdf(data, *args):
+            if event == "result":
+                # Cached before the last event goes out, as analyze_pdf would
+                _store(cache, key, payload)
+            yield event, payload
+        return
+
+    if not isinstance(data, (bytes, bytearray)):
+        data = data.read()
+    events = event_queue()
+    future = executor.submit(score_pdf_relayed, events, data, *args)
+    while True:
+        try:
+            event, payload = events.get(timeout=RELAY_POLL_SECONDS)
+        except queue.Empty:
+            if future.done():
+                # Raises the worker's exception, if it had one
+                future.result()
+                raise RuntimeError("Analysis worker stopped without a result")
+            continue
+        if event == "result":
+            break
+        yield event, payload
+    stages, counts = future.result()
+    metrics.replay(stages, counts)
+    _store(cache, key, payload)
+    yield event, payload
@@ -0,0 +1,193 @@
+"""
+Readability formulas from counts gathered once per text.
+
+textstat recounts words, sentences and syllables for every formula and
+hyphenates every word occurrence with pyphen. TextStats tokenizes a text
+once, hyphenates each distinct word once through a process-wide LRU
+cache (resume vocabularies overlap heavily between requests) and derives
+every formula from the stored counts.
+
+Counting rules and rounding follow textstat 0.7 with its defaults
+(en_US, punctuation including apostrophes removed), so the scores match
+textstat's; benchmarks/bench_readability.py checks that on a corpus.
+"""
+import math
+import re
+from collections import Counter
+from functools import cached_property, lru_cache
+from importlib import resources
+
+from pyphen import Pyphen
+
+SYLLABLE_CACHE_SIZE = 65536
+LANGUAGE = "en_US"
+# Gunning Fog counts words of this many syllables or more as difficult
+FOG_SYLLABLES = 3
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+WORD_CHARACTER = re.compile(r"\w")
+SENTENCE = re.compile(r"\b[^.!?]+[.!?]*")
+# Words considered for the difficult-word list (before punctuation removal)
+DIFFICULT_CANDIDATE = re.compile(r"[\w\='‘’]+")
+
+
+@lru_cache(maxsize=None)
+def hyphenator():
+    """
+    Shared Pyphen instance (loading the dictionary takes ~100 ms, so it
+    happens on first use or in analyzer.pipeline.warm_up, not at import)
+    """
+    return Pyphen(lang=LANGUAGE)
+
+
+@lru_cache(maxsize=SYLLABLE_CACHE_SIZE)
+def word_syllables(word):
+    """
+    Syllables in one lowercase word with punctuation already removed
+    """
+    return len(hyphenator().positions(word)) + 1
+
+
+def syllable_count(text):
+    """
+    Syllables in a text, counted like textstat.syllable_count
+    """
+    return sum(word_syllables(word) for word in PUNCTUATION.sub("", text.lower()).split())
+
+
+@lru_cache(maxsize=None)
+def easy_words():
+    """
+    Dale-Chall list of easy words shipped with textstat
+    """
+    with resources.files("textstat").joinpath("resources/en/easy_words.txt").open("rb") as f:
+        return frozenset(line.decode("utf-8").strip() for line in f)
+
+
+def _is_fragment(sentence):
+    # Same as len(PUNCTUATION.sub("", sentence).split()) <= 2, but stops at
+    # the third token containing a word character
+    words = 0
+    for token in sentence.split():
+        if WORD_CHARACTER.search(token):
+            words += 1
+            if words > 2:
+                return False
+    return True
+
+
+def legacy_round(number, points=0):
+    """
+    textstat's rounding: half away from zero
+    """
+    scale = 10 ** points
+    return float(math.floor(number * scale + math.copysign(0.5, number))) / scale
+
+
+class TextStats:
+    """
+    Sentence, word, character and syllable counts of one text
+    """
+
+    def __init__(self, text):
+        self.text = text
+        words = PUNCTUATION.sub("", text.lower()).split()
+        self.word_count = len(words)
+        # Each distinct word is hyphenated (or looked up) once
+        self.syllable_count = sum(word_syllables(word) * count for word, count in Counter(words).items())
+
+        sentences = SENTENCE.findall(text)
+        # Fragments of two words or fewer (headings, bullets) are not sentences
+        short = sum(1 for sentence in sentences if _is_fragment(sentence))
+        self.sentence_count = max(1, len(sentences) - short)
+
+    @cached_property
+    def character_count(self):
+        """
+        Characters other than whitespace
+        """
+        return sum(map(len, self.text.split()))
+
+    @cached_property
+    def letter_count(self):
+        """
+        Word characters (whitespace and punctuation excluded)
+        """
+        return sum(map(len, PUNCTUATION.sub("", self.text).split()))
+
+    @cached_property
+    def polysyllable_count(self):
+        """
+        Whitespace-separated words of three or more syllables
+        """
+        return sum(1 for word in self.text.split() if syllable_count(word) >= 3)
+
+    def difficult_word_count(self, syllable_threshold=2):
+        """
+        Distinct words outside the easy-word list with at least
+        syllable_threshold syllables
+        """
+        easy = easy_words()
+        count = 0
+        for word in set(DIFFICULT_CANDIDATE.findall(self.text.lower())):
+            if word in easy:
+                continue
+            # Candidates hold no whitespace, so each strips to one word or none
+            bare = PUNCTUATION.sub("", word)
+            if (word_syllables(bare) if bare else 0) >= syllable_threshold:
+                count += 1
+        return count
+
+    @property
+    def avg_sentence_length(self):
+        return legacy_round(self.word_count / self.sentence_count, 1)
+
+    @property
+    def avg_syllables_per_word(self):
+        if not self.word_count:
+            return 0.0
+        return legacy_round(self.syllable_count / self.word_count, 1)
+
+    def flesch_reading_ease(self):
+        return legacy_round(206.835 - 1.015 * self.avg_sentence_length - 84.6 * self.avg_syllables_per_word, 2)
+
+    def flesch_kincaid_grade(self):
+        return legacy_round(0.39 * self.avg_sentence_length + 11.8 * self.avg_syllables_per_word - 15.59, 1)
+
+    def gunning_fog(self):
+        if not self.word_count:
+            return 0.0
+        difficult = self.difficult_word_count(FOG_SYLLABLES) / self.word_count * 100
+        return legacy_round(0.4 * (self.avg_sentence_length + difficult), 2)
+
+    def smog_index(self):
+        if self.sentence_count < 3:
+            return 0.0
+        return legacy_round(1.043 * (30 * (self.polysyllable_count / self.sentence_count)) ** .5 + 3.1291, 1)
+
+    def coleman_liau_index(self):
+        if not self.word_count:
+            return legacy_round(-15.8, 2)
+        letters = legacy_round(legacy_round(self.letter_count / self.word_count, 2) * 100, 2)
+        sentences = legacy_round(legacy_round(self.sentence_count / self.word_count, 2) * 100, 2)
+        return legacy_round(0.058 * letters - 0.296 * sentences - 15.8, 2)
+
+    def automated_readability_index(self):
+        if not self.word_count:
+            return 0.0
+        characters = legacy_round(self.character_count / self.word_count, 2)
+        words = legacy_round(self.word_count / self.sentence_count, 2)
+        return legacy_round(4.71 * characters + 0.5 * words - 21.43, 1)
+
+    def scores(self):
+        """
+        Every formula, keyed like the textstat function of the same name
+        """
+        return {
+            "flesch_reading_ease": self.flesch_reading_ease(),
+            "flesch_kincaid_grade": self.flesch_kincaid_grade(),
+            "gunning_fog": self.gunning_fog(),
+            "smog_index": self.smog_index(),
+            "coleman_liau_index": self.coleman_liau_index(),
+            "automated_readability_index": self.automated_readability_index(),
+        }
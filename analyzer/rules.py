@@ -0,0 +1,278 @@
+"""
+Scoring rulesets: keyword lists, section headings and score bands.
+
+A ruleset is a JSON (or, with PyYAML installed, YAML) file named after
+the ruleset, e.g. data-science.json. Files are looked up in
+ANALYZER_RULES_DIR first and then in the bundled analyzer/rulesets/
+directory, so a file there can also override the bundled default.
+
+ANALYZER_RULES_DIR  directory of extra or overriding ruleset files
+ANALYZER_RULESET    ruleset used when a request does not name one (default: default)
+
+A file may set "extends" to another ruleset's name and only list what it
+changes: top-level mappings (keywords, sections, readability, ...) are
+merged key by key, everything else is replaced.
+
+Each ruleset is compiled once: a KeywordMatcher over every keyword, a
+SectionSegmenter over the section headings (plus optional
+"section_patterns", regular expressions that also mark a section present,
+e.g. an email address for contact details) and bisect lookup tables for
+the score bands.
+get_ruleset() re-stats the files behind a compiled ruleset on every call
+and recompiles it when one has changed, so edits take effect in running
+servers and pool workers without a restart. If an edited file fails to load, the last good
+version keeps being served and the failure is counted in the metrics.
+"""
+import bisect
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+
+from analyzer import metrics
+from analyzer.keywords import KeywordMatcher
+from analyzer.sections import SectionSegmenter
+
+BUNDLED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rulesets")
+RULES_DIR = os.environ.get("ANALYZER_RULES_DIR")
+DEFAULT_RULESET = os.environ.get("ANALYZER_RULESET", "default")
+EXTENSIONS = (".json", ".yaml", ".yml")
+NAME_PATTERN = re.compile(r"[A-Za-z0-9_-]+\Z")
+MAX_EXTENDS_DEPTH = 8
+
+
+class RulesetError(Exception):
+    pass
+
+
+class UnknownRulesetError(RulesetError):
+    pass
+
+
+class BandTable:
+    """
+    Points for a value from an ordered list of inclusive [min, max] bands
+
+    The first band containing the value wins, otherwise default applies.
+    The bands are flattened into sorted boundaries with the points of
+    every interval between them, so a lookup is one bisect.
+    """
+
+    def __init__(self, bands, default):
+        self.bands = [(band.get("min", float("-inf")), band.get("max", float("inf")), band["points"])
+                      for band in bands]
+        self.default = default
+        # (x, 0) opens an interval at x itself, (x, 1) just after x
+        self._edges = sorted({(low, 0) for low, _, _ in self.bands} | {(high, 1) for _, high, _ in self.bands})
+        self._points = [self._first_match(self._sample(index)) for index in range(len(self._edges) + 1)]
+
+    def _sample(self, index):
+        # Any value inside interval `index`, used to precompute its points
+        if index == 0:
+            return self._edges[0][0] - 1 if self._edges else 0
+        value, side = self._edges[index - 1]
+        if side == 0:
+            return value
+        if index < len(self._edges):
+            return (value + self._edges[index][0]) / 2
+        return value + 1
+
+    def _first_match(self, value):
+        for low, high, points in self.bands:
+            if low <= value <= high:
+                return points
+        return self.default
+
+    def __call__(self, value):
+        # NaN compares false to every edge and lands past the last band
+        return self._points[bisect.bisect_right(self._edges, (value, 0.5))]
+
+
+class Ruleset:
+    """
+    A ruleset file compiled for scoring
+    """
+
+    def __init__(self, name, spec, version):
+        self.name = name
+        self.version = version
+        self.description = spec.get("description", "")
+
+        self.keyword_groups = {group: tuple(terms) for group, terms in spec["keywords"].items()}
+        self.terms = tuple(dict.fromkeys(term for terms in self.keyword_groups.values() for term in terms))
+        self.keywords = frozenset(self.terms)
+        self.matcher = KeywordMatcher(self.terms)
+        scoring = spec["keyword_scoring"]
+        self.points_per_match = scoring["points_per_match"]
+        self.max_frequency_points = scoring["max_frequency_points"]
+        self.points_per_unique = scoring["points_per_unique"]
+        self.max_diversity_points = scoring["max_diversity_points"]
+        self.max_keyword_points = scoring["max_points"]
+
+        # Heading names per section; a section counts when one heads a line
+        self.sections = {section: tuple(headings) for section, headings in spec["sections"].items()}
+        if not self.sections:
+            # Section points are shared out per section
+            raise ValueError("sections must name at least one section")
+        self.section_patterns = {section: tuple(patterns)
+                                 for section, patterns in spec.get("section_patterns", {}).items()}
+        self.segmenter = SectionSegmenter(self.sections, self.section_patterns)
+        self.section_points = spec["section_points"]
+
+        readability = spec["readability"]
+        self.min_characters = readability["min_characters"]
+        self.short_text_points = readability["short_text_points"]
+        self.readability_error_points = readability["error_points"]
+        self.readability_bands = BandTable(readability["bands"], readability["default_points"])
+
+        length = spec["length"]
+        self.length_bands = BandTable(length["bands"], length["default_points"])
+        self.too_short_below = length["too_short_below"]
+        self.too_long_above = length["too_long_above"]
+
+    @property
+    def key(self):
+        """
+        Name and content version, for cache keys
+        """
+        return f"{self.name}@{self.version}"
+
+    def __repr__(self):
+        return f"<Ruleset {self.key}>"
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _overlay(base, value):
+    # Mappings are merged one level deep; anything else is replaced
+    if isinstance(base, dict) and isinstance(value, dict):
+        return {**base, **value}
+    return value
+
+
+def _parse(path, raw):
+    if path.endswith(".json"):
+        return json.loads(raw)
+    try:
+        import yaml
+    except ImportError:
+        raise RulesetError(f"PyYAML is required to load {path}")
+    return yaml.safe_load(raw)
+
+
+class RulesetStore:
+    """
+    Compiled rulesets by name, recompiled when their files change
+    """
+
+    def __init__(self, directories):
+        self.directories = [directory for directory in directories if directory]
+        # name -> ({path: stamp} of the files it was built from, Ruleset)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        """
+        Names of every available ruleset
+        """
+        found = set()
+        for directory in self.directories:
+            for extension in EXTENSIONS:
+                for path in glob.glob(os.path.join(directory, "*" + extension)):
+                    name = os.path.basename(path)[:-len(extension)]
+                    if NAME_PATTERN.match(name):
+                        found.add(name)
+        return sorted(found)
+
+    def find(self, name):
+        if not NAME_PATTERN.match(name):
+            raise UnknownRulesetError(f"Invalid ruleset name: {name}")
+        for directory in self.directories:
+            for extension in EXTENSIONS:
+                path = os.path.join(directory, name + extension)
+                if os.path.isfile(path):
+                    return path
+        raise UnknownRulesetError(f"Unknown ruleset: {name}")
+
+    def get(self, name=None):
+        """
+        The compiled ruleset, reloaded first if any of its files changed
+        """
+        name = name or DEFAULT_RULESET
+        entry = self._entries.get(name)
+        if entry is not None and self._fresh(entry[0]):
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and self._fresh(entry[0]):
+                return entry[1]
+            try:
+                stamps, ruleset = self._build(name)
+            except RulesetError:
+                if entry is None:
+                    raise
+                metrics.ERRORS.inc(1, "ruleset")
+                # Keep the last good version until the files change again
+                stamps = {path: _stamp(path) for path in entry[0]}
+                self._entries[name] = (stamps, entry[1])
+                return entry[1]
+            self._entries[name] = (stamps, ruleset)
+            return ruleset
+
+    def _fresh(self, stamps):
+        return all(_stamp(path) == stamp for path, stamp in stamps.items())
+
+    def _build(self, name):
+        stamps = {}
+        digest = hashlib.sha256()
+        spec = {}
+        chain = []
+        current = name
+        while current is not None:
+            if current in chain or len(chain) >= MAX_EXTENDS_DEPTH:
+                raise RulesetError(f"Ruleset {name} extends itself: {' -> '.join(chain + [current])}")
+            chain.append(current)
+            path = self.find(current)
+            stamps[path] = _stamp(path)
+            try:
+                with open(path, "rb") as f:
+                    raw = f.read()
+                layer = _parse(path, raw)
+            except RulesetError:
+                raise
+            except Exception as e:
+                raise RulesetError(f"Cannot read ruleset {path}: {e}")
+            if not isinstance(layer, dict):
+                raise RulesetError(f"Ruleset {path} must contain a mapping")
+            digest.update(raw)
+            # Layers are read child first, so keys already set win
+            spec = {key: _overlay(layer.get(key), value) for key, value in spec.items()} | {
+                key: value for key, value in layer.items() if key not in spec}
+            current = layer.get("extends")
+        try:
+            return stamps, Ruleset(name, spec, digest.hexdigest()[:12])
+        except (KeyError, TypeError, ValueError, AttributeError, re.error) as e:
+            raise RulesetError(f"Invalid ruleset {name}: {e!r}")
+
+
+_store = RulesetStore([RULES_DIR, BUNDLED_DIR])
+
+
+def get_ruleset(name=None):
+    """
+    Compiled ruleset by name (default: ANALYZER_RULESET)
+    Raises UnknownRulesetError for names with no ruleset file.
+    """
+    return _store.get(name)
+
+
+def ruleset_names():
+    return _store.names()
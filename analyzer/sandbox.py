@@ -0,0 +1,284 @@
+"""
+Resource-limited worker processes for PDF text extraction.
+
+A malformed or decompression-bomb PDF can make a PDF engine allocate
+gigabytes or spin for minutes, and in-process that degrades every other
+request sharing the process. With ANALYZER_SANDBOX_WORKERS set,
+analyzer.pipeline hands each PDF to a pool of long-lived extraction
+processes instead:
+
+- every worker runs under an address-space limit (RLIMIT_AS), counted
+  from what it has mapped when it starts
+- every job gets a fresh CPU-time allowance (RLIMIT_CPU)
+- a job that overruns its wall-clock deadline has its worker killed
+- a worker is replaced after max_jobs jobs, or after any failure, so a
+  fragmented heap does not outlive a bounded number of documents
+
+Pages come back one at a time, so progress events keep flowing and the
+pages read before a kill are kept. Failures raise ExtractionError with
+kind timeout, memory, cpu, parse or crash.
+
+ANALYZER_SANDBOX_WORKERS      worker processes per pool (default 0: extract in-process)
+ANALYZER_SANDBOX_MEMORY_MB    address space per worker beyond its start-up size (default 1024)
+ANALYZER_SANDBOX_CPU_SECONDS  CPU seconds per document (default 30)
+ANALYZER_SANDBOX_TIMEOUT      wall-clock seconds per document (default 60)
+ANALYZER_SANDBOX_MAX_JOBS     documents per worker before it is recycled (default 100)
+
+The limits need the resource module (Unix); elsewhere workers only get
+the wall-clock kill and recycling.
+"""
+import io
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from analyzer.extraction import ExtractionError, ExtractionReport, iter_extract
+
+DEFAULT_MEMORY_MB = 1024
+DEFAULT_CPU_SECONDS = 30
+DEFAULT_TIMEOUT = 60
+DEFAULT_MAX_JOBS = 100
+# Time allowed for a worker to exit on its own before it is killed
+EXIT_GRACE_SECONDS = 1
+
+
+def _limit_memory(memory_mb):
+    if resource is None or not memory_mb:
+        return
+    try:
+        # Forked workers inherit the parent's mappings (thread stacks,
+        # libraries), so the limit is headroom above the current size
+        with open("/proc/self/statm") as f:
+            mapped = int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        mapped = 0
+    limit = mapped + memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _limit_cpu(cpu_seconds):
+    # RLIMIT_CPU counts the process's whole lifetime, so each job moves the
+    # soft limit to what has been used so far plus its own allowance
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    limit = math.ceil(usage.ru_utime + usage.ru_stime + cpu_seconds)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+
+class _RelayedReport(ExtractionReport):
+    # Tells the parent when auto mode discards the fast engine's pages
+    def __init__(self, conn):
+        self._conn = None
+        super().__init__()
+        self._conn = conn
+
+    def reset(self):
+        super().reset()
+        if self._conn is not None:
+            self._conn.send(("reset",))
+
+
+def _worker_main(conn, memory_mb, cpu_seconds, max_jobs):
+    # Worker process: extract jobs until max_jobs, any failure (which may
+    # have left the heap in a bad state) or the parent closing the pipe
+    _limit_memory(memory_mb)
+    for _ in range(max_jobs):
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        data, limits, engine = job
+        _limit_cpu(cpu_seconds)
+        report = _RelayedReport(conn)
+        try:
+            # Serial here: the sandbox pool is the unit of parallelism
+            for page in iter_extract(io.BytesIO(data), limits, workers=0, report=report, engine=engine):
+                conn.send(("page", page, report.engine, report.total_pages))
+        except MemoryError:
+            report = data = None
+            conn.send(("error", "memory", "Extraction ran out of memory"))
+            return
+        except Exception as e:
+            conn.send(("error", "parse", f"{type(e).__name__}: {e}"))
+            return
+        conn.send(("done", {"engine": report.engine, "fallback_reason": report.fallback_reason,
+                            "total_pages": report.total_pages, "truncated": report.truncated}))
+
+
+class _Worker:
+    def __init__(self, context, memory_mb, cpu_seconds, max_jobs):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_mb, cpu_seconds, max_jobs),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def retire(self):
+        # Lets the worker exit on its own, then makes sure it has
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(EXIT_GRACE_SECONDS)
+        self.kill()
+
+    def death_kind(self, memory_limited=True):
+        """
+        Why the worker died without reporting: a CPU-limit signal, SIGKILL
+        from the kernel's OOM killer or, under a memory limit, an abort (how
+        the C++ engines react to a failed allocation); otherwise a crash
+        """
+        self.process.join(EXIT_GRACE_SECONDS)
+        code = self.process.exitcode
+        if code == -signal.SIGXCPU:
+            return "cpu"
+        if code == -signal.SIGKILL or (memory_limited and code == -signal.SIGABRT):
+            return "memory"
+        return "crash"
+
+
+class SandboxPool:
+    """
+    Up to `workers` extraction processes shared by every thread of this process
+    """
+
+    def __init__(self, workers=1, memory_mb=DEFAULT_MEMORY_MB, cpu_seconds=DEFAULT_CPU_SECONDS,
+                 timeout=DEFAULT_TIMEOUT, max_jobs=DEFAULT_MAX_JOBS):
+        self.workers = workers
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self._context = multiprocessing.get_context()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.started = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            workers=int(os.environ.get("ANALYZER_SANDBOX_WORKERS", 1)),
+            memory_mb=int(os.environ.get("ANALYZER_SANDBOX_MEMORY_MB", DEFAULT_MEMORY_MB)),
+            cpu_seconds=int(os.environ.get("ANALYZER_SANDBOX_CPU_SECONDS", DEFAULT_CPU_SECONDS)),
+            timeout=float(os.environ.get("ANALYZER_SANDBOX_TIMEOUT", DEFAULT_TIMEOUT)),
+            max_jobs=int(os.environ.get("ANALYZER_SANDBOX_MAX_JOBS", DEFAULT_MAX_JOBS)),
+        )
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+            self.started += 1
+        return _Worker(self._context, self.memory_mb, self.cpu_seconds, self.max_jobs)
+
+    def _checkin(self, worker):
+        if worker.jobs >= self.max_jobs:
+            worker.retire()
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def iter_extract(self, data, limits, report, engine=None):
+        """
+        iter_extract in a worker process: yields each PageText and fills in
+        report as it goes; raises ExtractionError when the worker fails,
+        hits a limit or overruns the wall-clock timeout
+        """
+        self._slots.acquire()
+        worker = None
+        reusable = False
+        try:
+            worker = self._checkout()
+            worker.jobs += 1
+            deadline = time.monotonic() + self.timeout
+            start = time.perf_counter()
+            worker.conn.send((data, limits, engine))
+            while True:
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    raise ExtractionError("timeout", f"Extraction took longer than {self.timeout:g}s")
+                try:
+                    message = worker.conn.recv()
+                except (EOFError, OSError):
+                    kind = worker.death_kind(resource is not None and bool(self.memory_mb))
+                    raise ExtractionError(kind, f"Extraction worker died ({kind}, exit code "
+                                                f"{worker.process.exitcode})")
+                report.seconds = time.perf_counter() - start
+                if message[0] == "page":
+                    _, page, report.engine, report.total_pages = message
+                    report.pages.append(page)
+                    yield page
+                elif message[0] == "reset":
+                    # auto mode fell back: pages start over from page 1
+                    report.pages = []
+                elif message[0] == "done":
+                    for name, value in message[1].items():
+                        setattr(report, name, value)
+                    reusable = True
+                    return
+                else:
+                    _, kind, text = message
+                    raise ExtractionError(kind, text)
+        finally:
+            if worker is not None:
+                if reusable:
+                    self._checkin(worker)
+                else:
+                    # Replaced on failure (a worker exits after reporting
+                    # one), timeout or an abandoned generator, whose worker
+                    # may still be sending pages
+                    worker.kill()
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.retire()
+
+
+_default_pool = None
+_default_pid = None
+_default_lock = threading.Lock()
+
+
+def get_default_sandbox():
+    """
+    Process-wide pool configured by ANALYZER_SANDBOX_WORKERS, or None when unset or 0
+    """
+    global _default_pool, _default_pid
+    if int(os.environ.get("ANALYZER_SANDBOX_WORKERS", 0)) <= 0:
+        return None
+    with _default_lock:
+        # A forked child (say, a process pool worker) needs workers of its own
+        if _default_pool is None or _default_pid != os.getpid():
+            _default_pool = SandboxPool.from_env()
+            _default_pid = os.getpid()
+        return _default_pool
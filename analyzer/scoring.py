@@ -0,0 +1,240 @@
+"""
+Resume scorers shared by the Streamlit app and the API.
+
+Every scorer reads a precomputed Document and takes its keywords, section
+headings and score bands from a compiled ruleset (see analyzer.rules). Maximum
+points with the default ruleset: keywords 30, readability 25, sections 25,
+length 20.
+"""
+from analyzer import metrics
+from analyzer.rules import get_ruleset
+
+PREVIEW_CHARS = 500
+# Job-description coverage (0-100) below which a tailoring suggestion is made
+JOB_MATCH_TARGET = 60
+# Every suggestion id, in a fixed order (bit positions in analyzer.columnar)
+SUGGESTION_IDS = ("low_keywords", "keyword_optimization", "readability", "missing_sections", "too_short",
+                  "too_long", "job_match")
+
+
+def get_keyword_score(doc, ruleset=None):
+    """
+    Analyze keyword density for job-relevant terms
+    Returns score out of 30 points
+    """
+    ruleset = ruleset or get_ruleset()
+    keyword_counts = ruleset.matcher.count_tokens(doc.tokens)
+    keyword_matches = sum(keyword_counts.values())
+    unique_keywords_found = len(keyword_counts)
+
+    # Scoring: base score + bonus for diversity
+    base_score = min(keyword_matches * ruleset.points_per_match, ruleset.max_frequency_points)
+    diversity_bonus = min(unique_keywords_found * ruleset.points_per_unique, ruleset.max_diversity_points)
+
+    return min(base_score + diversity_bonus, ruleset.max_keyword_points)
+
+
+def get_readability_score(doc, ruleset=None):
+    """
+    Assess text readability and complexity
+    Returns score out of 25 points
+    """
+    ruleset = ruleset or get_ruleset()
+    try:
+        if len(doc.text.strip()) < ruleset.min_characters:
+            return ruleset.short_text_points
+
+        # Default bands favour 60-70 Flesch, the optimum for professional documents
+        return ruleset.readability_bands(doc.readability.flesch_reading_ease())
+    except Exception:
+        return ruleset.readability_error_points
+
+
+def check_sections(doc, ruleset=None):
+    """
+    Check for presence of essential resume sections, found as headings
+    Returns score out of 25 points and a section -> found map
+    """
+    ruleset = ruleset or get_ruleset()
+    section_details = dict(doc.sections(ruleset.segmenter).found)
+    sections_found = sum(section_details.values())
+
+    # Equal points per section
+    section_score = (sections_found / len(section_details)) * ruleset.section_points
+    return section_score, section_details
+
+
+def get_length_score(doc, ruleset=None):
+    """
+    Evaluate resume length appropriateness
+    Returns score out of 20 points
+    """
+    ruleset = ruleset or get_ruleset()
+    return ruleset.length_bands(doc.word_count)
+
+
+def generate_suggestions(keyword_score, readability_score, section_score, section_details, length_score, word_count,
+                         ruleset=None):
+    """
+    Generate personalized improvement suggestions
+    Each suggestion carries a stable id so front ends can decorate it
+    """
+    ruleset = ruleset or get_ruleset()
+    suggestions = []
+
+    if keyword_score < 15:
+        suggestions.append({
+            "id": "low_keywords",
+            "type": "warning",
+            "title": "Low Keyword Density",
+            "message": "Consider adding more relevant technical skills and industry keywords. Include specific technologies, programming languages, and tools you've used."
+        })
+    elif keyword_score < 25:
+        suggestions.append({
+            "id": "keyword_optimization",
+            "type": "info",
+            "title": "Keyword Optimization",
+            "message": "Good keyword usage! You could enhance it further by adding more specific technical skills and soft skills relevant to your target role."
+        })
+
+    if readability_score < 15:
+        suggestions.append({
+            "id": "readability",
+            "type": "warning",
+            "title": "Readability Concerns",
+            "message": "Your resume might be too complex or too simple. Aim for clear, professional language that's easy to scan quickly."
+        })
+
+    missing_sections = [section for section, found in section_details.items() if not found]
+    if missing_sections:
+        suggestions.append({
+            "id": "missing_sections",
+            "type": "error",
+            "title": "Missing Sections",
+            "message": f"Consider adding these important sections: {', '.join(missing_sections).title()}"
+        })
+
+    if length_score < 15:
+        if word_count < ruleset.too_short_below:
+            suggestions.append({
+                "id": "too_short",
+                "type": "info",
+                "title": "Resume Length",
+                "message": "Your resume seems quite brief. Consider adding more details about your experiences, achievements, and skills."
+            })
+        elif word_count > ruleset.too_long_above:
+            suggestions.append({
+                "id": "too_long",
+                "type": "info",
+                "title": "Resume Length",
+                "message": "Your resume is quite lengthy. Consider condensing information and focusing on the most relevant and impactful details."
+            })
+
+    return suggestions
+
+
+def job_match_suggestion(match):
+    """
+    Suggestion for a resume that covers too little of the job description
+    """
+    if match['match_score'] >= JOB_MATCH_TARGET:
+        return None
+    return {
+        "id": "job_match",
+        "type": "warning",
+        "title": "Tailor Your Resume to the Job",
+        "message": f"Your resume covers {match['match_score']:.0f}% of the job description's key terms. "
+                   f"Where they apply to you, mention: {', '.join(match['missing_terms'][:8])}."
+    }
+
+
+def add_job_match(result, match):
+    """
+    Attach a match_job() result and, below target, its suggestion
+    """
+    result['job_match'] = match
+    suggestion = job_match_suggestion(match)
+    if suggestion is not None:
+        result['suggestions'].append(suggestion)
+
+
+def iter_score_document(doc, preview_chars=PREVIEW_CHARS, job_description=None, ruleset=None):
+    """
+    score_document as a stream of (stage, partial) pairs, each sent as soon
+    as it is computed: keywords, readability, sections, length, total,
+    job_match (with a job description), suggestions, then ("result", the
+    complete result dict). Partials hold the result keys that stage fills in.
+    """
+    ruleset = ruleset or get_ruleset()
+    with metrics.span("keywords"):
+        keyword_score = get_keyword_score(doc, ruleset)
+    yield "keywords", {'keyword_score': round(keyword_score, 1)}
+    with metrics.span("readability"):
+        readability_score = get_readability_score(doc, ruleset)
+    yield "readability", {'readability_score': round(readability_score, 1)}
+    with metrics.span("sections"):
+        section_score, section_details = check_sections(doc, ruleset)
+    section_spans = doc.sections(ruleset.segmenter).as_list()
+    yield "sections", {'section_score': round(section_score, 1), 'section_details': section_details,
+                       'section_spans': section_spans}
+    with metrics.span("length"):
+        length_score = get_length_score(doc, ruleset)
+    word_count = doc.word_count
+    yield "length", {'length_score': round(length_score, 1), 'word_count': word_count,
+                     'character_count': doc.character_count}
+
+    total_score = round(keyword_score + readability_score + section_score + length_score, 1)
+    yield "total", {'total_score': total_score}
+
+    match = None
+    if job_description:
+        # numpy (via analyzer.similarity) is only loaded once a job description is sent
+        from analyzer.similarity import match_job
+
+        with metrics.span("job_match"):
+            match = match_job(doc, job_description)
+        if match is not None:
+            yield "job_match", {'job_match': match}
+
+    with metrics.span("suggestions"):
+        suggestions = generate_suggestions(
+            keyword_score, readability_score, section_score,
+            section_details, length_score, word_count, ruleset
+        )
+    if match is not None:
+        suggestion = job_match_suggestion(match)
+        if suggestion is not None:
+            suggestions.append(suggestion)
+    yield "suggestions", {'suggestions': suggestions}
+
+    result = {
+        'total_score': total_score,
+        'keyword_score': round(keyword_score, 1),
+        'readability_score': round(readability_score, 1),
+        'section_score': round(section_score, 1),
+        'length_score': round(length_score, 1),
+        'word_count': word_count,
+        'character_count': doc.character_count,
+        'section_details': section_details,
+        'section_spans': section_spans,
+        'suggestions': suggestions,
+        'text_preview': doc.preview(preview_chars)
+    }
+    if match is not None:
+        result['job_match'] = match
+    if doc.extraction is not None:
+        result['extraction_engine'] = doc.extraction.engine
+        result['page_count'] = doc.extraction.total_pages
+        result['truncated'] = doc.extraction.truncated
+    yield "result", result
+
+
+def score_document(doc, preview_chars=PREVIEW_CHARS, job_description=None, ruleset=None):
+    """
+    Run every scorer over a document and build the API result dict
+    With a job description the result also carries a job_match section;
+    ruleset is a compiled Ruleset (default: the ANALYZER_RULESET one)
+    """
+    for _, result in iter_score_document(doc, preview_chars, job_description, ruleset):
+        pass
+    return result
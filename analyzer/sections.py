@@ -0,0 +1,172 @@
+"""
+Section segmentation: where each resume section starts and ends.
+
+A heading is a line that consists of a known section name (optionally with
+a couple of qualifying words, "Technical Skills", "Employment History") or
+starts with one followed by a colon ("Skills: Python, SQL"). Every
+ruleset's headings are compiled into one anchored alternation that is
+tried once per line, and only on lines short enough to be a heading or
+holding a colon, so the text is walked once no matter how many names
+there are. A word that merely contains a name ("network", "framework")
+never counts.
+
+Candidate lines are then judged by their style:
+- layout: the line was set in a larger or bold font (see analyzer.engines)
+- text: ALL CAPS, a trailing colon, or Title Case
+When a document's headings are visibly styled (some candidate is
+emphasized), candidates need layout, capitals or a colon to count, so
+title-cased phrases in the body are not mistaken for headings.
+
+Sections that often have no heading of their own (contact details) can
+also be recognised by patterns, searched in the lowercased text (only
+while such a section is still missing). Matched above the first heading,
+they claim the text there.
+"""
+import bisect
+import re
+from collections import namedtuple
+
+from analyzer.engines import HEADING_MAX_CHARS, line_key
+
+# Qualifying words allowed before ("Professional Experience") and after
+# ("Education & Certifications") a section name in a heading line
+MAX_LEADING_WORDS = 2
+MAX_TRAILING_WORDS = 3
+# Words that stay lowercase in a Title Case heading
+MINOR_WORDS = frozenset(("and", "or", "of", "the", "for", "in", "to", "&", "/", "-", "–"))
+
+_BULLET = r"[ \t]*(?:[^\w\s:][ \t]*){0,3}"
+_WORD = r"(?:[^\W\d_][\w'’.+/-]*|&|/|-|–)"
+
+# heading_start..heading_end is the heading text; start..end the content under it
+SectionSpan = namedtuple("SectionSpan", "name heading_start heading_end start end")
+
+
+def _alias_pattern(alias):
+    return r"[ \t]+".join(re.escape(word) for word in alias.split())
+
+
+class Segmentation:
+    """
+    Section spans of one text, in document order
+    """
+
+    def __init__(self, text, spans, found):
+        self.text = text
+        self.spans = spans
+        # section name -> present, in ruleset order
+        self.found = found
+        self._starts = [span.heading_start for span in spans]
+
+    def section_text(self, name):
+        """
+        Text under every heading of one section, joined by newlines
+        """
+        return "\n".join(self.text[span.start:span.end].strip() for span in self.spans if span.name == name)
+
+    def section_at(self, offset):
+        """
+        Name of the section containing a character offset (None above the first one)
+        """
+        index = bisect.bisect_right(self._starts, offset) - 1
+        if index < 0 or offset >= self.spans[index].end:
+            return None
+        return self.spans[index].name
+
+    def as_list(self):
+        return [{
+            'section': span.name,
+            'heading': self.text[span.heading_start:span.heading_end],
+            'start': span.start,
+            'end': span.end,
+        } for span in self.spans]
+
+
+class SectionSegmenter:
+    """
+    Heading names and presence patterns of a ruleset, compiled once
+    """
+
+    def __init__(self, headings, patterns=None):
+        self.names = tuple(headings)
+        patterns = patterns or {}
+        groups = []
+        self._group_names = {}
+        for index, (name, aliases) in enumerate(headings.items()):
+            if not aliases:
+                continue
+            # Longest first, so "work history" is tried before "work"
+            ordered = sorted(set(alias.lower() for alias in aliases), key=len, reverse=True)
+            group = f"s{index}"
+            self._group_names[group] = name
+            groups.append(f"(?P<{group}>{'|'.join(map(_alias_pattern, ordered))})")
+        self._heading_match = re.compile(
+            rf"{_BULLET}(?P<heading>(?:{_WORD}[ \t]+){{0,{MAX_LEADING_WORDS}}}?(?:{'|'.join(groups) or '(?!)'})"
+            rf"(?!\w)(?:[ \t]+{_WORD}){{0,{MAX_TRAILING_WORDS}}}?)"
+            r"[ \t]*(?:(?P<colon>:)[ \t]*(?P<inline>\S.*?)?)?\s*\Z",
+            re.IGNORECASE,
+        ).match
+        # section -> compiled patterns, matched against lowercased text
+        self._patterns = {name: tuple(re.compile(expression) for expression in expressions)
+                          for name, expressions in patterns.items() if name in self.names and expressions}
+
+    def _candidates(self, text, emphasis):
+        # (name, heading_start, heading_end, content_start, strong, emphasized) per heading-like line
+        match_heading = self._heading_match
+        group_names = self._group_names
+        offset = 0
+        for line in text.split("\n"):
+            line_start = offset
+            offset += len(line) + 1
+            # Longer lines without a colon are body text
+            if len(line) > HEADING_MAX_CHARS and ":" not in line:
+                continue
+            match = match_heading(line)
+            if match is None:
+                continue
+            name = group_names[next(group for group in group_names if match.group(group) is not None)]
+            heading = match.group("heading")
+            emphasized = bool(emphasis) and line_key(line) in emphasis
+            letters = [char for char in heading if char.isalpha()]
+            strong = emphasized or bool(match.group("colon")) or all(char.isupper() for char in letters)
+            title = all(word[0].isupper() or word.lower() in MINOR_WORDS for word in heading.split())
+            if strong or title:
+                start = line_start + match.start("inline") if match.group("inline") else min(offset, len(text))
+                yield (name, line_start + match.start("heading"), line_start + match.end("heading"), start,
+                       strong, emphasized)
+
+    def segment(self, text, emphasis=None, lower=None):
+        """
+        Split text into section spans
+
+        emphasis is the set of line keys set in a larger or bold font
+        (Document.emphasis), or None when the layout is unknown; lower is
+        text.lower(), when the caller already has it.
+        """
+        candidates = list(self._candidates(text, emphasis))
+        if any(candidate[5] for candidate in candidates):
+            candidates = [candidate for candidate in candidates if candidate[4]]
+
+        spans = []
+        for index, (name, heading_start, heading_end, start, _, _) in enumerate(candidates):
+            end = candidates[index + 1][1] if index + 1 < len(candidates) else len(text)
+            spans.append(SectionSpan(name, heading_start, heading_end, start, max(start, end)))
+
+        found = dict.fromkeys(self.names, False)
+        for span in spans:
+            found[span.name] = True
+        preamble_end = spans[0].heading_start if spans else len(text)
+        for name, patterns in self._patterns.items():
+            if found[name]:
+                continue
+            if lower is None:
+                lower = text.lower()
+            matches = [match for match in (pattern.search(lower) for pattern in patterns) if match]
+            if not matches:
+                continue
+            found[name] = True
+            if preamble_end and min(match.start() for match in matches) < preamble_end:
+                # Contact details above the first heading own that block
+                spans.insert(0, SectionSpan(name, 0, 0, 0, preamble_end))
+                preamble_end = 0
+        return Segmentation(text, spans, found)
@@ -0,0 +1,218 @@
+"""
+Standalone production server for the API handlers.
+
+Usage:
+    python -m analyzer.server [--port 8000] [--workers 4] [--threads 32] [--queue 16]
+
+A thread per connection parses uploads and answers cache hits, while
+extraction and scoring run in a shared process pool. Background jobs
+(/api/jobs) are dispatched to the same pool by the job runner's threads;
+submitting one only queues it, so it does not take an analysis slot.
+/api/batch also runs its files in that pool, at most --workers at a time.
+Admission is bounded at two levels, and both answer 503 with Retry-After
+when full:
+- connections: at most --threads requests are being handled at once
+- analyses: at most --workers + --queue uploads are running or waiting
+SIGTERM/SIGINT stop accepting connections, let in-flight requests and
+running jobs finish and then shut the pool down.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import threading
+from http.server import ThreadingHTTPServer
+
+from analyzer import metrics
+from analyzer.jobs import JobRunner, create_queue
+from analyzer.pipeline import warm_pool
+from api.analyze import handler as analyze_handler
+from api.batch import handler as batch_handler
+from api.jobs import handler as jobs_handler
+from api.match import handler as match_handler
+from api.search import handler as search_handler
+
+RETRY_AFTER_SECONDS = 1
+# Unread request bytes are discarded up to this size before a 503 closes the
+# socket; closing with data still unread makes the kernel send a TCP reset
+# that clients see as a connection error instead of the 503.
+MAX_DRAIN_BYTES = 1024 * 1024
+
+
+class ServerHandler(batch_handler, match_handler, search_handler, jobs_handler):
+    """
+    Routes /api/batch, /api/jobs, /api/match and /api/search to their
+    handlers and everything else to /api/analyze (GET /api/metrics is
+    served by the analyze handler)
+    """
+
+    def do_GET(self):
+        route = self.path.split('?')[0].rstrip('/')
+        if route == '/api/search':
+            search_handler.do_GET(self)
+        elif route == '/api/jobs' or route.startswith('/api/jobs/'):
+            jobs_handler.do_GET(self)
+        else:
+            analyze_handler.do_GET(self)
+
+    # Whether this request still holds one of the server's analysis slots
+    holding_slot = False
+
+    def do_POST(self):
+        if self.path.split('?')[0].rstrip('/') == '/api/jobs':
+            # Only queues the upload; the job runner bounds the work itself
+            jobs_handler.do_POST(self)
+            return
+        if not self.server.analysis_slots.acquire(blocking=False):
+            metrics.BUSY.inc()
+            self.close_connection = True
+            length = int(self.headers.get('Content-Length') or 0)
+            if length <= MAX_DRAIN_BYTES:
+                self.rfile.read(length)
+            self.send_json_response(
+                {'error': 'Server busy, retry shortly'}, 503,
+                headers={'Retry-After': str(RETRY_AFTER_SECONDS), 'Connection': 'close'},
+            )
+            return
+        self.holding_slot = True
+        try:
+            route = self.path.split('?')[0].rstrip('/')
+            if route == '/api/batch':
+                batch_handler.do_POST(self)
+            elif route == '/api/match':
+                match_handler.do_POST(self)
+            else:
+                analyze_handler.do_POST(self)
+        finally:
+            self.release_slot()
+
+    def release_slot(self):
+        """
+        Free the analysis slot once the work is done, before the client can
+        see the end of the response; a client that sends its next request
+        straight away must not find its own slot still taken
+        """
+        if self.holding_slot:
+            self.holding_slot = False
+            self.server.analysis_slots.release()
+
+    def send_json_response(self, data, status_code=200, headers=None):
+        self.release_slot()
+        super().send_json_response(data, status_code, headers)
+
+    def write_event(self, stream, event, payload, chunked=True):
+        if event in ('result', 'error'):
+            self.release_slot()
+        super().write_event(stream, event, payload, chunked)
+
+    def write_chunk(self, data):
+        # The empty chunk ends a streamed /api/batch response
+        if not data:
+            self.release_slot()
+        super().write_chunk(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class AnalyzerServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer with a connection cap and a shared process pool
+    """
+    daemon_threads = False
+    block_on_close = True
+    request_queue_size = 128
+
+    def __init__(self, address, workers, threads, queue_size, verbose=False):
+        super().__init__(address, ServerHandler)
+        self.executor = warm_pool(workers)
+        self.workers = workers
+        self.connection_slots = threading.BoundedSemaphore(threads)
+        self.analysis_slots = threading.BoundedSemaphore(workers + queue_size)
+        self.verbose = verbose
+        self.job_runner = JobRunner(create_queue(), self.executor).start()
+        ServerHandler.executor = self.executor
+        ServerHandler.job_runner = self.job_runner
+
+    def process_request(self, request, client_address):
+        if not self.connection_slots.acquire(blocking=False):
+            # Rejecting takes a moment (see MAX_DRAIN_BYTES); keep the accept loop free
+            threading.Thread(target=self._reject, args=(request,), daemon=True).start()
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self.connection_slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.connection_slots.release()
+
+    def _reject(self, request):
+        metrics.REJECTED.inc()
+        body = json.dumps({'error': 'Server busy, retry shortly'}).encode()
+        head = (
+            'HTTP/1.1 503 Service Unavailable\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Retry-After: {RETRY_AFTER_SECONDS}\r\n'
+            'Connection: close\r\n\r\n'
+        ).encode()
+        try:
+            request.sendall(head + body)
+            request.shutdown(socket.SHUT_WR)
+            request.settimeout(1)
+            drained = 0
+            while drained < MAX_DRAIN_BYTES:
+                chunk = request.recv(65536)
+                if not chunk:
+                    break
+                drained += len(chunk)
+        except OSError:
+            pass
+        request.close()
+
+    def server_close(self):
+        # Joins the request threads (block_on_close) before stopping the pool
+        super().server_close()
+        self.job_runner.stop()
+        self.executor.shutdown(wait=True)
+
+
+def serve(host, port, workers, threads, queue_size, verbose=False):
+    server = AnalyzerServer((host, port), workers, threads, queue_size, verbose)
+
+    def stop(signum, frame):
+        # shutdown() blocks until serve_forever returns, so it cannot run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Serving on http://{host}:{server.server_address[1]} "
+          f"({workers} workers, {threads} threads, queue {queue_size})", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Run the resume analysis API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=cpus, help="analysis processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=32, help="max concurrent connections")
+    parser.add_argument("--queue", type=int, default=cpus * 2, help="analyses allowed to wait for a worker")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.threads, args.queue, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
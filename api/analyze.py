@@ -1,243 +1,231 @@
 from http.server import BaseHTTPRequestHandler
 import json
-import cgi
-import io
-import pdfplumber
-import textstat
-from collections import Counter
-import re
+import os
+import sys
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer import metrics
+from analyzer.cache import get_default_cache
+from analyzer.engines import ENGINE_CHOICES
+from analyzer.multipart import UploadError, parse_multipart
+from analyzer.rules import UnknownRulesetError, get_ruleset
+
+# analyzer.pipeline (PDF engines, numpy, the hyphenation dictionary) is
+# imported on the first analysis, so a cold start that only answers
+# OPTIONS or rejects a bad upload never loads it. Set ANALYZER_WARM_UP=1 to
+# pay that cost at import instead (see warm_up at the end of this file).
+
+# ?stream= formats for progressive responses (see handler.stream_analysis)
+STREAM_TYPES = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
 
 class handler(BaseHTTPRequestHandler):
+    max_upload_bytes = int(os.environ.get('ANALYZER_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+    allowed_extensions = ('.pdf',)
+    # Set by analyzer.server to move extraction and scoring off the request thread
+    executor = None
+
     def do_POST(self):
+        with metrics.collect(), metrics.span('request'):
+            self.handle_analyze()
+
+    def handle_analyze(self):
+        form = None
         try:
-            # Parse multipart form data
-            content_type = self.headers.get('content-type')
-            if not content_type or 'multipart/form-data' not in content_type:
-                self.send_error(400, "Invalid content type")
+            # Stream the multipart body; file parts are spooled, not buffered whole
+            try:
+                form = self.parse_form()
+            except UploadError as e:
+                self.send_json_response({'error': str(e)}, e.status)
                 return
 
-            # Get boundary from content-type header
-            boundary = content_type.split('boundary=')[1].encode()
-            
-            # Read the form data
-            content_length = int(self.headers.get('Content-Length', 0))
-            form_data = self.rfile.read(content_length)
-            
-            # Extract PDF file from form data
-            pdf_data = self.extract_pdf_from_form(form_data, boundary)
-            
-            if not pdf_data:
+            if not form.files:
                 self.send_json_response({'error': 'No PDF file found'}, 400)
                 return
 
-            # Analyze the resume
-            result = self.analyze_resume(pdf_data)
+            engine = self.query_param('engine')
+            if engine is not None and engine not in ENGINE_CHOICES:
+                self.send_json_response({'error': f'Unknown extraction engine: {engine}'}, 400)
+                return
+
+            ruleset = self.query_param('ruleset')
+            if ruleset is not None and not self.check_ruleset(ruleset):
+                return
+
+            stream = self.stream_param()
+            if stream is not None:
+                if stream not in STREAM_TYPES:
+                    self.send_json_response({'error': f'Unknown stream format: {stream}'}, 400)
+                    return
+                self.stream_analysis(form.files[0], stream, engine, form.fields.get('job_description'), ruleset,
+                                     self.flag_param('reuse_duplicates'))
+                return
+
+            # Analyze the resume (and score it against a job description, if one was sent)
+            result = self.analyze_resume(form.files[0], engine, form.fields.get('job_description'), ruleset,
+                                         self.flag_param('reuse_duplicates'))
             
             # Send response
             self.send_json_response(result)
             
         except Exception as e:
             self.send_json_response({'error': f'Server error: {str(e)}'}, 500)
+        finally:
+            if form is not None:
+                form.close()
+
+    def parse_form(self):
+        with metrics.span('read_body'):
+            form = parse_multipart(
+                self.rfile,
+                self.headers.get('content-type'),
+                self.headers.get('Content-Length'),
+                max_size=self.max_upload_bytes,
+                allowed_extensions=self.allowed_extensions,
+            )
+        metrics.BYTES_IN.inc(int(self.headers.get('Content-Length')))
+        return form
+
+    def do_GET(self):
+        if urlparse(self.path).path.rstrip('/') == '/api/metrics':
+            self.send_metrics()
+            return
+        self.send_json_response({'cache': get_default_cache().stats()})
+
+    def send_metrics(self):
+        if not metrics.ENABLED:
+            self.send_json_response({'error': 'Metrics are disabled (ANALYZER_METRICS=0)'}, 404)
+            return
+        body = metrics.REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', metrics.CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code='-', size='-'):
+        if isinstance(code, int):
+            metrics.REQUESTS.inc(1, metrics.route_label(self.path), str(int(code)))
+            if code >= 500:
+                metrics.ERRORS.inc(1, 'server')
+            elif code >= 400:
+                metrics.ERRORS.inc(1, 'client')
+        super().log_request(code, size)
 
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
-    def extract_pdf_from_form(self, form_data, boundary):
-        try:
-            # Split form data by boundary
-            parts = form_data.split(b'--' + boundary)
-            
-            for part in parts:
-                if b'filename=' in part and b'.pdf' in part:
-                    # Find the start of file content
-                    header_end = part.find(b'\r\n\r\n')
-                    if header_end != -1:
-                        file_content = part[header_end + 4:]
-                        # Remove trailing boundary markers
-                        if file_content.endswith(b'\r\n'):
-                            file_content = file_content[:-2]
-                        return io.BytesIO(file_content)
-            return None
-        except:
-            return None
-
-    def analyze_resume(self, pdf_data):
-        # Extract text from PDF
-        text = self.extract_text_from_pdf(pdf_data)
-        if not text:
-            return {'error': 'Could not extract text from PDF'}
-
-        # Calculate scores
-        keyword_score = self.get_keyword_score(text)
-        readability_score = self.get_readability_score(text)
-        section_score, section_details = self.check_sections(text)
-        length_score = self.get_length_score(text)
-        
-        total_score = round(keyword_score + readability_score + section_score + length_score, 1)
-        word_count = len(text.split())
-        
-        # Generate suggestions
-        suggestions = self.generate_suggestions(
-            keyword_score, readability_score, section_score, 
-            section_details, length_score, word_count
-        )
-        
-        return {
-            'total_score': total_score,
-            'keyword_score': round(keyword_score, 1),
-            'readability_score': round(readability_score, 1),
-            'section_score': round(section_score, 1),
-            'length_score': round(length_score, 1),
-            'word_count': word_count,
-            'section_details': section_details,
-            'suggestions': suggestions,
-            'text_preview': text[:500] + "..." if len(text) > 500 else text
-        }
-
-    def extract_text_from_pdf(self, pdf_file):
+    def query_param(self, name):
+        values = parse_qs(urlparse(self.path).query).get(name)
+        return values[0] if values else None
+
+    def flag_param(self, name):
+        return self.query_param(name) in ('1', 'true', 'yes')
+
+    def stream_param(self):
+        # ?stream=ndjson|sse; an Accept: text/event-stream header also asks for events
+        stream = self.query_param('stream')
+        if stream is None and 'text/event-stream' in (self.headers.get('Accept') or ''):
+            return 'sse'
+        return stream
+
+    def check_ruleset(self, name):
+        # Sends a 400 and returns False for an unknown ruleset
         try:
-            text = ""
-            with pdfplumber.open(pdf_file) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            return text.strip()
-        except:
-            return ""
-
-    def get_keyword_score(self, text):
-        technical_keywords = [
-            "python", "java", "javascript", "sql", "html", "css", "react", "angular", "vue",
-            "node.js", "mongodb", "postgresql", "mysql", "git", "docker", "kubernetes",
-            "aws", "azure", "gcp", "machine learning", "data analysis", "artificial intelligence",
-            "deep learning", "tensorflow", "pytorch", "pandas", "numpy", "scikit-learn"
-        ]
-        
-        soft_skills = [
-            "leadership", "teamwork", "communication", "problem solving", "analytical",
-            "project management", "collaboration", "mentoring", "strategic planning",
-            "critical thinking", "adaptability", "innovation", "creativity"
-        ]
-        
-        all_keywords = technical_keywords + soft_skills
-        words = re.findall(r"\b\w+\b", text.lower())
-        word_freq = Counter(words)
-        
-        keyword_matches = sum([word_freq.get(keyword, 0) for keyword in all_keywords])
-        unique_keywords_found = sum([1 for keyword in all_keywords if keyword in words])
-        
-        base_score = min(keyword_matches * 0.8, 20)
-        diversity_bonus = min(unique_keywords_found * 0.5, 10)
-        
-        return min(base_score + diversity_bonus, 30)
-
-    def get_readability_score(self, text):
+            get_ruleset(name)
+        except UnknownRulesetError as e:
+            self.send_json_response({'error': str(e)}, 400)
+            return False
+        return True
+
+    def analyze_resume(self, pdf_part, engine=None, job_description=None, ruleset=None, reuse_duplicates=False):
+        from analyzer.pipeline import analyze_pdf
+
+        return analyze_pdf(pdf_part.file, cache=get_default_cache(), digest=pdf_part.sha256,
+                           executor=self.executor, engine=engine, job_description=job_description,
+                           name=pdf_part.filename, ruleset=ruleset, reuse_duplicates=reuse_duplicates)
+
+    def stream_analysis(self, pdf_part, stream, engine=None, job_description=None, ruleset=None,
+                        reuse_duplicates=False):
+        """
+        Send each analysis event as soon as it happens: page progress, every
+        sub-score, suggestions and finally the full result (or an error)
+        """
+        from analyzer.pipeline import iter_analyze_pdf
+
+        events = iter_analyze_pdf(pdf_part.file, cache=get_default_cache(), digest=pdf_part.sha256,
+                                  executor=self.executor, engine=engine, job_description=job_description,
+                                  name=pdf_part.filename, ruleset=ruleset, reuse_duplicates=reuse_duplicates)
+        # HTTP/1.0 has no chunked encoding; the body then ends when the connection closes
+        chunked = self.request_version == 'HTTP/1.1' and self.protocol_version == 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-Type', STREAM_TYPES[stream])
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
         try:
-            if len(text.strip()) < 50:
-                return 0
-                
-            flesch_score = textstat.flesch_reading_ease(text)
-            
-            if 60 <= flesch_score <= 70:
-                return 25
-            elif 50 <= flesch_score < 60 or 70 < flesch_score <= 80:
-                return 20
-            elif 40 <= flesch_score < 50 or 80 < flesch_score <= 90:
-                return 15
-            else:
-                return 10
-        except:
-            return 15
-
-    def check_sections(self, text):
-        essential_sections = {
-            "contact": ["email", "phone", "linkedin", "contact"],
-            "experience": ["experience", "work", "employment", "career", "professional"],
-            "education": ["education", "degree", "university", "college", "school"],
-            "skills": ["skills", "technologies", "proficient", "expertise", "competencies"],
-            "projects": ["projects", "portfolio", "achievements", "accomplishments"]
-        }
-        
-        text_lower = text.lower()
-        sections_found = 0
-        section_details = {}
-        
-        for section_name, keywords in essential_sections.items():
-            found = any(keyword in text_lower for keyword in keywords)
-            section_details[section_name] = found
-            if found:
-                sections_found += 1
-        
-        section_score = (sections_found / len(essential_sections)) * 25
-        return section_score, section_details
-
-    def get_length_score(self, text):
-        word_count = len(text.split())
-        
-        if 300 <= word_count <= 800:
-            return 20
-        elif 200 <= word_count < 300 or 800 < word_count <= 1200:
-            return 15
-        elif 100 <= word_count < 200 or 1200 < word_count <= 1500:
-            return 10
+            for event, payload in events:
+                if event == 'result' and 'error' in payload:
+                    event = 'error'
+                self.write_event(stream, event, payload, chunked)
+        except ConnectionError:
+            # The client went away: stop the analysis and drop the connection
+            events.close()
+            self.close_connection = True
+            return
+        except Exception as e:
+            # The status line is already out, so a failure becomes the last event
+            self.write_event(stream, 'error', {'error': f'Server error: {str(e)}'}, chunked)
+        if chunked:
+            self.write_chunk(b'')
+
+    def write_event(self, stream, event, payload, chunked=True):
+        if stream == 'sse':
+            data = f'event: {event}\ndata: {json.dumps(payload)}\n\n'.encode()
         else:
-            return 5
-
-    def generate_suggestions(self, keyword_score, readability_score, section_score, section_details, length_score, word_count):
-        suggestions = []
-        
-        if keyword_score < 15:
-            suggestions.append({
-                "type": "warning",
-                "title": "Low Keyword Density",
-                "message": "Consider adding more relevant technical skills and industry keywords. Include specific technologies, programming languages, and tools you've used."
-            })
-        elif keyword_score < 25:
-            suggestions.append({
-                "type": "info",
-                "title": "Keyword Optimization",
-                "message": "Good keyword usage! You could enhance it further by adding more specific technical skills and soft skills relevant to your target role."
-            })
-        
-        if readability_score < 15:
-            suggestions.append({
-                "type": "warning",
-                "title": "Readability Concerns",
-                "message": "Your resume might be too complex or too simple. Aim for clear, professional language that's easy to scan quickly."
-            })
-        
-        missing_sections = [section for section, found in section_details.items() if not found]
-        if missing_sections:
-            suggestions.append({
-                "type": "error",
-                "title": "Missing Sections",
-                "message": f"Consider adding these important sections: {', '.join(missing_sections).title()}"
-            })
-        
-        if length_score < 15:
-            if word_count < 300:
-                suggestions.append({
-                    "type": "info",
-                    "title": "Resume Length",
-                    "message": "Your resume seems quite brief. Consider adding more details about your experiences, achievements, and skills."
-                })
-            elif word_count > 1200:
-                suggestions.append({
-                    "type": "info",
-                    "title": "Resume Length",
-                    "message": "Your resume is quite lengthy. Consider condensing information and focusing on the most relevant and impactful details."
-                })
-        
-        return suggestions
-
-    def send_json_response(self, data, status_code=200):
+            data = (json.dumps({'event': event, **payload}) + '\n').encode()
+        if chunked:
+            self.write_chunk(data)
+        else:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    def write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def send_json_response(self, data, status_code=200, headers=None):
+        with metrics.span('serialize'):
+            body = json.dumps(data).encode()
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
         self.send_header('Access-Control-Allow-Origin', '*')
+        for name, value in {**metrics.server_timing_headers(), **(headers or {})}.items():
+            self.send_header(name, value)
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
\ No newline at end of file
+        self.wfile.write(body)
+
+
+def warm_up():
+    """
+    Load and prime the analysis pipeline ahead of the first request
+    """
+    from analyzer.pipeline import warm_up as warm_up_pipeline
+
+    warm_up_pipeline()
+
+
+if os.environ.get('ANALYZER_WARM_UP', '0') == '1':
+    warm_up()
@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.batch import DEFAULT_TIMEOUT, analyze_many, iter_zip_pdfs
+from analyzer.multipart import UploadError
+from api.analyze import handler as analyze_handler
+
+
+class handler(analyze_handler):
+    """
+    POST many PDFs (or zip archives of PDFs) as multipart/form-data and
+    receive one JSON line per file as each finishes.
+    """
+    protocol_version = 'HTTP/1.1'
+    max_upload_bytes = int(os.environ.get('ANALYZER_BATCH_MAX_UPLOAD_BYTES', 512 * 1024 * 1024))
+    allowed_extensions = ('.pdf', '.zip')
+
+    def do_POST(self):
+        form = None
+        streaming = False
+        try:
+            try:
+                form = self.parse_form()
+            except UploadError as e:
+                self.send_json_response({'error': str(e)}, e.status)
+                return
+
+            if not form.files:
+                self.send_json_response({'error': 'No PDF file found'}, 400)
+                return
+
+            ruleset = self.query_param('ruleset')
+            if ruleset is not None and not self.check_ruleset(ruleset):
+                return
+
+            if self.executor is not None:
+                # Under analyzer.server files share its pool (sized by --workers)
+                workers = self.server.workers
+            else:
+                workers = int(os.environ.get('ANALYZER_BATCH_WORKERS', os.cpu_count() or 1))
+            timeout = float(os.environ.get('ANALYZER_BATCH_TIMEOUT', DEFAULT_TIMEOUT))
+
+            # HTTP/1.0 has no chunked encoding; the body then ends when the connection closes
+            chunked = self.request_version == 'HTTP/1.1' and self.protocol_version == 'HTTP/1.1'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            if chunked:
+                self.send_header('Transfer-Encoding', 'chunked')
+            else:
+                self.send_header('Connection', 'close')
+                self.close_connection = True
+            self.end_headers()
+            streaming = True
+            sources = self.iter_uploaded_pdfs(form.files, chunked)
+            for result in analyze_many(sources, workers=workers, timeout=timeout, ruleset=ruleset,
+                                       reuse_duplicates=self.flag_param('reuse_duplicates'), executor=self.executor):
+                self.write_row(result, chunked)
+            if chunked:
+                self.write_chunk(b'')
+        except Exception as e:
+            if not streaming:
+                self.send_json_response({'error': f'Server error: {str(e)}'}, 500)
+            else:
+                self.close_connection = True
+        finally:
+            if form is not None:
+                form.close()
+
+    def iter_uploaded_pdfs(self, parts, chunked=True):
+        # Parts are read one at a time as workers free up, not all up front
+        def skipped(name, message):
+            self.write_row({'file': name, 'error': message}, chunked)
+
+        for part in parts:
+            if part.filename.lower().endswith('.zip'):
+                try:
+                    yield from iter_zip_pdfs(part.file, part.filename + '/', skipped)
+                except zipfile.BadZipFile:
+                    skipped(part.filename, 'Invalid zip archive')
+            else:
+                yield part.filename, part.read()
+
+    def write_row(self, result, chunked=True):
+        data = (json.dumps(result) + '\n').encode()
+        if chunked:
+            self.write_chunk(data)
+        else:
+            self.wfile.write(data)
+            self.wfile.flush()
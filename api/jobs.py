@@ -0,0 +1,103 @@
+import os
+import sys
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.engines import ENGINE_CHOICES
+from analyzer.jobs import Job, QueueFull, check_callback_url, get_default_runner, job_options, max_attempts
+from analyzer.multipart import UploadError
+from api.analyze import handler as analyze_handler
+
+
+class handler(analyze_handler):
+    """
+    Analyze resumes in the background.
+
+    POST /api/jobs with the same multipart body and query parameters as
+    /api/analyze answers 202 with a job id straight away. Optional fields:
+    priority (integer, higher runs first) and callback_url (receives the
+    finished job as a JSON POST; its host must resolve to public addresses
+    or be listed in ANALYZER_CALLBACK_HOSTS). GET /api/jobs/{id} (or ?id=) returns the
+    job's status and, once done, its result; GET /api/jobs returns queue
+    counts.
+    """
+    # Set by analyzer.server so jobs share its process pool
+    job_runner = None
+
+    def runner(self):
+        return self.job_runner or get_default_runner(self.executor)
+
+    def do_POST(self):
+        form = None
+        try:
+            try:
+                form = self.parse_form()
+            except UploadError as e:
+                self.send_json_response({'error': str(e)}, e.status)
+                return
+
+            if not form.files:
+                self.send_json_response({'error': 'No PDF file found'}, 400)
+                return
+
+            engine = self.query_param('engine')
+            if engine is not None and engine not in ENGINE_CHOICES:
+                self.send_json_response({'error': f'Unknown extraction engine: {engine}'}, 400)
+                return
+
+            ruleset = self.query_param('ruleset')
+            if ruleset is not None and not self.check_ruleset(ruleset):
+                return
+
+            priority = form.fields.get('priority') or self.query_param('priority') or '0'
+            try:
+                priority = int(priority)
+            except ValueError:
+                self.send_json_response({'error': 'priority must be an integer'}, 400)
+                return
+
+            callback_url = form.fields.get('callback_url') or self.query_param('callback_url')
+            if callback_url:
+                try:
+                    check_callback_url(callback_url)
+                except ValueError as e:
+                    self.send_json_response({'error': str(e)}, 400)
+                    return
+
+            part = form.files[0]
+            options = job_options(part.filename, engine, ruleset, form.fields.get('job_description') or None,
+                                  self.flag_param('reuse_duplicates'))
+            job = Job(part.file.read(), options, priority, max_attempts(), callback_url or None)
+            try:
+                self.runner().submit(job)
+            except QueueFull:
+                self.send_json_response({'error': 'Job queue is full, retry later'}, 503, headers={'Retry-After': '5'})
+                return
+
+            location = f'/api/jobs/{job.id}'
+            self.send_json_response({'id': job.id, 'status': job.status, 'url': location}, 202,
+                                    headers={'Location': location})
+
+        except Exception as e:
+            self.send_json_response({'error': f'Server error: {str(e)}'}, 500)
+        finally:
+            if form is not None:
+                form.close()
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+        job_id = path[len('/api/jobs/'):] if path.startswith('/api/jobs/') else self.query_param('id')
+        try:
+            queue = self.runner().queue
+            if not job_id:
+                self.send_json_response({'jobs': queue.stats()})
+                return
+            job = queue.get(job_id)
+        except Exception as e:
+            self.send_json_response({'error': f'Server error: {str(e)}'}, 500)
+            return
+        if job is None:
+            self.send_json_response({'error': f'Unknown or expired job: {job_id}'}, 404)
+            return
+        self.send_json_response(job.to_dict())
@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+import zipfile
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.batch import iter_zip_pdfs
+from analyzer.dedup import dedup_threshold, find_duplicates
+from analyzer.keywords import tokenize
+from analyzer.multipart import UploadError
+from analyzer.pipeline import extract_text
+from analyzer.similarity import METHODS, rank
+from api.analyze import handler as analyze_handler
+
+
+class handler(analyze_handler):
+    """
+    Rank resumes against a job description, or job descriptions against a resume.
+
+    POST multipart/form-data with either
+    - a job_description field and one or more PDFs (or zips of PDFs), or
+    - one PDF and a job_descriptions field holding a JSON array of strings.
+    ?method=bm25 (default) or tfidf picks the similarity model; ?limit=N
+    keeps the top N. A ranked resume that nearly duplicates a higher-ranked
+    one is marked with duplicate_of; ?collapse_duplicates=1 drops it instead.
+    """
+    max_upload_bytes = int(os.environ.get('ANALYZER_BATCH_MAX_UPLOAD_BYTES', 512 * 1024 * 1024))
+    allowed_extensions = ('.pdf', '.zip')
+
+    def do_POST(self):
+        form = None
+        try:
+            try:
+                form = self.parse_form()
+            except UploadError as e:
+                self.send_json_response({'error': str(e)}, e.status)
+                return
+
+            method = self.query_param('method') or 'bm25'
+            if method not in METHODS:
+                self.send_json_response({'error': f'Unknown similarity method: {method}'}, 400)
+                return
+            limit = self.query_param('limit')
+            if limit is not None:
+                try:
+                    limit = int(limit)
+                except ValueError:
+                    limit = 0
+                if limit <= 0:
+                    self.send_json_response({'error': 'limit must be a positive integer'}, 400)
+                    return
+
+            if not form.files:
+                self.send_json_response({'error': 'No PDF file found'}, 400)
+                return
+
+            if 'job_descriptions' in form.fields:
+                try:
+                    jobs = json.loads(form.fields['job_descriptions'])
+                except ValueError:
+                    jobs = None
+                if not isinstance(jobs, list) or not all(isinstance(job, str) for job in jobs):
+                    self.send_json_response({'error': 'job_descriptions must be a JSON array of strings'}, 400)
+                    return
+                self.send_json_response(self.rank_jobs(form.files[0], jobs, method, limit))
+            elif form.fields.get('job_description'):
+                self.send_json_response(self.rank_resumes(form.files, form.fields['job_description'], method, limit,
+                                                          self.flag_param('collapse_duplicates')))
+            else:
+                self.send_json_response({'error': 'No job description provided'}, 400)
+
+        except Exception as e:
+            self.send_json_response({'error': f'Server error: {str(e)}'}, 500)
+        finally:
+            if form is not None:
+                form.close()
+
+    def rank_resumes(self, parts, job_description, method, limit, collapse_duplicates=False):
+        names = []
+        texts = []
+        errors = []
+        for name, text in self.extract_texts(self.iter_resume_pdfs(parts, errors)):
+            if text:
+                names.append(name)
+                texts.append(text)
+            else:
+                errors.append({'file': name, 'error': 'Could not extract text from PDF'})
+        ranking = rank(job_description, texts, method)
+        # Checked in rank order, so a duplicate points at the better-ranked copy
+        duplicates = find_duplicates([tokenize(texts[index]) for index, _ in ranking], dedup_threshold())
+        entries = []
+        for (index, score), duplicate in zip(ranking, duplicates):
+            entry = {'file': names[index], 'score': round(score, 4)}
+            if duplicate is not None:
+                if collapse_duplicates:
+                    continue
+                position, similarity = duplicate
+                entry['duplicate_of'] = {'file': names[ranking[position][0]], 'similarity': similarity}
+            entries.append(entry)
+        return {
+            'method': method,
+            'ranking': entries[:limit] if limit is not None else entries,
+            'errors': errors,
+        }
+
+    def rank_jobs(self, part, jobs, method, limit):
+        text = extract_text(part.read())
+        if not text:
+            return {'error': 'Could not extract text from PDF'}
+        ranking = rank(text, jobs, method, limit)
+        return {
+            'method': method,
+            'file': part.filename,
+            'ranking': [{'job': index, 'score': round(score, 4)} for index, score in ranking],
+        }
+
+    def iter_resume_pdfs(self, parts, errors):
+        for part in parts:
+            if part.filename.lower().endswith('.zip'):
+                try:
+                    yield from iter_zip_pdfs(part.file, part.filename + '/',
+                                             lambda name, message: errors.append({'file': name, 'error': message}))
+                except zipfile.BadZipFile:
+                    errors.append({'file': part.filename, 'error': 'Invalid zip archive'})
+            else:
+                yield part.filename, part.read()
+
+    def extract_texts(self, sources):
+        """
+        Yield (name, text) pairs in upload order, extracting in the process pool
+        when the server has one
+
+        Like analyzer.batch.analyze_many, only about as many files as the pool
+        has workers are read and in flight at a time.
+        """
+        if self.executor is None:
+            for name, data in sources:
+                yield name, extract_text(data)
+            return
+        workers = getattr(self.server, 'workers', None) or os.cpu_count() or 1
+        in_flight = deque()
+        for name, data in sources:
+            in_flight.append((name, self.executor.submit(extract_text, data)))
+            if len(in_flight) >= workers:
+                name, future = in_flight.popleft()
+                yield name, future.result()
+        while in_flight:
+            name, future = in_flight.popleft()
+            yield name, future.result()
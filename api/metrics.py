@@ -0,0 +1,16 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.analyze import handler as analyze_handler
+
+
+class handler(analyze_handler):
+    """
+    GET the analyzer's counters and stage latency histograms in the
+    Prometheus text format.
+    """
+
+    def do_GET(self):
+        self.send_metrics()
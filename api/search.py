@@ -0,0 +1,62 @@
+import os
+import sys
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.index import DEFAULT_LIMIT, IndexReader
+from api.analyze import handler as analyze_handler
+
+_readers = {}
+
+
+def get_reader(path):
+    # One reader per process; it re-reads the manifest only when it changes
+    if path not in _readers:
+        _readers[path] = IndexReader(path)
+    return _readers[path]
+
+
+class handler(analyze_handler):
+    """
+    GET /api/search?q=python+"machine learning"&min_score=70&section=projects
+
+    Searches the resumes indexed under ANALYZER_INDEX_DIR. Filters:
+    min_score, max_score, min_words, max_words, section (repeatable) and
+    limit.
+    """
+
+    def do_GET(self):
+        self.search_index()
+
+    def search_index(self):
+        path = os.environ.get('ANALYZER_INDEX_DIR')
+        if not path:
+            self.send_json_response({'error': 'Search index is not configured (ANALYZER_INDEX_DIR)'}, 404)
+            return
+        params = parse_qs(urlparse(self.path).query)
+
+        def number(name, cast):
+            values = params.get(name)
+            return cast(values[0]) if values else None
+
+        try:
+            limit = number('limit', int)
+            if limit is not None and limit < 1:
+                raise ValueError('limit must be a positive integer')
+            result = get_reader(path).search(
+                params.get('q', [''])[0],
+                min_score=number('min_score', float),
+                max_score=number('max_score', float),
+                min_words=number('min_words', int),
+                max_words=number('max_words', int),
+                sections=params.get('section', []),
+                limit=DEFAULT_LIMIT if limit is None else limit,
+            )
+        except ValueError as e:
+            self.send_json_response({'error': f'Invalid query: {e}'}, 400)
+            return
+        except Exception as e:
+            self.send_json_response({'error': f'Server error: {str(e)}'}, 500)
+            return
+        self.send_json_response(result)
@@ -1,9 +1,12 @@
+import copy
+
 import streamlit as st
-import pdfplumber
-import textstat
-from collections import Counter
-import re
-import io
+
+from analyzer.cache import ResultCache, content_digest
+from analyzer.pipeline import extraction_error_result, index_result, iter_load_document
+from analyzer.rules import DEFAULT_RULESET, get_ruleset, ruleset_names
+from analyzer.scoring import add_job_match, iter_score_document
+from analyzer.similarity import match_job
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -25,291 +28,274 @@ uploaded_file = st.file_uploader(
     help="Select a PDF file containing your resume for analysis"
 )
 
+job_description = st.text_area(
+    "Paste a job description (optional)",
+    height=150,
+    help="Also score how well your resume covers the key terms of a specific role"
+)
+
+# Offer a choice only when rulesets beyond the default are installed
+available_rulesets = ruleset_names()
+selected_ruleset = None
+if len(available_rulesets) > 1:
+    selected_ruleset = st.selectbox(
+        "Scoring ruleset",
+        available_rulesets,
+        index=available_rulesets.index(DEFAULT_RULESET) if DEFAULT_RULESET in available_rulesets else 0,
+        help="Keyword lists, section cues and score bands tuned for a role or industry"
+    )
+
 # --- Utility Functions ---
-def extract_text_from_pdf(pdf_file):
+PREVIEW_CHARS = 2000
+
+SUGGESTION_ICONS = {
+    "low_keywords": "⚠️",
+    "keyword_optimization": "💡",
+    "readability": "📖",
+    "missing_sections": "📋",
+    "too_short": "📏",
+    "too_long": "📏",
+    "job_match": "🎯",
+}
+
+# Sub-scores: (stage, result key, metric label, bar label, maximum points)
+SCORE_PARTS = (
+    ("keywords", "keyword_score", "🔍 Keywords & Skills", "Keywords", 30),
+    ("readability", "readability_score", "📖 Readability", "Readability", 25),
+    ("sections", "section_score", "📋 Section Completeness", "Sections", 25),
+    ("length", "length_score", "📏 Length Appropriateness", "Length", 20),
+)
+
+# Every widget interaction reruns this script, so each analysis stage is
+# reused on exactly what it depends on: extraction on the file content,
+# the scorers on content + ruleset, job matching on content + description.
+# Changing one option recomputes only the stages downstream of it.
+# Leading-underscore arguments are not hashed by Streamlit; the digest
+# next to them stands in for their value.
+
+def upload_digest(uploaded_file):
     """
-    Extract text content from PDF file using pdfplumber
+    Content digest of an upload, hashed once per uploaded file
     """
-    try:
-        text = ""
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text.strip()
-    except Exception as e:
-        st.error(f"Error extracting text from PDF: {str(e)}")
-        return ""
+    digests = st.session_state.setdefault("upload_digests", {})
+    if uploaded_file.file_id not in digests:
+        digests.clear()
+        digests[uploaded_file.file_id] = content_digest(uploaded_file.getvalue())
+    return digests[uploaded_file.file_id]
 
-def get_keyword_score(text):
+@st.cache_resource(show_spinner=False)
+def stage_results():
     """
-    Analyze keyword density for job-relevant terms
-    Returns score out of 30 points
+    Extracted Documents (by content) and base scores (by content and
+    ruleset version), shared by every session. Unlike st.cache_data, a miss
+    is computed in the script itself, so the page can fill in as each page
+    is extracted and each score computed.
     """
-    # Expanded keyword categories for better analysis
-    technical_keywords = [
-        "python", "java", "javascript", "sql", "html", "css", "react", "angular", "vue",
-        "node.js", "mongodb", "postgresql", "mysql", "git", "docker", "kubernetes",
-        "aws", "azure", "gcp", "machine learning", "data analysis", "artificial intelligence",
-        "deep learning", "tensorflow", "pytorch", "pandas", "numpy", "scikit-learn"
-    ]
-    
-    soft_skills = [
-        "leadership", "teamwork", "communication", "problem solving", "analytical",
-        "project management", "collaboration", "mentoring", "strategic planning",
-        "critical thinking", "adaptability", "innovation", "creativity"
-    ]
-    
-    all_keywords = technical_keywords + soft_skills
-    
-    # Clean and tokenize text
-    words = re.findall(r"\b\w+\b", text.lower())
-    word_freq = Counter(words)
-    
-    # Calculate keyword matches
-    keyword_matches = sum([word_freq.get(keyword, 0) for keyword in all_keywords])
-    unique_keywords_found = sum([1 for keyword in all_keywords if keyword in words])
-    
-    # Scoring: base score + bonus for diversity
-    base_score = min(keyword_matches * 0.8, 20)  # Max 20 from frequency
-    diversity_bonus = min(unique_keywords_found * 0.5, 10)  # Max 10 for diversity
-    
-    return min(base_score + diversity_bonus, 30)
+    return ResultCache(max_entries=32, ttl=None), ResultCache(max_entries=128, ttl=None)
 
-def get_readability_score(text):
+@st.cache_data(max_entries=128, show_spinner=False)
+def match_upload(digest, job_description, _doc):
+    return match_job(_doc, job_description)
+
+def cacheable(doc):
     """
-    Assess text readability and complexity
-    Returns score out of 25 points
+    Whether a Document is complete enough to stand in for its upload next
+    time: it has text, and extraction neither failed nor ran out of time
     """
-    try:
-        if len(text.strip()) < 50:
-            return 0
-            
-        # Multiple readability metrics
-        flesch_score = textstat.flesch_reading_ease(text)
-        flesch_kincaid = textstat.flesch_kincaid_grade(text)
-        
-        # Optimal range for professional documents: 60-70 Flesch score
-        if 60 <= flesch_score <= 70:
-            readability_points = 25
-        elif 50 <= flesch_score < 60 or 70 < flesch_score <= 80:
-            readability_points = 20
-        elif 40 <= flesch_score < 50 or 80 < flesch_score <= 90:
-            readability_points = 15
-        else:
-            readability_points = 10
-            
-        return readability_points
-        
-    except Exception as e:
-        st.warning(f"Could not calculate readability score: {str(e)}")
-        return 15  # Default moderate score
+    return bool(doc.text) and doc.extraction.error is None and doc.extraction.truncated != "time_budget"
 
-def check_sections(text):
+def iter_upload_analysis(uploaded_file, job_description=None, ruleset=None):
     """
-    Check for presence of essential resume sections
-    Returns score out of 25 points
+    Extract and score an upload as (stage, partial) pairs (see
+    analyzer.pipeline.iter_score_pdf), reusing every stage whose inputs are
+    unchanged; the last pair is ("result", result)
     """
-    essential_sections = {
-        "contact": ["email", "phone", "linkedin", "contact"],
-        "experience": ["experience", "work", "employment", "career", "professional"],
-        "education": ["education", "degree", "university", "college", "school"],
-        "skills": ["skills", "technologies", "proficient", "expertise", "competencies"],
-        "projects": ["projects", "portfolio", "achievements", "accomplishments"]
-    }
-    
-    text_lower = text.lower()
-    sections_found = 0
-    section_details = {}
-    
-    for section_name, keywords in essential_sections.items():
-        found = any(keyword in text_lower for keyword in keywords)
-        section_details[section_name] = found
-        if found:
-            sections_found += 1
-    
-    # Score calculation: 5 points per essential section
-    section_score = (sections_found / len(essential_sections)) * 25
-    
-    return section_score, section_details
+    digest = upload_digest(uploaded_file)
+    documents, scores = stage_results()
+    doc = documents.get(digest)
+    if doc is None:
+        doc = yield from iter_load_document(uploaded_file.getvalue())
+        if cacheable(doc):
+            documents.set(digest, doc)
+    if not doc.text:
+        yield "result", extraction_error_result(doc.extraction)
+        return
+    rules = get_ruleset(ruleset)
+    key = (digest, rules.key)
+    result = scores.get(key)
+    if result is None:
+        # Base scores only; the job match is cached on its own
+        for stage, partial in iter_score_document(doc, PREVIEW_CHARS, ruleset=rules):
+            if stage != "result":
+                yield stage, partial
+        result = partial
+        index_result(doc, result, digest, uploaded_file.name)
+        if cacheable(doc):
+            scores.set(key, result)
+    # Stored results are shared, so the job match is added to a copy
+    result = copy.deepcopy(result)
+    if job_description:
+        match = match_upload(digest, job_description, doc)
+        if match is not None:
+            add_job_match(result, match)
+            yield "job_match", {'job_match': match}
+    yield "result", result
 
-def get_length_score(text):
+def result_placeholders():
     """
-    Evaluate resume length appropriateness
-    Returns score out of 20 points
+    An empty slot for every part of the results, in page order; metrics
+    show a dash until their stage completes
     """
-    word_count = len(text.split())
-    
-    if 300 <= word_count <= 800:  # Optimal range
-        return 20
-    elif 200 <= word_count < 300 or 800 < word_count <= 1200:  # Good range
-        return 15
-    elif 100 <= word_count < 200 or 1200 < word_count <= 1500:  # Acceptable
-        return 10
-    else:  # Too short or too long
-        return 5
-
-def generate_suggestions(keyword_score, readability_score, section_score, section_details, length_score, word_count):
+    slots = {}
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        slots["total"] = st.empty()
+        slots["total"].metric("📊 Overall Resume Score", "—")
+
+    st.markdown("---")
+    slots["job_match"] = st.empty()
+
+    st.subheader("📈 Detailed Score Breakdown")
+    col1, col2 = st.columns(2)
+    with col1:
+        slots["keywords"] = st.empty()
+        slots["readability"] = st.empty()
+    with col2:
+        slots["sections"] = st.empty()
+        slots["length"] = st.empty()
+    for stage, _, label, _, _ in SCORE_PARTS:
+        slots[stage].metric(label, "—")
+
+    st.markdown("#### Score Visualization")
+    for stage, _, _, _, _ in SCORE_PARTS:
+        slots[stage + "_bar"] = st.empty()
+
+    st.markdown("---")
+    st.subheader("💡 Personalized Improvement Suggestions")
+    slots["suggestions"] = st.empty()
+
+    st.markdown("---")
+    st.subheader("📊 Additional Insights")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        slots["word_count"] = st.empty()
+    with col2:
+        slots["sections_found"] = st.empty()
+    with col3:
+        slots["character_count"] = st.empty()
+    slots["word_count"].metric("Word Count", "—")
+    slots["sections_found"].metric("Sections Found", "—")
+    slots["character_count"].metric("Character Count", "—")
+
+    st.markdown("#### ✅ Section Checklist")
+    slots["checklist"] = st.empty()
+    slots["preview"] = st.empty()
+    return slots
+
+def render_stage(slots, stage, result):
     """
-    Generate personalized improvement suggestions
+    Fill the slots a stage's values belong in; result holds every value
+    received so far, and the final result fills them all
     """
-    suggestions = []
-    
-    # Keyword suggestions
-    if keyword_score < 15:
-        suggestions.append({
-            "type": "warning",
-            "title": "⚠️ Low Keyword Density",
-            "message": "Consider adding more relevant technical skills and industry keywords. Include specific technologies, programming languages, and tools you've used."
-        })
-    elif keyword_score < 25:
-        suggestions.append({
-            "type": "info",
-            "title": "💡 Keyword Optimization",
-            "message": "Good keyword usage! You could enhance it further by adding more specific technical skills and soft skills relevant to your target role."
-        })
-    
-    # Readability suggestions
-    if readability_score < 15:
-        suggestions.append({
-            "type": "warning",
-            "title": "📖 Readability Concerns",
-            "message": "Your resume might be too complex or too simple. Aim for clear, professional language that's easy to scan quickly."
-        })
-    
-    # Section suggestions
-    missing_sections = [section for section, found in section_details.items() if not found]
-    if missing_sections:
-        suggestions.append({
-            "type": "error",
-            "title": "📋 Missing Sections",
-            "message": f"Consider adding these important sections: {', '.join(missing_sections).title()}"
-        })
-    
-    # Length suggestions
-    if length_score < 15:
-        if word_count < 300:
-            suggestions.append({
-                "type": "info",
-                "title": "📏 Resume Length",
-                "message": "Your resume seems quite brief. Consider adding more details about your experiences, achievements, and skills."
-            })
-        elif word_count > 1200:
-            suggestions.append({
-                "type": "info",
-                "title": "📏 Resume Length",
-                "message": "Your resume is quite lengthy. Consider condensing information and focusing on the most relevant and impactful details."
-            })
-    
-    return suggestions
+    done = stage == "result"
+    for part, key, label, bar_label, points in SCORE_PARTS:
+        if part == stage or done:
+            slots[part].metric(label, f"{result[key]:.1f}/{points}")
+            slots[part + "_bar"].progress(result[key] / points, text=f"{bar_label}: {result[key]:.1f}/{points}")
+
+    if stage == "total" or done:
+        total_score = result["total_score"]
+        slots["total"].metric(
+            label="📊 Overall Resume Score",
+            value=f"{total_score}/100",
+            delta=f"{total_score - 70:.1f} vs. target (70+)" if total_score != 70 else None
+        )
+
+    job_match = result.get("job_match")
+    if (stage == "job_match" or done) and job_match:
+        with slots["job_match"].container():
+            st.subheader("🎯 Job Description Match")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Key Term Coverage", f"{job_match['match_score']:.0f}%")
+            with col2:
+                st.metric("Similarity", f"{job_match['similarity']:.2f}")
+            st.progress(job_match["match_score"] / 100, text=f"Covers {job_match['match_score']:.0f}% of the job's key terms")
+            if job_match["matched_terms"]:
+                st.markdown("**Matched:** " + ", ".join(job_match["matched_terms"]))
+            if job_match["missing_terms"]:
+                st.markdown("**Missing:** " + ", ".join(job_match["missing_terms"]))
+            st.markdown("---")
+
+    if stage == "suggestions" or done:
+        with slots["suggestions"].container():
+            suggestions = result["suggestions"]
+            if suggestions:
+                for suggestion in suggestions:
+                    title = f"{SUGGESTION_ICONS.get(suggestion['id'], '💡')} {suggestion['title']}"
+                    if suggestion["type"] == "error":
+                        st.error(f"**{title}**\n\n{suggestion['message']}")
+                    elif suggestion["type"] == "warning":
+                        st.warning(f"**{title}**\n\n{suggestion['message']}")
+                    else:
+                        st.info(f"**{title}**\n\n{suggestion['message']}")
+            else:
+                st.success("🎉 **Excellent work!** Your resume looks well-optimized. Keep up the great work!")
+
+    if stage == "length" or done:
+        slots["word_count"].metric("Word Count", result["word_count"])
+        slots["character_count"].metric("Character Count", result["character_count"])
+
+    if stage == "sections" or done:
+        section_details = result["section_details"]
+        slots["sections_found"].metric("Sections Found", f"{sum(section_details.values())}/{len(section_details)}")
+        with slots["checklist"].container():
+            for section, found in section_details.items():
+                status = "✅" if found else "❌"
+                st.write(f"{status} {section.title()}")
+
+    if done:
+        # Text preview
+        with slots["preview"].container():
+            with st.expander("📄 View Extracted Resume Text", expanded=False):
+                st.text_area(
+                    f"Extracted Text (First {PREVIEW_CHARS} characters):",
+                    result["text_preview"],
+                    height=300,
+                    disabled=True
+                )
+                st.info(f"Showing first {PREVIEW_CHARS} characters of {result['character_count']} total characters extracted.")
 
 # --- Main Application Logic ---
 if uploaded_file is not None:
     try:
         # Show processing indicator
-        with st.spinner("🔍 Analyzing your resume... This may take a few seconds."):
-            # Extract text from PDF
-            raw_text = extract_text_from_pdf(uploaded_file)
-            
-            if not raw_text:
-                st.error("❌ Could not extract text from the PDF. Please ensure the file is not corrupted and contains readable text.")
-                st.stop()
-            
-            # Calculate individual scores
-            keyword_score = get_keyword_score(raw_text)
-            readability_score = get_readability_score(raw_text)
-            section_score, section_details = check_sections(raw_text)
-            length_score = get_length_score(raw_text)
-            
-            # Calculate total score
-            total_score = round(keyword_score + readability_score + section_score + length_score, 1)
-            word_count = len(raw_text.split())
-        
-        # Display Results
-        st.success("✅ Analysis Complete!")
-        st.markdown("---")
-        
-        # Main Score Display
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            st.metric(
-                label="📊 Overall Resume Score",
-                value=f"{total_score}/100",
-                delta=f"{total_score - 70:.1f} vs. target (70+)" if total_score != 70 else None
-            )
-        
-        st.markdown("---")
-        
-        # Detailed Score Breakdown
-        st.subheader("📈 Detailed Score Breakdown")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.metric("🔍 Keywords & Skills", f"{keyword_score:.1f}/30")
-            st.metric("📖 Readability", f"{readability_score:.1f}/25")
-        
-        with col2:
-            st.metric("📋 Section Completeness", f"{section_score:.1f}/25")
-            st.metric("📏 Length Appropriateness", f"{length_score:.1f}/20")
-        
-        # Progress bars for visual representation
-        st.markdown("#### Score Visualization")
-        st.progress(keyword_score / 30, text=f"Keywords: {keyword_score:.1f}/30")
-        st.progress(readability_score / 25, text=f"Readability: {readability_score:.1f}/25")
-        st.progress(section_score / 25, text=f"Sections: {section_score:.1f}/25")
-        st.progress(length_score / 20, text=f"Length: {length_score:.1f}/20")
-        
+        status = st.empty()
+        status.progress(0.0, text="🔍 Analyzing your resume... This may take a few seconds.")
         st.markdown("---")
-        
-        # Generate and display suggestions
-        suggestions = generate_suggestions(
-            keyword_score, readability_score, section_score, 
-            section_details, length_score, word_count
-        )
-        
-        st.subheader("💡 Personalized Improvement Suggestions")
-        
-        if suggestions:
-            for suggestion in suggestions:
-                if suggestion["type"] == "error":
-                    st.error(f"**{suggestion['title']}**\n\n{suggestion['message']}")
-                elif suggestion["type"] == "warning":
-                    st.warning(f"**{suggestion['title']}**\n\n{suggestion['message']}")
-                else:
-                    st.info(f"**{suggestion['title']}**\n\n{suggestion['message']}")
-        else:
-            st.success("🎉 **Excellent work!** Your resume looks well-optimized. Keep up the great work!")
-        
-        # Additional Insights
-        st.markdown("---")
-        st.subheader("📊 Additional Insights")
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Word Count", word_count)
-        with col2:
-            st.metric("Sections Found", f"{sum(section_details.values())}/{len(section_details)}")
-        with col3:
-            character_count = len(raw_text)
-            st.metric("Character Count", character_count)
-        
-        # Section checklist
-        st.markdown("#### ✅ Section Checklist")
-        for section, found in section_details.items():
-            status = "✅" if found else "❌"
-            st.write(f"{status} {section.title()}")
-        
-        # Text preview
-        with st.expander("📄 View Extracted Resume Text", expanded=False):
-            st.text_area(
-                "Extracted Text (First 2000 characters):",
-                raw_text[:2000] + ("..." if len(raw_text) > 2000 else ""),
-                height=300,
-                disabled=True
-            )
-            st.info(f"Showing first 2000 characters of {len(raw_text)} total characters extracted.")
+
+        # Every part of the results starts as a placeholder and is filled in
+        # as soon as its stage completes (each stage cached by its inputs)
+        results = st.empty()
+        with results.container():
+            slots = result_placeholders()
+
+        result = {}
+        for stage, partial in iter_upload_analysis(uploaded_file, job_description.strip() or None, selected_ruleset):
+            if stage == "page":
+                status.progress(partial["page"] / max(partial["pages"], 1),
+                                text=f"🔍 Extracting page {partial['page']} of {partial['pages']}...")
+                continue
+            if 'error' in partial:
+                results.empty()
+                status.error("❌ Could not extract text from the PDF. Please ensure the file is not corrupted and contains readable text.")
+                st.stop()
+            if stage != "result":
+                status.progress(1.0, text="📊 Scoring your resume...")
+            result.update(partial)
+            render_stage(slots, stage, result)
+
+        status.success("✅ Analysis Complete!")
     
     except Exception as e:
         st.error(f"❌ An error occurred while analyzing your resume: {str(e)}")
@@ -0,0 +1,108 @@
+"""
+Near-duplicate detection: signature cost, accuracy and LSH lookup latency.
+
+Usage:
+    python benchmarks/bench_dedup.py [--count 40] [--size 100000] [--threshold 0.85]
+
+Each synthetic resume is paired with a near duplicate generated from the
+same random state under another candidate number, which changes the name
+and contact lines but not the body (on the shortest resumes that is over
+a tenth of the text). Every original is indexed, then each duplicate
+looks for its original (recall) and any other match is a false positive.
+Lookup latency is measured with the index padded to --size random
+signatures, for the in-memory and SQLite indexes. Exits non-zero on a
+false positive.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.dedup import DEFAULT_THRESHOLD, NUM_PERM, MemoryDedupIndex, SQLiteDedupIndex, band_keys, minhash
+from analyzer.pipeline import load_document
+from benchmarks.corpus import make_resume
+
+
+def lookup_time(index, signatures, threshold, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for signature in signatures:
+            index.query(signature, threshold)
+        best = min(best, time.perf_counter() - start)
+    return best / len(signatures)
+
+
+def pad_sqlite(index, signatures):
+    # One transaction instead of a commit per add()
+    conn = index._conn
+    for signature in signatures:
+        cursor = conn.execute("INSERT INTO documents (digest, variant, signature, created) VALUES ('', '', ?, 0)",
+                              (signature.tobytes(),))
+        conn.executemany("INSERT INTO bands (key, document) VALUES (?, ?)",
+                         [(key, cursor.lastrowid) for key in band_keys(signature)])
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=40, help="resume pairs")
+    parser.add_argument("--size", type=int, default=100000, help="index entries for the latency test")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    originals, duplicates = [], []
+    for index in range(args.count):
+        for target, number in ((originals, index), (duplicates, index + 5000)):
+            data, _ = make_resume(random.Random(args.seed + index), number)
+            target.append(load_document(data).tokens)
+
+    start = time.perf_counter()
+    original_signatures = [minhash(tokens) for tokens in originals]
+    elapsed = time.perf_counter() - start
+    tokens = sum(len(tokens) for tokens in originals) / len(originals)
+    print("Signatures: %.1f us/doc (%.0f tokens/doc, %d slots)" % (elapsed / len(originals) * 1e6, tokens, NUM_PERM))
+
+    index = MemoryDedupIndex()
+    for position, signature in enumerate(original_signatures):
+        index.add(signature, str(position))
+    duplicate_signatures = [minhash(tokens) for tokens in duplicates]
+    found = false_positives = 0
+    similarities = []
+    for position, signature in enumerate(duplicate_signatures):
+        matches = index.query(signature, args.threshold)
+        found += any(match.digest == str(position) for match in matches)
+        false_positives += sum(match.digest != str(position) for match in matches)
+        similarities.extend(match.similarity for match in matches if match.digest == str(position))
+    for position, signature in enumerate(original_signatures):
+        false_positives += sum(match.digest != str(position) for match in index.query(signature, args.threshold))
+    print("Accuracy at %.2f: %d/%d duplicates found (mean similarity %.3f), %d false positives\n"
+          % (args.threshold, found, args.count, np.mean(similarities) if similarities else 0, false_positives))
+
+    rng = np.random.default_rng(args.seed)
+    padding = rng.integers(0, 2 ** 32, size=(args.size, NUM_PERM), dtype=np.uint32)
+    print("%-8s %10s %14s" % ("index", "entries", "us/lookup"))
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_index = SQLiteDedupIndex(os.path.join(tmp, "dedup.db"))
+        for label, target in (("memory", index), ("sqlite", sqlite_index)):
+            for position, signature in enumerate(original_signatures if target is sqlite_index else ()):
+                target.add(signature, str(position))
+            if target is sqlite_index:
+                pad_sqlite(target, padding)
+            else:
+                for signature in padding:
+                    target.add(signature, "")
+            seconds = lookup_time(target, duplicate_signatures, args.threshold)
+            print("%-8s %10d %14.1f" % (label, len(target), seconds * 1e6))
+    sys.exit(1 if false_positives else 0)
+
+
+if __name__ == "__main__":
+    main()
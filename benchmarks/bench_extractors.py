@@ -0,0 +1,91 @@
+"""
+Extraction engines: pages/sec and text parity against pdfplumber.
+
+Usage:
+    python benchmarks/bench_extractors.py CORPUS [CORPUS ...] [--repeat 3]
+
+CORPUS may be PDF files, directories or zip archives. Parity is the
+Jaccard similarity of each engine's token set with pdfplumber's, averaged
+over documents; "fallbacks" counts documents where auto mode would reject
+the fast engine's text and re-extract with pdfplumber.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.batch import iter_pdf_sources
+from analyzer.engines import ENGINES, FALLBACK_ENGINE, text_quality_problem
+from analyzer.extraction import ExtractionLimits, extract_pages
+from analyzer.keywords import tokenize
+
+
+def extract_all(data, engine):
+    pages = extract_pages(io.BytesIO(data), ExtractionLimits(), workers=0, engine=engine)
+    return [page.text for page in pages]
+
+
+def jaccard(left, right):
+    left, right = set(left), set(right)
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = list(iter_pdf_sources(args.paths))
+    if not corpus:
+        sys.exit("No PDFs found")
+    engines = [name for name, engine in ENGINES.items() if engine.available()]
+
+    reference = {}
+    for name, data in corpus:
+        try:
+            reference[name] = tokenize("\n".join(extract_all(data, FALLBACK_ENGINE)))
+        except Exception:
+            reference[name] = []
+
+    print("%d documents\n" % len(corpus))
+    print("%-12s %10s %10s %10s %10s %10s" % ("engine", "pages/s", "ms/doc", "parity", "fallbacks", "errors"))
+    for engine in engines:
+        pages = 0
+        errors = 0
+        fallbacks = 0
+        parity = []
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for name, data in corpus:
+                try:
+                    texts = extract_all(data, engine)
+                except Exception:
+                    errors += 1
+                    continue
+                pages += len(texts)
+        elapsed = time.perf_counter() - start
+
+        for name, data in corpus:
+            try:
+                texts = extract_all(data, engine)
+            except Exception:
+                continue
+            parity.append(jaccard(tokenize("\n".join(texts)), reference[name]))
+            if engine != FALLBACK_ENGINE and text_quality_problem(texts):
+                fallbacks += 1
+
+        runs = len(corpus) * args.repeat
+        print("%-12s %10.1f %10.2f %10.3f %10d %10d" % (
+            engine, pages / elapsed, elapsed / runs * 1000,
+            sum(parity) / len(parity) if parity else 0.0, fallbacks, errors // args.repeat,
+        ))
+
+
+if __name__ == "__main__":
+    main()
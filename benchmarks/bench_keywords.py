@@ -0,0 +1,100 @@
+"""
+Keyword matching throughput: legacy per-keyword scan vs. the compiled matcher.
+
+Usage:
+    python benchmarks/bench_keywords.py [--words 800] [--repeat 20]
+
+Dictionaries are padded with synthetic terms to show how each approach
+scales with the number of keywords.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.keywords import KeywordMatcher
+from analyzer.rules import get_ruleset
+
+FILLER = (
+    "developed designed implemented managed delivered improved built led "
+    "scalable services team product customers reporting pipeline platform "
+    "experience education university projects skills responsible results"
+).split()
+
+
+def legacy_keyword_count(text, keywords):
+    """
+    The original get_keyword_score matching logic
+    """
+    words = re.findall(r"\b\w+\b", text.lower())
+    word_freq = Counter(words)
+    keyword_matches = sum([word_freq.get(keyword, 0) for keyword in keywords])
+    unique_keywords_found = sum([1 for keyword in keywords if keyword in words])
+    return keyword_matches, unique_keywords_found
+
+
+def synthetic_terms(count, rng):
+    terms = []
+    for index in range(count):
+        if index % 3 == 0:
+            terms.append("term%d skill%d" % (index, rng.randrange(100)))
+        else:
+            terms.append("term%d" % index)
+    return terms
+
+
+def synthetic_resume(words, keywords, rng):
+    tokens = []
+    for _ in range(words):
+        if rng.random() < 0.08:
+            tokens.append(rng.choice(keywords))
+        else:
+            tokens.append(rng.choice(FILLER))
+    return " ".join(tokens)
+
+
+def time_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", type=int, default=800)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    base_keywords = list(get_ruleset("default").terms)
+    text = synthetic_resume(args.words, base_keywords, rng)
+    text_kb = len(text.encode()) / 1024
+
+    print("%8s  %12s  %12s  %12s  %10s" % ("terms", "legacy ms", "matcher ms", "build ms", "MB/s"))
+    for extra in (0, 1000, 10000, 50000):
+        keywords = base_keywords + synthetic_terms(extra, rng)
+
+        build_start = time.perf_counter()
+        matcher = KeywordMatcher(keywords)
+        build_time = time.perf_counter() - build_start
+
+        repeat = max(1, args.repeat // (1 + extra // 10000))
+        legacy = time_call(lambda: legacy_keyword_count(text, keywords), repeat)
+        compiled = time_call(lambda: matcher.count(text), args.repeat)
+        print("%8d  %12.3f  %12.3f  %12.1f  %10.1f" % (
+            len(keywords), legacy * 1000, compiled * 1000, build_time * 1000,
+            text_kb / 1024 / compiled,
+        ))
+
+    sample = "Machine learning with node.js and scikit-learn; strong problem solving."
+    print("\nPhrase matches the legacy scan misses:", dict(KeywordMatcher(base_keywords).count(sample)))
+
+
+if __name__ == "__main__":
+    main()
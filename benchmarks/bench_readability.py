@@ -0,0 +1,112 @@
+"""
+Readability throughput: textstat vs. the single-pass TextStats, with a parity check.
+
+Usage:
+    python benchmarks/bench_readability.py [--count 40] [--repeat 5]
+
+Times Flesch reading ease alone and together with FK grade and Gunning
+Fog on the synthetic corpus. textstat memoizes whole texts, so its caches
+are cleared before every pass; TextStats is timed with a cold and a warm
+syllable cache. Exits non-zero if any formula differs from textstat.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import textstat
+
+from analyzer.pipeline import load_document
+from analyzer.readability import TextStats, word_syllables
+from benchmarks.corpus import generate_corpus
+
+FORMULAS = ("flesch_reading_ease", "flesch_kincaid_grade", "gunning_fog", "smog_index",
+            "coleman_liau_index", "automated_readability_index")
+EDGE_CASES = (
+    "",
+    "Hello world.",
+    "Don't stop! It's J.R.R. Tolkien's 3rd book... right? naïve café co-operate e-mail",
+    "One two three. Four five six seven! Eight nine ten eleven twelve? x",
+)
+
+
+def textstat_flesch(text):
+    return textstat.flesch_reading_ease(text)
+
+
+def textstat_three(text):
+    return textstat.flesch_reading_ease(text), textstat.flesch_kincaid_grade(text), textstat.gunning_fog(text)
+
+
+def stats_flesch(text):
+    return TextStats(text).flesch_reading_ease()
+
+
+def stats_three(text):
+    stats = TextStats(text)
+    return stats.flesch_reading_ease(), stats.flesch_kincaid_grade(), stats.gunning_fog()
+
+
+def time_pass(func, texts, repeat, reset):
+    best = float("inf")
+    for _ in range(repeat):
+        reset()
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts)
+
+
+def check_parity(texts):
+    mismatches = []
+    for index, text in enumerate(texts):
+        ours = TextStats(text).scores()
+        for name in FORMULAS:
+            expected = getattr(textstat, name)(text)
+            if ours[name] != expected:
+                mismatches.append((index, name, expected, ours[name]))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=40, help="synthetic documents")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes (best is reported)")
+    args = parser.parse_args()
+
+    texts = [load_document(data).text for _, data, _ in generate_corpus(args.count, args.seed)]
+    texts = [text for text in texts if text]
+    words = sum(len(text.split()) for text in texts) / len(texts)
+    print("Corpus: %d documents, %.0f words on average\n" % (len(texts), words))
+
+    no_reset = lambda: None
+    rows = [
+        ("flesch", "textstat", time_pass(textstat_flesch, texts, args.repeat, textstat.textstat._cache_clear)),
+        ("flesch", "TextStats cold", time_pass(stats_flesch, texts, args.repeat, word_syllables.cache_clear)),
+        ("flesch", "TextStats warm", time_pass(stats_flesch, texts, args.repeat, no_reset)),
+        ("flesch+fk+fog", "textstat", time_pass(textstat_three, texts, args.repeat, textstat.textstat._cache_clear)),
+        ("flesch+fk+fog", "TextStats cold", time_pass(stats_three, texts, args.repeat, word_syllables.cache_clear)),
+        ("flesch+fk+fog", "TextStats warm", time_pass(stats_three, texts, args.repeat, no_reset)),
+    ]
+    baselines = {formulas: seconds for formulas, engine, seconds in rows if engine == "textstat"}
+    print("%-14s %-16s %12s %10s" % ("formulas", "engine", "ms/doc", "speedup"))
+    for formulas, engine, seconds in rows:
+        print("%-14s %-16s %12.3f %9.1fx" % (formulas, engine, seconds * 1000, baselines[formulas] / seconds))
+    info = word_syllables.cache_info()
+    print("\nSyllable cache: %d words, %d hits, %d misses" % (info.currsize, info.hits, info.misses))
+
+    mismatches = check_parity(texts + list(EDGE_CASES))
+    if mismatches:
+        print("\nParity FAILED on %d values:" % len(mismatches))
+        for index, name, expected, got in mismatches[:20]:
+            print("  text %d %s: textstat %r, TextStats %r" % (index, name, expected, got))
+        sys.exit(1)
+    print("Parity: all %d formulas match textstat on %d texts" % (len(FORMULAS), len(texts) + len(EDGE_CASES)))
+
+
+if __name__ == "__main__":
+    main()
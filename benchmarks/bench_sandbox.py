@@ -0,0 +1,178 @@
+"""
+Sandboxed extraction: per-document overhead and containment of hostile PDFs.
+
+Usage:
+    python benchmarks/bench_sandbox.py [--count 40] [--workers 2]
+
+First extracts --count corpus resumes in-process and through an
+analyzer.sandbox pool (median ms per document, plus the cost of starting
+a worker). Then each hostile case runs in a pool with tight limits and
+must fail with the expected kind:
+
+    spin     a FlateDecode content stream of 70k overlapping text runs;
+             pypdfium2 reads it in a second, then auto mode falls back to
+             pdfplumber, which would spin for minutes (wall-clock timeout)
+    cpu      the same file forced through pdfplumber under a CPU limit
+    memory   a 60 MB content stream under a 300 MB address-space limit
+    parse    bytes that are not a PDF
+
+Finally corpus resumes are extracted while the spin case is submitted
+over and over next to them, to show their latency stays bounded. Exits
+non-zero if a hostile case is not contained or a sandboxed extraction
+differs from the in-process one.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import threading
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.extraction import ExtractionError, ExtractionLimits, ExtractionReport, extract_pages
+from analyzer.sandbox import SandboxPool
+from benchmarks.corpus import generate_corpus
+
+# One line of text drawn at the same spot, repeated
+BOMB_LINE = b"BT /F1 12 Tf 72 700 Td (All work and no play makes Jack a dull boy) Tj ET\n"
+
+
+def decompression_bomb(megabytes):
+    """
+    A one-page PDF whose content stream inflates to about `megabytes` MB
+    """
+    compressor = zlib.compressobj(9)
+    chunk = BOMB_LINE * (1024 * 1024 // len(BOMB_LINE))
+    stream = b"".join([compressor.compress(chunk) for _ in range(megabytes)] + [compressor.flush()])
+    objects = [
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Page /Parent 4 0 R /MediaBox [0 0 612 792] /Contents 2 0 R "
+        b"/Resources << /Font << /F1 1 0 R >> >> >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Catalog /Pages 4 0 R >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 5 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def sandboxed(pool, data, engine=None):
+    """
+    (pages, ExtractionError or None, seconds) for one document
+    """
+    report = ExtractionReport()
+    start = time.perf_counter()
+    try:
+        for _ in pool.iter_extract(data, ExtractionLimits.from_env(), report, engine):
+            pass
+        error = None
+    except ExtractionError as e:
+        error = e
+    return report.pages, error, time.perf_counter() - start
+
+
+def overhead(samples, workers):
+    local, remote = [], []
+    mismatches = 0
+    pool = SandboxPool(workers=workers)
+    _, _, cold = sandboxed(pool, samples[0])
+    for data in samples:
+        start = time.perf_counter()
+        expected = extract_pages(io.BytesIO(data), ExtractionLimits.from_env(), 0)
+        local.append(time.perf_counter() - start)
+        pages, error, seconds = sandboxed(pool, data)
+        remote.append(seconds)
+        mismatches += error is not None or [page.text for page in pages] != [page.text for page in expected]
+    pool.close()
+    print("%-12s %10s" % ("mode", "ms/doc"))
+    print("%-12s %10.1f" % ("in-process", statistics.median(local) * 1000))
+    print("%-12s %10.1f" % ("sandbox", statistics.median(remote) * 1000))
+    print("first sandboxed document (starts a worker): %.1f ms\n" % (cold * 1000))
+    return mismatches
+
+
+def containment():
+    spin = decompression_bomb(5)
+    cases = (
+        ("spin", spin, None, dict(timeout=3), "timeout"),
+        ("cpu", spin, "pdfplumber", dict(cpu_seconds=2, timeout=60), "cpu"),
+        ("memory", decompression_bomb(60), "pypdfium2", dict(memory_mb=300, timeout=60), "memory"),
+        ("parse", b"%PDF-1.4\nnot really a pdf", "pdfplumber", dict(timeout=10), "parse"),
+    )
+    failures = 0
+    print("%-8s %10s %10s %10s  %s" % ("case", "pdf bytes", "expected", "seconds", "outcome"))
+    for name, data, engine, settings, expected in cases:
+        pool = SandboxPool(workers=1, **settings)
+        _, error, seconds = sandboxed(pool, data, engine)
+        pool.close()
+        outcome = error.kind if error is not None else "no error"
+        failures += outcome != expected
+        print("%-8s %10d %10s %10.2f  %s%s" % (name, len(data), expected, seconds, outcome,
+                                            "" if outcome == expected else "  NOT CONTAINED"))
+    return failures
+
+
+def under_attack(samples, workers, rounds=3):
+    spin = decompression_bomb(5)
+
+    def latencies(pool):
+        times = []
+        for _ in range(rounds):
+            for data in samples:
+                _, _, seconds = sandboxed(pool, data)
+                times.append(seconds * 1000)
+        return times
+
+    pool = SandboxPool(workers=workers, timeout=2)
+    quiet = latencies(pool)
+    stop = threading.Event()
+    killed = []
+
+    def attack():
+        while not stop.is_set():
+            _, error, _ = sandboxed(pool, spin)
+            killed.append(error is not None)
+
+    attacker = threading.Thread(target=attack)
+    attacker.start()
+    busy = latencies(pool)
+    stop.set()
+    attacker.join()
+    pool.close()
+
+    print("\nCorpus extraction while the spin case is resubmitted (%d of %d workers busy with it)" % (1, workers))
+    print("%-12s %10s %10s %10s" % ("", "p50 ms", "p95 ms", "max ms"))
+    for label, times in (("quiet", quiet), ("under attack", busy)):
+        times = sorted(times)
+        print("%-12s %10.1f %10.1f %10.1f" % (label, times[len(times) // 2], times[int(len(times) * 0.95)], times[-1]))
+    print("hostile documents killed: %d/%d" % (sum(killed), len(killed)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=40, help="corpus resumes")
+    parser.add_argument("--workers", type=int, default=2, help="sandbox workers")
+    args = parser.parse_args()
+
+    samples = [data for _, data, _ in generate_corpus(args.count)]
+    mismatches = overhead(samples, args.workers)
+    failures = containment()
+    under_attack(samples[:10], args.workers)
+    if mismatches:
+        print("\n%d sandboxed extractions differ from in-process ones" % mismatches)
+    sys.exit(1 if mismatches or failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Section detection: heading segmentation vs. substring checks, against known sections.
+
+Usage:
+    python benchmarks/bench_sections.py [--count 60] [--engine pypdfium2]
+
+The synthetic corpus records which sections each resume has, so both
+methods are scored for false positives (a section reported but absent)
+and misses, and timed per document. The substring baseline looks for the
+same heading names anywhere in the lowercased text. Exits non-zero if
+the segmenter misses a section or reports one that is absent.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.document import Document
+from analyzer.pipeline import load_document
+from analyzer.rules import BUNDLED_DIR, RulesetStore
+from benchmarks.corpus import generate_corpus
+
+
+def substring_sections(doc, ruleset):
+    lower = doc.text.lower()
+    return {name for name, headings in ruleset.sections.items() if any(heading in lower for heading in headings)}
+
+
+def segmented_sections(doc, ruleset):
+    # A fresh Document each time: segmentations are cached per document
+    fresh = Document(doc.text, emphasis=doc.emphasis)
+    return {name for name, found in fresh.sections(ruleset.segmenter).found.items() if found}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=60, help="synthetic documents")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--engine", default=None, help="extraction engine (default: ANALYZER_PDF_ENGINE)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes (best is reported)")
+    args = parser.parse_args()
+
+    ruleset = RulesetStore([BUNDLED_DIR]).get("default")
+    samples = []
+    for _, data, spec in generate_corpus(args.count, args.seed):
+        doc = load_document(data, engine=args.engine)
+        samples.append((doc, set(spec["sections"]) & set(ruleset.sections)))
+    layout = sum(doc.emphasis is not None for doc, _ in samples)
+    print("Corpus: %d documents, %d with layout cues\n" % (len(samples), layout))
+
+    print("%-12s %8s %8s %8s %12s" % ("method", "found", "false+", "missed", "us/doc"))
+    failed = False
+    for label, detect in (("substring", substring_sections), ("segmenter", segmented_sections)):
+        found = false_positives = missed = 0
+        for doc, truth in samples:
+            detected = detect(doc, ruleset)
+            found += len(detected & truth)
+            false_positives += len(detected - truth)
+            missed += len(truth - detected)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for doc, _ in samples:
+                detect(doc, ruleset)
+            best = min(best, time.perf_counter() - start)
+        print("%-12s %8d %8d %8d %12.1f" % (label, found, false_positives, missed, best / len(samples) * 1e6))
+        if label == "segmenter":
+            failed = bool(false_positives or missed)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
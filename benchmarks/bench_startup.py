@@ -0,0 +1,210 @@
+"""
+Cold-start cost of the serverless api/analyze.py function.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--save NAME] [--compare NAME]
+
+Every run starts a fresh interpreter that imports api/analyze.py, serves
+its handler on a loopback port and sends, in order, an OPTIONS request, a
+POST with a bad content type and a POST of a synthetic resume. Times are
+measured from process spawn, so they include interpreter start-up, and
+the median over --runs is reported. The same is repeated with
+ANALYZER_WARM_UP=1, which moves the analysis pipeline's start-up cost
+from the first analysis into the import. The import itself is broken
+down with `python -X importtime`.
+
+Exits non-zero if importing api/analyze.py (or answering the first two
+requests) loads any of DEFERRED_MODULES, or, with --compare, if a median
+grew by more than --threshold against a baseline saved with --save
+(stored as benchmarks/baselines/startup-NAME.json).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import BASELINE_DIR, BOUNDARY
+
+# Must only be imported by the first analysis
+DEFERRED_MODULES = ("analyzer.pipeline", "numpy", "pyphen", "pypdfium2", "pypdf", "pdfplumber", "textstat", "cgi")
+# Start-up times jitter by several milliseconds; ignore changes below this
+MIN_DELTA_MS = 10
+MEASUREMENTS = ("import", "options", "rejected", "first_analysis", "second_analysis")
+
+CHILD = r"""
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from api.analyze import handler
+imported = time.time()
+import http.client, json, threading
+from http.server import HTTPServer
+
+DEFERRED = sys.argv[3].split(",")
+server = HTTPServer(("127.0.0.1", 0), handler)
+server.RequestHandlerClass.log_message = lambda *args: None
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+def request(method, body=b"", content_type=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+    conn.request(method, "/api/analyze", body, {"Content-Type": content_type} if content_type else {})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status, time.time()
+
+loaded = [name for name in DEFERRED if name in sys.modules]
+options = request("OPTIONS")
+rejected = request("POST", b"not a form", "text/plain")
+loaded += [name for name in DEFERRED if name in sys.modules and name not in loaded]
+with open(sys.argv[2], "rb") as f:
+    body = f.read()
+content_type = "multipart/form-data; boundary=" + sys.argv[4]
+first = request("POST", body, content_type)
+second = request("POST", body, content_type)
+print(json.dumps({"times": {"import": imported, "options": options[1], "rejected": rejected[1],
+                            "first_analysis": first[1], "second_analysis": second[1]},
+                  "statuses": [options[0], rejected[0], first[0], second[0]], "loaded": loaded}))
+"""
+
+
+def child_env(warm):
+    env = dict(os.environ)
+    # Caches, indexes and a warm-up setting from the caller would skew the run
+    for name in ("ANALYZER_CACHE_DB", "ANALYZER_INDEX_DIR", "ANALYZER_DEDUP_DB", "ANALYZER_WARM_UP"):
+        env.pop(name, None)
+    if warm:
+        env["ANALYZER_WARM_UP"] = "1"
+    return env
+
+
+def run_child(body_path, warm):
+    spawned = time.time()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, ROOT, body_path, ",".join(DEFERRED_MODULES), BOUNDARY],
+        capture_output=True, text=True, env=child_env(warm), check=True, timeout=120,
+    ).stdout
+    report = json.loads(output.strip().splitlines()[-1])
+    report["times"] = {name: (at - spawned) * 1000 for name, at in report["times"].items()}
+    return report
+
+
+def import_breakdown(top=8):
+    """
+    Cumulative import time of api.analyze and of its largest direct imports (ms)
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api.analyze"],
+        capture_output=True, text=True, cwd=ROOT, env=child_env(False), check=True,
+    ).stderr
+    children, pending, total = [], [], None
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        _, cumulative, name_field = line.split("|")
+        name = name_field.strip()
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        if depth == 1:
+            pending.append((int(cumulative) / 1000, name))
+        elif depth == 0:
+            if name == "api.analyze":
+                total = int(cumulative) / 1000
+                children = sorted(pending, reverse=True)[:top]
+            pending = []
+    return total, children
+
+
+def baseline_path(name):
+    # Kept apart from benchmarks/run.py baselines of the same name
+    return os.path.join(BASELINE_DIR, "startup-" + name + ".json")
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print("\n%-24s %12s %12s %10s" % ("measurement", "base ms", "now ms", "change"))
+    for name, now in results.items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        change = now / before - 1
+        flag = ""
+        if change > threshold and now - before > MIN_DELTA_MS:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("%-24s %12.1f %12.1f %+9.1f%%%s" % (name, before, now, change * 100, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per mode")
+    parser.add_argument("--save", metavar="NAME", help="store this run as a baseline")
+    parser.add_argument("--compare", metavar="NAME", help="compare against a stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    _, data, _ = next(generate_corpus(1))
+    body = (
+        b"--" + BOUNDARY.encode() + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="resume.pdf"\r\n'
+        b"Content-Type: application/pdf\r\n\r\n" + data + b"\r\n--" + BOUNDARY.encode() + b"--\r\n"
+    )
+
+    total, children = import_breakdown()
+    print("import api.analyze: %.1f ms (python -X importtime)" % total)
+    for cumulative, name in children:
+        print("  %8.1f ms  %s" % (cumulative, name))
+
+    results = {}
+    loaded = set()
+    with tempfile.NamedTemporaryFile(suffix=".body") as f:
+        f.write(body)
+        f.flush()
+        print("\nMilliseconds from process spawn (median of %d runs)" % args.runs)
+        print("%-8s" % "mode" + "".join("%17s" % name for name in MEASUREMENTS))
+        for mode in ("cold", "warm"):
+            reports = [run_child(f.name, mode == "warm") for _ in range(args.runs)]
+            for report in reports:
+                if report["statuses"][2:] != [200, 200]:
+                    sys.exit("analysis request failed with statuses %s" % report["statuses"])
+                if mode == "cold":
+                    loaded.update(report["loaded"])
+            medians = {name: statistics.median(report["times"][name] for report in reports) for name in MEASUREMENTS}
+            print("%-8s" % mode + "".join("%17.1f" % medians[name] for name in MEASUREMENTS))
+            results.update({"%s_%s" % (mode, name): value for name, value in medians.items()})
+
+    status = 0
+    if loaded:
+        print("\nLoaded before the first analysis: " + ", ".join(sorted(loaded)))
+        status = 1
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressed: " + ", ".join(regressions))
+            status = 1
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = baseline_path(args.save)
+        with open(path, "w") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "import_ms": total,
+                "results": results,
+            }, f, indent=2)
+        print("\nSaved baseline to " + path)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
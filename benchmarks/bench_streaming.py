@@ -0,0 +1,126 @@
+"""
+Time to first useful byte of streamed analyses on multi-page PDFs.
+
+Usage:
+    python benchmarks/bench_streaming.py [--min-pages 4] [--count 6] [--repeat 3] [--engine auto]
+
+Serves api/analyze.py in-process with the result cache disabled and posts
+each multi-page resume of the synthetic corpus both ways: as a plain
+request (time to the complete JSON response) and with ?stream=ndjson,
+recording when the first event (page 1), the first sub-score and the
+final result arrive. Medians over --repeat runs are reported. Exits
+non-zero if a streamed result differs from the plain response.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Every request must do the full analysis
+os.environ["ANALYZER_CACHE_SIZE"] = "0"
+for name in ("ANALYZER_CACHE_DB", "ANALYZER_INDEX_DIR", "ANALYZER_DEDUP_DB"):
+    os.environ.pop(name, None)
+
+from api.analyze import handler
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import BOUNDARY
+
+
+class QuietHandler(handler):
+    def log_message(self, format, *args):
+        pass
+
+
+def post(port, path, body):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+    conn.request("POST", path, body, {"Content-Type": "multipart/form-data; boundary=" + BOUNDARY})
+    return conn, conn.getresponse(), start
+
+
+def plain(port, query, body):
+    conn, response, start = post(port, "/api/analyze" + query, body)
+    result = json.loads(response.read())
+    conn.close()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def streamed(port, query, body):
+    conn, response, start = post(port, "/api/analyze?stream=ndjson" + query.replace("?", "&"), body)
+    times = {}
+    result = None
+    for line in response:
+        event = json.loads(line)
+        name = event.pop("event")
+        now = (time.perf_counter() - start) * 1000
+        times.setdefault("first_event", now)
+        if name != "page":
+            times.setdefault("first_score", now)
+        if name in ("result", "error"):
+            times["result"] = now
+            result = event
+    conn.close()
+    return times, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--min-pages", type=int, default=4, help="skip shorter resumes")
+    parser.add_argument("--count", type=int, default=6, help="resumes to post")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engine", default=None, help="extraction engine (default: ANALYZER_PDF_ENGINE)")
+    args = parser.parse_args()
+
+    samples = [(name, data, spec) for name, data, spec in generate_corpus(200) if spec["pages"] >= args.min_pages]
+    samples = samples[:args.count]
+    if not samples:
+        sys.exit("no corpus resume has %d or more pages" % args.min_pages)
+    query = "?engine=" + args.engine if args.engine else ""
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    print("%-18s %5s %6s %10s %12s %12s %10s %8s" % ("resume", "pages", "words", "full ms", "1st event ms",
+                                                    "1st score ms", "result ms", "1st/full"))
+    mismatches = 0
+    ratios = []
+    for name, data, spec in samples:
+        body = (
+            b"--" + BOUNDARY.encode() + b"\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="' + name.encode() + b'"\r\n'
+            b"Content-Type: application/pdf\r\n\r\n" + data + b"\r\n--" + BOUNDARY.encode() + b"--\r\n"
+        )
+        # The first request pays for imports and engine start-up
+        plain(port, query, body)
+        full, stream_times = [], []
+        for _ in range(args.repeat):
+            elapsed, expected = plain(port, query, body)
+            full.append(elapsed)
+            times, result = streamed(port, query, body)
+            stream_times.append(times)
+            mismatches += result != expected
+        medians = {key: statistics.median(times[key] for times in stream_times)
+                   for key in ("first_event", "first_score", "result")}
+        full_ms = statistics.median(full)
+        ratios.append(medians["first_event"] / full_ms)
+        print("%-18s %5d %6d %10.1f %12.1f %12.1f %10.1f %7.0f%%" % (
+            name, spec["pages"], spec["words"], full_ms, medians["first_event"], medians["first_score"],
+            medians["result"], ratios[-1] * 100))
+    server.shutdown()
+
+    print("\nFirst event after %.0f%% of the full response time (median)" % (statistics.median(ratios) * 100))
+    if mismatches:
+        print("%d streamed results differ from the plain response" % mismatches)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
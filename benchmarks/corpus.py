@@ -0,0 +1,191 @@
+"""
+Deterministic synthetic resume PDF corpus, generated offline.
+
+Usage:
+    python benchmarks/corpus.py OUTDIR [--count 50] [--seed 7]
+
+Documents vary in word count (and so page count), keyword density,
+which sections are present, heading style and font size. The PDFs are
+written directly (Helvetica text objects), so no PDF library is needed
+and the same seed always produces byte-identical files.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.rules import BUNDLED_DIR, RulesetStore
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 54
+
+FILLER = (
+    "developed designed implemented managed delivered improved built led owned "
+    "scalable reliable services team product customers reporting pipeline platform "
+    "migration quarterly revenue latency users internal tooling release process "
+    "stakeholders requirements roadmap automated reduced increased launched "
+    "across multiple regions within budget ahead of schedule by percent"
+).split()
+
+SECTION_HEADINGS = {
+    "contact": "Contact",
+    "summary": "Summary",
+    "experience": "Professional Experience",
+    "education": "Education",
+    "skills": "Skills",
+    "projects": "Projects",
+}
+# The bundled file, not an ANALYZER_RULES_DIR override, so output stays reproducible
+DEFAULT_KEYWORDS = list(RulesetStore([BUNDLED_DIR]).get("default").terms)
+HEADING_STYLES = ("upper", "title", "colon")
+SIZES = (9, 10, 11, 12)
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(pages):
+    """
+    Serialize pages of (text, bold, size) lines into a minimal PDF
+
+    Each page is a list of lines laid out top to bottom; long lines must
+    already be wrapped.
+    """
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    regular = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    bold = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+    pages_id = len(objects) + 2 * len(pages) + 1
+
+    kids = []
+    for lines in pages:
+        ops = ["BT"]
+        y = PAGE_HEIGHT - MARGIN
+        for text, is_bold, size in lines:
+            y -= size * 1.4
+            ops.append("/F%d %d Tf 1 0 0 1 %d %.1f Tm (%s) Tj" % (2 if is_bold else 1, size, MARGIN, y, _escape(text)))
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> >>"
+            % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, content, regular, bold)
+        ))
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def _wrap(words, width):
+    line = []
+    length = 0
+    for word in words:
+        if line and length + len(word) + 1 > width:
+            yield " ".join(line)
+            line, length = [], 0
+        line.append(word)
+        length += len(word) + 1
+    if line:
+        yield " ".join(line)
+
+
+def _sentences(rng, words, keyword_density):
+    keywords = DEFAULT_KEYWORDS
+    out = []
+    while len(out) < words:
+        sentence = []
+        for _ in range(rng.randint(8, 20)):
+            sentence.append(rng.choice(keywords) if rng.random() < keyword_density else rng.choice(FILLER))
+        sentence[0] = sentence[0].capitalize()
+        sentence[-1] += "."
+        out.extend(sentence)
+    return out[:words]
+
+
+def make_resume(rng, index):
+    """
+    Build one synthetic resume; returns (pdf bytes, spec dict)
+    """
+    spec = {
+        "words": rng.choice((150, 300, 500, 800, 1200, 2000, 3500)),
+        "keyword_density": rng.choice((0.0, 0.02, 0.05, 0.1, 0.2)),
+        "sections": sorted(rng.sample(sorted(SECTION_HEADINGS), rng.randint(2, len(SECTION_HEADINGS)))),
+        "heading_style": rng.choice(HEADING_STYLES),
+        "size": rng.choice(SIZES),
+    }
+    size = spec["size"]
+    width = int((PAGE_WIDTH - 2 * MARGIN) / (size * 0.5))
+    lines_per_page = int((PAGE_HEIGHT - 2 * MARGIN) / (size * 1.4))
+
+    lines = [("Candidate %04d" % index, True, size + 6)]
+    body_words = _sentences(rng, spec["words"], spec["keyword_density"])
+    per_section = max(1, len(body_words) // len(spec["sections"]))
+    for position, section in enumerate(spec["sections"]):
+        heading = SECTION_HEADINGS[section]
+        if spec["heading_style"] == "upper":
+            heading = heading.upper()
+        elif spec["heading_style"] == "colon":
+            heading += ":"
+        lines.append(("", False, size))
+        lines.append((heading, True, size + 2))
+        if section == "contact":
+            lines.append(("Email: candidate%04d@example.com | Phone: 555-%04d | linkedin.com/in/c%04d"
+                          % (index, index, index), False, size))
+        chunk = body_words[position * per_section:(position + 1) * per_section]
+        lines.extend((text, False, size) for text in _wrap(chunk, width))
+
+    pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)]
+    spec["pages"] = len(pages)
+    return build_pdf(pages), spec
+
+
+def generate_corpus(count, seed=7):
+    """
+    Yield (name, pdf bytes, spec) for a deterministic corpus
+    """
+    rng = random.Random(seed)
+    for index in range(count):
+        data, spec = make_resume(rng, index)
+        yield "resume_%04d.pdf" % index, data, spec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("outdir")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.makedirs(args.outdir, exist_ok=True)
+    manifest = {}
+    for name, data, spec in generate_corpus(args.count, args.seed):
+        with open(os.path.join(args.outdir, name), "wb") as f:
+            f.write(data)
+        manifest[name] = spec
+    with open(os.path.join(args.outdir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print("Wrote %d PDFs to %s" % (args.count, args.outdir))
+
+
+if __name__ == "__main__":
+    main()
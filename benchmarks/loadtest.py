@@ -0,0 +1,406 @@
+"""
+Load test of POST /api/analyze against a local server.
+
+Usage:
+    python benchmarks/loadtest.py [--mode serverless,server,asgi] [--workers 1,2,4]
+                                  [--rate 20 | --concurrency 8] [--duration 30]
+                                  [--corpus 40] [--pdfs DIR] [--cache] [--json PATH]
+
+Starts each server mode as a subprocess on a free loopback port:
+
+    serverless  api/analyze.py's handler in a ThreadingHTTPServer, as a
+                serverless platform runs it (one process, no pool)
+    server      python -m analyzer.server --workers N
+    asgi        uvicorn analyzer.asgi:app with ANALYZER_WORKERS=N
+                (skipped when uvicorn is not installed)
+
+and replays a mix of PDFs (the synthetic corpus, plus any *.pdf in --pdfs)
+against it, picked at random with a fixed seed. Two load models:
+
+    open loop    (--rate) requests arrive as a Poisson process whatever
+                 the server does; latency is measured from each request's
+                 scheduled arrival, so time spent waiting for a free
+                 client connection counts against the server
+    closed loop  (--concurrency) that many clients send a request, wait
+                 for the answer (and --think seconds) and send the next;
+                 a 503 is counted and the client moves straight on
+
+Every --interval seconds a row reports requests sent and completed,
+errors, latency and the CPU and RSS of the server's whole process tree
+(pool workers included) read from /proc. A summary per mode and worker
+count follows: throughput, error rate, latency percentiles of successful
+responses, 503s, and peak RSS. The result cache is off (every request is
+analyzed) unless --cache is given. --json writes every run to a file for
+comparing later. Exits non-zero if a server fails to start.
+"""
+import argparse
+import glob
+import http.client
+import importlib.util
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import BOUNDARY, percentile
+
+MODES = ("serverless", "server", "asgi")
+START_TIMEOUT = 60
+REQUEST_TIMEOUT = 120
+
+SERVERLESS = r"""
+import sys
+sys.path.insert(0, sys.argv[1])
+from http.server import ThreadingHTTPServer
+from api.analyze import handler
+handler.log_message = lambda *args: None
+ThreadingHTTPServer(("127.0.0.1", int(sys.argv[2])), handler).serve_forever()
+"""
+
+
+def multipart_body(name, data):
+    return (
+        b"--" + BOUNDARY.encode() + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="' + name.encode() + b'"\r\n'
+        b"Content-Type: application/pdf\r\n\r\n" + data + b"\r\n--" + BOUNDARY.encode() + b"--\r\n"
+    )
+
+
+def load_bodies(corpus, pdf_dir):
+    bodies = [multipart_body(name, data) for name, data, _ in generate_corpus(corpus)]
+    for path in sorted(glob.glob(os.path.join(pdf_dir, "*.pdf"))) if pdf_dir else ():
+        with open(path, "rb") as f:
+            bodies.append(multipart_body(os.path.basename(path), f.read()))
+    return bodies
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, workers, port, cache):
+    env = dict(os.environ)
+    # State shared between runs would make later runs look faster
+    for name in ("ANALYZER_CACHE_DB", "ANALYZER_INDEX_DIR", "ANALYZER_DEDUP_DB", "ANALYZER_JOBS_DB"):
+        env.pop(name, None)
+    if not cache:
+        env["ANALYZER_CACHE_SIZE"] = "0"
+    if mode == "serverless":
+        command = [sys.executable, "-c", SERVERLESS, ROOT, str(port)]
+    elif mode == "server":
+        command = [sys.executable, "-m", "analyzer.server", "--port", str(port), "--workers", str(workers)]
+    else:
+        env["ANALYZER_WORKERS"] = str(workers)
+        command = [sys.executable, "-m", "uvicorn", "analyzer.asgi:app", "--port", str(port),
+                   "--log-level", "warning", "--no-access-log"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("%s exited: %s" % (mode, process.stderr.read().decode(errors="replace")[-2000:]))
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/api/analyze")
+            conn.getresponse().read()
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError("%s did not answer within %ds" % (mode, START_TIMEOUT))
+
+
+def stop_server(process):
+    # SIGTERM lets analyzer.server and uvicorn drain and stop their pools
+    process.terminate()
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class ProcessTree:
+    """
+    CPU seconds and RSS of a process and all of its descendants, from /proc
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.available = os.path.isdir("/proc/%d" % pid)
+        self.ticks = os.sysconf("SC_CLK_TCK") if self.available else 1
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if self.available else 1
+
+    def _stats(self):
+        stats = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open("/proc/%s/stat" % entry) as f:
+                    # The command name may contain spaces; fields resume after ')'
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except (OSError, IndexError):
+                continue
+            stats[int(entry)] = fields
+        return stats
+
+    def sample(self):
+        """
+        (CPU seconds, RSS bytes) summed over the tree, or None without /proc
+        """
+        if not self.available:
+            return None
+        stats = self._stats()
+        children = {}
+        for pid, fields in stats.items():
+            children.setdefault(int(fields[1]), []).append(pid)
+        cpu = rss = 0
+        pending = [self.pid]
+        while pending:
+            pid = pending.pop()
+            fields = stats.get(pid)
+            if fields is None:
+                continue
+            # utime, stime, cutime, cstime (reaped children count too); rss in pages
+            cpu += sum(int(value) for value in fields[11:15]) / self.ticks
+            rss += int(fields[21]) * self.page_size
+            pending.extend(children.get(pid, ()))
+        return cpu, rss
+
+
+class Recorder:
+    """
+    Outcomes of every request, bucketed by when they completed
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.outcomes = []
+
+    def started(self):
+        with self.lock:
+            self.sent += 1
+
+    def finished(self, at, latency, status):
+        with self.lock:
+            self.outcomes.append((at, latency, status))
+
+
+def send(port, body, recorder, scheduled):
+    recorder.started()
+    status = "connection error"
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT)
+        conn.request("POST", "/api/analyze", body, {"Content-Type": "multipart/form-data; boundary=" + BOUNDARY})
+        response = conn.getresponse()
+        payload = response.read()
+        status = response.status
+        if status == 200 and b'"error"' in payload and "error" in json.loads(payload):
+            status = "error result"
+        conn.close()
+    except (OSError, http.client.HTTPException) as e:
+        status = type(e).__name__
+    now = time.perf_counter()
+    recorder.finished(now, now - scheduled, status)
+
+
+def open_loop(port, bodies, recorder, rate, duration, max_inflight, rng, stop):
+    with ThreadPoolExecutor(max_inflight) as pool:
+        start = time.perf_counter()
+        arrival = start
+        while not stop.is_set():
+            arrival += rng.expovariate(rate)
+            if arrival - start >= duration:
+                break
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, port, rng.choice(bodies), recorder, arrival)
+
+
+def closed_loop(port, bodies, recorder, concurrency, duration, think, rng, stop):
+    end = time.perf_counter() + duration
+    seeds = [rng.random() for _ in range(concurrency)]
+
+    def client(seed):
+        choose = random.Random(seed).choice
+        while not stop.is_set() and time.perf_counter() < end:
+            send(port, choose(bodies), recorder, time.perf_counter())
+            if think:
+                time.sleep(think)
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in seeds]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def report_intervals(recorder, tree, interval, done):
+    """
+    Print one row per interval until done is set; returns the peak RSS
+    """
+    print("%6s %6s %6s %6s %9s %9s %7s %9s" % ("t s", "sent", "done", "errors", "p50 ms", "p99 ms",
+                                               "cpu %", "rss MB"))
+    start = last = time.perf_counter()
+    sent = seen = 0
+    usage = tree.sample()
+    peak = usage[1] if usage else 0
+    while not done.wait(interval):
+        now = time.perf_counter()
+        with recorder.lock:
+            window = recorder.outcomes[seen:]
+            seen = len(recorder.outcomes)
+            new_sent, sent = recorder.sent - sent, recorder.sent
+        latencies = [latency * 1000 for _, latency, status in window if status == 200]
+        errors = sum(status != 200 for _, _, status in window)
+        sample = tree.sample()
+        if sample and usage:
+            cpu = "%7.0f" % ((sample[0] - usage[0]) / (now - last) * 100)
+            rss = "%9.1f" % (sample[1] / 1e6)
+            peak = max(peak, sample[1])
+        else:
+            cpu, rss = "%7s" % "n/a", "%9s" % "n/a"
+        usage, last = sample, now
+        print("%6.0f %6d %6d %6d %9.1f %9.1f %s %s" % (
+            now - start, new_sent, len(window), errors, percentile(latencies, 0.5), percentile(latencies, 0.99),
+            cpu, rss), flush=True)
+    return peak
+
+
+def run(mode, workers, bodies, args):
+    port = free_port()
+    process = start_server(mode, workers, port, args.cache)
+    try:
+        rng = random.Random(args.seed)
+        for _ in range(args.warmup):
+            send(port, rng.choice(bodies), Recorder(), time.perf_counter())
+        tree = ProcessTree(process.pid)
+        recorder = Recorder()
+        stop, done = threading.Event(), threading.Event()
+        peak = []
+        sampler = threading.Thread(target=lambda: peak.append(report_intervals(recorder, tree, args.interval, done)))
+        sampler.start()
+        usage = tree.sample()
+        start = time.perf_counter()
+        try:
+            if args.concurrency:
+                closed_loop(port, bodies, recorder, args.concurrency, args.duration, args.think, rng, stop)
+            else:
+                open_loop(port, bodies, recorder, args.rate, args.duration, args.max_inflight, rng, stop)
+        except KeyboardInterrupt:
+            stop.set()
+        elapsed = time.perf_counter() - start
+        end_usage = tree.sample()
+        done.set()
+        sampler.join()
+    finally:
+        stop_server(process)
+
+    latencies = [latency for _, latency, status in recorder.outcomes if status == 200]
+    statuses = {}
+    for _, _, status in recorder.outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    completed = len(recorder.outcomes)
+    return {
+        "mode": mode,
+        "workers": workers if mode != "serverless" else None,
+        "seconds": elapsed,
+        "requests": completed,
+        "ok_per_s": len(latencies) / elapsed,
+        "error_rate": (completed - len(latencies)) / completed if completed else 0.0,
+        "statuses": statuses,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies, default=0) * 1000,
+        "cpu_percent": (end_usage[0] - usage[0]) / elapsed * 100 if usage and end_usage else None,
+        "peak_rss_mb": peak[0] / 1e6 if peak and peak[0] else None,
+    }
+
+
+def print_summary(results):
+    print("\n%-11s %7s %8s %8s %7s %6s %9s %9s %9s %9s %6s %8s" % (
+        "mode", "workers", "requests", "ok/s", "errors", "503s", "p50 ms", "p90 ms", "p99 ms", "max ms",
+        "cpu %", "peak MB"))
+    for result in results:
+        print("%-11s %7s %8d %8.1f %6.1f%% %6d %9.1f %9.1f %9.1f %9.1f %6s %8s" % (
+            result["mode"], result["workers"] or "-", result["requests"], result["ok_per_s"],
+            result["error_rate"] * 100, result["statuses"].get("503", 0), result["p50_ms"], result["p90_ms"],
+            result["p99_ms"], result["max_ms"],
+            "%.0f" % result["cpu_percent"] if result["cpu_percent"] is not None else "n/a",
+            "%.0f" % result["peak_rss_mb"] if result["peak_rss_mb"] is not None else "n/a"))
+        other = {status: count for status, count in result["statuses"].items() if status not in ("200", "503")}
+        if other:
+            print("%-11s other outcomes: %s" % ("", ", ".join("%s x%d" % item for item in sorted(other.items()))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", default="server", help="comma-separated server modes: " + ", ".join(MODES))
+    parser.add_argument("--workers", default="2", help="comma-separated pool sizes for server and asgi")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", type=float, default=10, help="open loop: mean arrivals per second")
+    load.add_argument("--concurrency", type=int, help="closed loop: concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per run")
+    parser.add_argument("--think", type=float, default=0, help="closed loop: seconds between a client's requests")
+    parser.add_argument("--max-inflight", type=int, default=256, help="open loop: client connections at most")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests before each run")
+    parser.add_argument("--interval", type=float, default=1, help="seconds per progress row")
+    parser.add_argument("--corpus", type=int, default=40, help="synthetic resumes in the mix")
+    parser.add_argument("--pdfs", help="directory of extra PDFs for the mix")
+    parser.add_argument("--cache", action="store_true", help="leave the result cache on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.mode.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error("unknown mode: " + ", ".join(unknown))
+    if "asgi" in modes and importlib.util.find_spec("uvicorn") is None:
+        print("uvicorn is not installed; skipping the asgi mode")
+        modes.remove("asgi")
+    worker_counts = [int(count) for count in args.workers.split(",")]
+    bodies = load_bodies(args.corpus, args.pdfs)
+    if not bodies:
+        sys.exit("no PDFs to send")
+
+    load_model = ("closed loop, %d clients" % args.concurrency if args.concurrency
+                  else "open loop, %g requests/s" % args.rate)
+    results = []
+    failed = False
+    for mode in modes:
+        for workers in ([None] if mode == "serverless" else worker_counts):
+            print("\n== %s%s: %s for %gs, %d PDFs ==" % (
+                mode, "" if workers is None else " (%d workers)" % workers, load_model, args.duration, len(bodies)))
+            try:
+                results.append(run(mode, workers, bodies, args))
+            except RuntimeError as e:
+                print(e)
+                failed = True
+    print_summary(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "cpus": os.cpu_count(), "load": load_model, "pdfs": len(bodies), "results": results}, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Stage-by-stage benchmark of the analysis pipeline on a synthetic corpus.
+
+Usage:
+    python benchmarks/run.py [--count 40] [--repeat 5] [--save NAME] [--compare NAME]
+
+Each stage is timed separately on every document: multipart parsing,
+text extraction, building the Document, each scorer, suggestions, JSON
+serialization, plus the uncached end-to-end pipeline. Reports p50/p95/p99
+latency, throughput and peak traced memory per stage. --save stores the
+run under benchmarks/baselines/NAME.json; --compare reports the change
+against a stored run and exits non-zero if any stage's p50 regressed by
+more than --threshold.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer import scoring
+from analyzer.document import Document
+from analyzer.extraction import ExtractionLimits, extract_pages
+from analyzer.multipart import parse_multipart
+from analyzer.pipeline import score_pdf
+from benchmarks.corpus import generate_corpus
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+BOUNDARY = "benchmarkboundary7f3a"
+# Sub-50µs stages jitter by more than the threshold; ignore changes below this
+MIN_DELTA_MS = 0.05
+
+
+class Sample:
+    """
+    One corpus document with the inputs each stage needs precomputed
+    """
+
+    def __init__(self, name, data, engine):
+        self.name = name
+        self.data = data
+        self.engine = engine
+        self.body = (
+            b"--" + BOUNDARY.encode() + b"\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="' + name.encode() + b'"\r\n'
+            b"Content-Type: application/pdf\r\n\r\n" + data + b"\r\n--" + BOUNDARY.encode() + b"--\r\n"
+        )
+        pages = extract_pages(data, ExtractionLimits.from_env(), 0, engine=engine)
+        self.texts = [page.text for page in pages]
+        self.emphasis = frozenset(key for page in pages for key in page.emphasis or ())
+        self.doc = fresh_document(self.texts, self.emphasis)
+        self.result = scoring.score_document(self.doc)
+
+
+def fresh_document(texts, emphasis=None):
+    doc = Document.from_pages(texts, emphasis=emphasis)
+    # Touch every cached representation so scorer stages time only scoring
+    doc.lower, doc.tokens, doc.words, doc.sentences
+    return doc
+
+
+def stage_multipart(sample):
+    form = parse_multipart(io.BytesIO(sample.body), "multipart/form-data; boundary=" + BOUNDARY,
+                           len(sample.body), max_size=len(sample.body))
+    form.close()
+
+
+def stage_suggestions(sample):
+    result = sample.result
+    scoring.generate_suggestions(result["keyword_score"], result["readability_score"], result["section_score"],
+                                 result["section_details"], result["length_score"], result["word_count"])
+
+
+STAGES = [
+    ("multipart", stage_multipart),
+    ("extract", lambda sample: extract_pages(sample.data, ExtractionLimits.from_env(), 0, engine=sample.engine)),
+    ("document", lambda sample: fresh_document(sample.texts, sample.emphasis)),
+    ("score:keywords", lambda sample: scoring.get_keyword_score(sample.doc)),
+    # Fresh Document: its readability counts are cached after the first call
+    ("score:readability", lambda sample: scoring.get_readability_score(Document(sample.doc.text))),
+    # Fresh Document: its segmentation is cached after the first call
+    ("score:sections", lambda sample: scoring.check_sections(Document(sample.doc.text, emphasis=sample.emphasis))),
+    ("score:length", lambda sample: scoring.get_length_score(sample.doc)),
+    ("suggestions", stage_suggestions),
+    ("json", lambda sample: json.dumps(sample.result)),
+    ("end_to_end", lambda sample: score_pdf(sample.data, engine=sample.engine)),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples):
+    mean = sum(samples) / len(samples)
+    return {
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "mean_ms": mean * 1000,
+        "throughput_per_s": 1 / mean if mean else 0.0,
+    }
+
+
+def run_stages(samples, repeat, stages=STAGES):
+    results = {}
+    for name, func in stages:
+        timings = []
+        for _ in range(repeat):
+            for sample in samples:
+                start = time.perf_counter()
+                func(sample)
+                timings.append(time.perf_counter() - start)
+        results[name] = summarize(timings)
+
+        # Separate pass: tracemalloc slows Python code down too much to time under it
+        tracemalloc.start()
+        for sample in samples:
+            func(sample)
+        results[name]["peak_kib"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return results
+
+
+def print_report(results):
+    print("%-18s %10s %10s %10s %12s %12s" % ("stage", "p50 ms", "p95 ms", "p99 ms", "ops/s", "peak KiB"))
+    for name, stats in results.items():
+        print("%-18s %10.3f %10.3f %10.3f %12.1f %12.1f" % (
+            name, stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["throughput_per_s"], stats["peak_kib"],
+        ))
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print("\n%-18s %12s %12s %10s" % ("stage", "base p50", "now p50", "change"))
+    for name, stats in results.items():
+        before = baseline["stages"].get(name)
+        if before is None or not before["p50_ms"]:
+            continue
+        change = stats["p50_ms"] / before["p50_ms"] - 1
+        flag = ""
+        if change > threshold and stats["p50_ms"] - before["p50_ms"] > MIN_DELTA_MS:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("%-18s %12.3f %12.3f %+9.1f%%%s" % (name, before["p50_ms"], stats["p50_ms"], change * 100, flag))
+    return regressions
+
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, name + ".json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=40, help="synthetic documents")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes over the corpus")
+    parser.add_argument("--engine", default=None, help="extraction engine (default: ANALYZER_PDF_ENGINE)")
+    parser.add_argument("--save", metavar="NAME", help="store this run as a baseline")
+    parser.add_argument("--compare", metavar="NAME", help="compare against a stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed p50 slowdown (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    corpus = list(generate_corpus(args.count, args.seed))
+    samples = [Sample(name, data, args.engine) for name, data, _ in corpus]
+    pages = sum(spec["pages"] for _, _, spec in corpus)
+    print("Corpus: %d documents, %d pages (seed %d)\n" % (len(samples), pages, args.seed))
+
+    results = run_stages(samples, args.repeat)
+    print_report(results)
+    print("\nProcess peak RSS: %.1f MiB" % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+    run = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {"count": args.count, "seed": args.seed, "pages": pages},
+        "engine": args.engine,
+        "stages": results,
+    }
+
+    status = 0
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressed stages: " + ", ".join(regressions))
+            status = 1
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save), "w") as f:
+            json.dump(run, f, indent=2)
+        print("\nSaved baseline to " + baseline_path(args.save))
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()